@@ -0,0 +1,95 @@
+# app_resources.py
+import os
+import threading
+import time
+
+from chatbot_utils import logger, get_embedding_model, get_it_retriever, get_hr_retriever
+
+# With gunicorn --preload (see gunicorn.conf.py) the app module is imported once in the master process.
+# Loading the embedding model and FAISS indexes at that point means every forked worker shares those
+# pages copy-on-write instead of building its own copy.
+PRELOAD_SHARED_RESOURCES = os.getenv("PRELOAD_SHARED_RESOURCES", "False").lower() == "true"
+
+# --- WARM-UP / READINESS CONFIG ---
+# When true the HTTP server starts serving immediately and the LLM client, embedding model and indexes load
+# in the background; chat turns that need a component which is not ready yet get a short degraded reply.
+WARMUP_IN_BACKGROUND = os.getenv("WARMUP_IN_BACKGROUND", "True").lower() == "true"
+# Components that must be loaded for /readyz to pass. A retriever that fails to build only degrades its mode,
+# as before, so by default readiness waits for every component to settle but only requires the LLM.
+READINESS_REQUIRED_COMPONENTS = [c.strip() for c in os.getenv("READINESS_REQUIRED_COMPONENTS", "llm").split(",") if c.strip()]
+
+RESOURCE_COMPONENTS = ("llm", "embedding_model", "it_retriever", "hr_retriever")
+
+class ResourceReadiness:
+    """Load state per component: "pending" -> "loading" -> "ready" or "failed"."""
+
+    def __init__(self, components=RESOURCE_COMPONENTS):
+        self._lock = threading.Lock()
+        self._components = {name: {"status": "pending", "load_seconds": None, "error": None} for name in components}
+
+    def track(self, name: str, loader, *args, **kwargs):
+        """Runs loader and records the outcome. Returns its result, or None if it raised or returned None."""
+        self._set(name, status="loading")
+        start = time.perf_counter()
+        try: value = loader(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"Failed to load component '{name}': {e}", exc_info=True)
+            self._set(name, status="failed", load_seconds=round(time.perf_counter() - start, 2), error=str(e)[:200])
+            return None
+        self._set(name, status="ready" if value is not None else "failed", load_seconds=round(time.perf_counter() - start, 2))
+        return value
+
+    def mark_failed(self, name: str, error: str): self._set(name, status="failed", error=error)
+
+    def _set(self, name: str, **fields):
+        with self._lock: self._components.setdefault(name, {"status": "pending", "load_seconds": None, "error": None}).update(fields)
+
+    def status(self, name: str) -> str:
+        with self._lock: return self._components.get(name, {}).get("status", "pending")
+
+    def is_ready(self, name: str) -> bool: return self.status(name) == "ready"
+
+    def is_warming_up(self, name: str) -> bool: return self.status(name) in ("pending", "loading")
+
+    def all_ready(self, required=READINESS_REQUIRED_COMPONENTS) -> bool:
+        with self._lock:
+            if any(entry["status"] in ("pending", "loading") for entry in self._components.values()): return False
+            return all(self._components.get(name, {}).get("status") == "ready" for name in required)
+
+    def snapshot(self) -> dict:
+        with self._lock: return {name: dict(entry) for name, entry in self._components.items()}
+
+RESOURCE_READINESS = ResourceReadiness()
+
+_resources = {}
+_resources_lock = threading.Lock()
+_resources_loaded = False
+
+def get_shared_resource(name: str):
+    """Returns a loaded shared component, or None while it is still warming up (or failed to load)."""
+    return _resources.get(name)
+
+def load_shared_resources(force_recreate: bool = False) -> dict:
+    """Loads the embedding model and IT/HR retrievers once per process; later calls return the same objects.
+
+    Each component is published as soon as it is built, so an IT retriever can serve requests while the
+    HR index is still loading.
+    """
+    global _resources_loaded
+    with _resources_lock:
+        if _resources_loaded: return _resources
+        logger.info(f"Loading shared embedding model and retrievers (pid {os.getpid()}).")
+        embedding_model = RESOURCE_READINESS.track("embedding_model", get_embedding_model)
+        _resources["embedding_model"] = embedding_model
+        logger.info("Initializing IT Retriever...")
+        it_retriever = RESOURCE_READINESS.track("it_retriever", get_it_retriever, embedding_model, force_recreate=force_recreate) if embedding_model else None
+        if not it_retriever: logger.critical("IT Retriever could not be initialized. IT document search will be unavailable.")
+        _resources["it_retriever"] = it_retriever
+        logger.info("Initializing HR Retriever...")
+        hr_retriever = RESOURCE_READINESS.track("hr_retriever", get_hr_retriever, embedding_model, force_recreate=force_recreate) if embedding_model else None
+        if not hr_retriever: logger.critical("HR Retriever could not be initialized. HR document search will be unavailable.")
+        _resources["hr_retriever"] = hr_retriever
+        if not embedding_model:
+            for name in ("it_retriever", "hr_retriever"): RESOURCE_READINESS.mark_failed(name, "Embedding model unavailable.")
+        _resources_loaded = True
+        return _resources
@@ -0,0 +1,58 @@
+# async_utils.py
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from chatbot_logging import logger
+except ImportError:
+    import logging
+    logger = logging.getLogger(__name__)
+    if not logger.handlers:
+        logger.addHandler(logging.StreamHandler())
+        logger.setLevel(logging.INFO)
+        logger.warning("async_utils.py: Using fallback logger.")
+
+# --- BOUNDED EXECUTORS (one pool per blocking stage) ---
+# Blocking clients (FAISS/embeddings, DuckDuckGo, URL title fetches, Jira via requests) run on
+# these pools so the event loop keeps serving other sessions. Separate pools per stage mean a
+# slow Jira cannot starve retrieval for everyone else on the same worker.
+STAGE_POOL_SIZES = {
+    "retrieval": int(os.getenv("RETRIEVAL_POOL_SIZE", "4")),
+    "web": int(os.getenv("WEB_POOL_SIZE", "8")),
+    "jira": int(os.getenv("JIRA_POOL_SIZE", "8")),
+    "outbox": int(os.getenv("OUTBOX_POOL_SIZE", "4")), # Local SQLite enqueues; kept apart from slow Jira calls
+    "sessions": int(os.getenv("SESSION_POOL_SIZE", "4")), # SQLite session store reads/writes (SESSION_STORE=sqlite)
+    "cache": int(os.getenv("CACHE_POOL_SIZE", "2")), # Persistent classification cache (CLASSIFICATION_CACHE_DB_PATH)
+    "default": int(os.getenv("BLOCKING_POOL_SIZE", "8")),
+}
+
+_EXECUTORS: dict = {}
+_EXECUTORS_LOCK = threading.Lock()
+
+def get_stage_executor(stage: str = "default") -> ThreadPoolExecutor:
+    """Returns the bounded thread pool for a pipeline stage, creating it on first use."""
+    executor = _EXECUTORS.get(stage)
+    if executor is not None: return executor
+    with _EXECUTORS_LOCK:
+        executor = _EXECUTORS.get(stage)
+        if executor is None:
+            max_workers = STAGE_POOL_SIZES.get(stage, STAGE_POOL_SIZES["default"])
+            executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{stage}-stage")
+            _EXECUTORS[stage] = executor
+            logger.info(f"Created '{stage}' stage executor with max_workers={max_workers}.")
+    return executor
+
+async def run_blocking(stage: str, func, *args, **kwargs):
+    """Runs a blocking callable on the stage's executor and awaits its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_stage_executor(stage), functools.partial(func, *args, **kwargs))
+
+def shutdown_executors(wait: bool = False):
+    with _EXECUTORS_LOCK:
+        for stage, executor in _EXECUTORS.items():
+            logger.info(f"Shutting down '{stage}' stage executor.")
+            executor.shutdown(wait=wait, cancel_futures=True)
+        _EXECUTORS.clear()
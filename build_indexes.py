@@ -0,0 +1,64 @@
+# build_indexes.py
+# Offline builds of the IT and HR FAISS indexes (see index_versions.py). Run it when documents change, e.g. from a
+# deploy step or cron; running servers load the new version when they restart (gunicorn: `kill -HUP <master>`).
+#   python build_indexes.py                      # Build both indexes; publish and activate a version if sources changed
+#   python build_indexes.py hr --force           # Rebuild HR from scratch (parsed-text and embedding caches still apply)
+#   python build_indexes.py --no-activate        # Publish without switching CURRENT
+#   python build_indexes.py --list               # Versions of each index, with their build stats
+#   python build_indexes.py it --activate <version>   # Point CURRENT at another version (rollback)
+import argparse
+import os
+import sys
+
+from chatbot_logging import logger
+from chatbot_vectorstore import INDEX_SPECS
+from index_manifest import load_manifest
+from index_versions import (INDEX_VERSIONS_KEEP, IndexBuildError, activate_version, build_index_version, current_version,
+                            list_versions, versions_root)
+
+def print_versions(mode: str, index_path: str):
+    current = current_version(index_path)
+    print(f"{mode}: {versions_root(index_path)}")
+    for version in list_versions(index_path):
+        manifest = load_manifest(os.path.join(versions_root(index_path), version)) or {}
+        stats = manifest.get("build_stats", {})
+        print(f"  {'*' if version == current else ' '} {version}  files={len(manifest.get('files', {}))} vectors={manifest.get('vectors')} "
+              f"model={manifest.get('settings', {}).get('embedding_model')} build_seconds={stats.get('seconds')}")
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Build versioned IT/HR FAISS indexes offline.")
+    parser.add_argument("modes", nargs="*", metavar="{it,hr}", help="Indexes to process (default: all).")
+    parser.add_argument("--force", action="store_true", help="Build from scratch instead of from the current version.")
+    parser.add_argument("--no-activate", action="store_true", help="Publish the new version without pointing CURRENT at it.")
+    parser.add_argument("--keep", type=int, default=INDEX_VERSIONS_KEEP, help="Published versions to keep per index.")
+    parser.add_argument("--list", action="store_true", help="List versions and exit.")
+    parser.add_argument("--activate", metavar="VERSION", help="Point CURRENT at VERSION (one index) and exit.")
+    args = parser.parse_args()
+    modes = args.modes or list(INDEX_SPECS)
+    if set(modes) - set(INDEX_SPECS): parser.error(f"unknown index: {', '.join(sorted(set(modes) - set(INDEX_SPECS)))}")
+    index_paths = {mode: os.path.join(INDEX_SPECS[mode][1], INDEX_SPECS[mode][0]) for mode in modes}
+
+    if args.list:
+        for mode, index_path in index_paths.items(): print_versions(mode, index_path)
+        return 0
+    if args.activate:
+        if len(modes) != 1: parser.error("--activate needs exactly one index (it or hr).")
+        try: activate_version(index_paths[modes[0]], args.activate); return 0
+        except IndexBuildError as e: logger.error(str(e)); return 1
+
+    from chatbot_llm import get_embedding_model
+    embedding_model = get_embedding_model()
+    failed = []
+    for mode, index_path in index_paths.items():
+        _, _, _, source_files_func, file_loader_func = INDEX_SPECS[mode]
+        try:
+            result = build_index_version(index_path, source_files_func(), file_loader_func, embedding_model,
+                                         force=args.force, activate=not args.no_activate, keep=args.keep)
+            print(f"{mode}: version {result['version']} ({'published' if result['published'] else 'unchanged'}); "
+                  f"{result['files_parsed']} files parsed, {result['chunks_embedded']} chunks embedded, {result['vectors']} vectors, {result['seconds']}s")
+        except Exception as e:
+            logger.error(f"Building the {mode} index failed: {e}", exc_info=True); failed.append(mode)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
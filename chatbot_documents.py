@@ -0,0 +1,115 @@
+# chatbot_documents.py
+import os
+
+from chatbot_logging import logger
+from document_ingest import parse_files
+
+# --- CHUNKING ---
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 150
+SOP_EXTENSIONS = (".pdf", ".docx")
+HR_EXTENSIONS = (".pdf", ".docx", ".xlsx", ".xls")
+
+def split_documents(raw_docs):
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    return RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP).split_documents(raw_docs)
+
+def _list_files(directory, extensions):
+    """Sorted paths of the files in `directory` with one of `extensions` (sorted so index builds are reproducible)."""
+    if not os.path.isdir(directory): return []
+    return [os.path.join(directory, name) for name in sorted(os.listdir(directory)) if name.lower().endswith(extensions)]
+
+# --- DATA LOADING & PROCESSING (IT) ---
+def load_it_faqs(file_path="data/faqs/faq_data.xlsx"):
+    import pandas as pd
+    from langchain.docstore.document import Document
+    docs = []
+    logger.info(f"Attempting to load IT FAQs from: {file_path}")
+    try:
+        df = pd.read_excel(file_path)
+        if 'Question' not in df.columns or 'Answer' not in df.columns:
+            logger.error("IT FAQ Excel must contain 'Question' and 'Answer' columns.")
+            return []
+        for _, row in df.iterrows():
+            content = f"Question: {row['Question']}\nAnswer: {row['Answer']}"
+            metadata = {"doc_type": "faq_it", "source": os.path.basename(file_path)}
+            if pd.notna(row.get('ref link')) and row.get('ref link'):
+                content += f"\nReference Link: {str(row.get('ref link'))}"
+                metadata["reference_link"] = str(row.get('ref link'))
+            docs.append(Document(page_content=content, metadata=metadata))
+        logger.info(f"Loaded {len(docs)} IT FAQs.")
+    except FileNotFoundError: logger.error(f"IT FAQ file not found: {file_path}.")
+    except Exception as e: logger.error(f"Error loading IT FAQs: {e}", exc_info=True)
+    return docs
+
+def iter_it_sop_file(file_path):
+    """Chunks of one IT SOP (.pdf/.docx), produced page by page; raises on a parse error."""
+    from langchain_community.document_loaders import PyPDFLoader, UnstructuredWordDocumentLoader
+    filename = os.path.basename(file_path)
+    if filename.lower().endswith(".pdf"): loader = PyPDFLoader(file_path)
+    elif filename.lower().endswith(".docx"): loader = UnstructuredWordDocumentLoader(file_path)
+    else: return
+    for page in loader.lazy_load(): # PyPDFLoader yields one Document per page
+        page.metadata["doc_type"] = "sop_it"
+        page.metadata["source"] = filename
+        yield from split_documents([page])
+
+def load_it_sop_file(file_path):
+    """One IT SOP (.pdf/.docx), loaded and split into chunks; [] for other files or on a parse error."""
+    try: return list(iter_it_sop_file(file_path))
+    except Exception as e: logger.error(f"Error loading IT SOP {os.path.basename(file_path)}: {e}", exc_info=True); return []
+
+def load_it_sops(sops_dir="data/sops/"):
+    logger.info(f"Attempting to load IT SOPs from: {sops_dir}")
+    if not os.path.exists(sops_dir) or not os.listdir(sops_dir):
+        logger.warning(f"IT SOPs directory '{sops_dir}' is empty or does not exist.")
+        return []
+    split_docs = parse_files(iter_it_sop_file, _list_files(sops_dir, SOP_EXTENSIONS))
+    if split_docs: logger.info(f"Loaded and split IT SOPs into {len(split_docs)} chunks.")
+    return split_docs
+
+def list_it_source_files(faq_path="data/faqs/faq_data.xlsx", sops_dir="data/sops/"):
+    return ([faq_path] if os.path.isfile(faq_path) else []) + _list_files(sops_dir, SOP_EXTENSIONS)
+
+def iter_it_source_file(file_path):
+    """Chunks for one file of the IT index: the FAQ workbook or an SOP."""
+    if file_path.lower().endswith((".xlsx", ".xls")): yield from load_it_faqs(file_path)
+    else: yield from iter_it_sop_file(file_path)
+
+def load_it_documents():
+    logger.info("Loading all IT documents.")
+    all_docs = load_it_faqs() + load_it_sops()
+    if not all_docs: logger.warning("No IT documents loaded.")
+    else: logger.info(f"Total IT documents loaded: {len(all_docs)}")
+    return all_docs
+
+# --- DATA LOADING & PROCESSING (HR) ---
+def iter_hr_document_file(file_path):
+    """Chunks of one HR document (.pdf/.docx/.xlsx/.xls), produced page by page; raises on a parse error."""
+    from langchain_community.document_loaders import PyPDFLoader, UnstructuredWordDocumentLoader, UnstructuredExcelLoader
+    filename = os.path.basename(file_path)
+    if filename.lower().endswith(".pdf"): loader = PyPDFLoader(file_path); doc_type_prefix = "hr_pdf"
+    elif filename.lower().endswith(".docx"): loader = UnstructuredWordDocumentLoader(file_path); doc_type_prefix = "hr_docx"
+    elif filename.lower().endswith((".xlsx", ".xls")): loader = UnstructuredExcelLoader(file_path, mode="elements"); doc_type_prefix = "hr_excel"
+    else: return
+    for page in loader.lazy_load():
+        page.metadata["doc_type"] = doc_type_prefix
+        page.metadata["source"] = filename
+        yield from split_documents([page])
+
+def load_hr_document_file(file_path):
+    """One HR document (.pdf/.docx/.xlsx/.xls), loaded and split into chunks; [] for other files or on a parse error."""
+    try: return list(iter_hr_document_file(file_path))
+    except Exception as e: logger.error(f"Error loading HR document {os.path.basename(file_path)}: {e}", exc_info=True); return []
+
+def list_hr_source_files(hr_docs_dir="data/hr_documents/"):
+    return _list_files(hr_docs_dir, HR_EXTENSIONS)
+
+def load_hr_documents_from_folder(hr_docs_dir="data/hr_documents/"):
+    logger.info(f"Attempting to load HR documents from: {hr_docs_dir}")
+    if not os.path.exists(hr_docs_dir): logger.warning(f"HR documents directory '{hr_docs_dir}' does not exist."); return []
+    if not os.listdir(hr_docs_dir): logger.warning(f"HR documents directory '{hr_docs_dir}' is empty."); return []
+    split_docs = parse_files(iter_hr_document_file, list_hr_source_files(hr_docs_dir))
+    if not split_docs: logger.warning(f"No HR documents successfully loaded from {hr_docs_dir}."); return []
+    logger.info(f"Loaded and split HR documents from '{hr_docs_dir}' into {len(split_docs)} chunks.")
+    return split_docs
@@ -0,0 +1,63 @@
+# chatbot_llm.py
+import os
+import json
+import re
+from dotenv import load_dotenv
+
+from chatbot_logging import logger
+
+# --- CONFIGURATION & INITIALIZATION ---
+def load_env_vars():
+    load_dotenv()
+    logger.debug("Environment variables loaded.")
+
+def get_gemini_llm():
+    import google.generativeai as genai # Pulls in gRPC/protobuf; only needed once the LLM is created
+    load_env_vars() 
+    try:
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            logger.critical("GOOGLE_API_KEY not found in environment variables.")
+            raise ValueError("GOOGLE_API_KEY not set.")
+        genai.configure(api_key=api_key)
+        model = genai.GenerativeModel('gemini-1.5-flash-latest')
+        logger.info("Gemini LLM initialized ('gemini-1.5-flash-latest').")
+        return model
+    except Exception as e:
+        logger.error(f"Error configuring Gemini: {e}", exc_info=True)
+        raise
+
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32")) # sentence-transformers encode() batch size
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0")) # torch intra-op threads for encoding; 0 = torch default
+
+def get_embedding_model(model_name='all-MiniLM-L6-v2'):
+    from langchain_community.embeddings import HuggingFaceEmbeddings # Pulls in sentence-transformers/torch
+    logger.info(f"Initializing embedding model: {model_name} (batch size {EMBEDDING_BATCH_SIZE}, threads {EMBEDDING_THREADS or 'default'})")
+    if EMBEDDING_THREADS > 0:
+        import torch
+        torch.set_num_threads(EMBEDDING_THREADS)
+    return HuggingFaceEmbeddings(model_name=model_name, encode_kwargs={"batch_size": EMBEDDING_BATCH_SIZE})
+
+# --- LLM UTILITY ---
+def clean_json_response(llm_response_text):
+    logger.debug(f"Attempting to clean JSON from LLM response (first 100 chars): '{llm_response_text[:100]}...'")
+    try:
+        text_to_parse = llm_response_text.strip()
+        if text_to_parse.startswith("```json"):
+            text_to_parse = text_to_parse[len("```json"):].strip()
+            if text_to_parse.endswith("```"): text_to_parse = text_to_parse[:-len("```")].strip()
+        elif text_to_parse.startswith("```"):
+            text_to_parse = text_to_parse[len("```"):].strip()
+            if text_to_parse.endswith("```"): text_to_parse = text_to_parse[:-len("```")].strip()
+        json_start = text_to_parse.find("{"); json_end = text_to_parse.rfind("}") + 1
+        if json_start != -1 and json_end != 0 and json_end > json_start:
+            json_str = text_to_parse[json_start:json_end]
+            parsed_json = json.loads(json_str); logger.info(f"Successfully parsed JSON: {parsed_json}"); return parsed_json
+        else:
+            match = re.search(r'\{.*\}', text_to_parse, re.DOTALL)
+            if match:
+                json_str = match.group(0)
+                try: parsed_json = json.loads(json_str); logger.info(f"Successfully parsed JSON (from regex fallback): {parsed_json}"); return parsed_json
+                except json.JSONDecodeError as e_regex: logger.error(f"Error parsing JSON from regex fallback: {e_regex}\nRegex Matched String: {json_str}", exc_info=True)
+            logger.error(f"Could not extract valid JSON from: {text_to_parse[:200]}..."); return None
+    except Exception as e: logger.error(f"Unexpected error during clean_json_response: {e}", exc_info=True); return None
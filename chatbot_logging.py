@@ -0,0 +1,25 @@
+# chatbot_logging.py
+import os
+import logging
+
+# --- LOGGER SETUP ---
+LOG_DIR = "logs"
+LOG_FILE = os.path.join(LOG_DIR, "chatbot.log")
+
+def setup_logger(name='chatbot_logger', log_file=LOG_FILE, level=logging.DEBUG):
+    os.makedirs(LOG_DIR, exist_ok=True)
+    logger_instance = logging.getLogger(name)
+    if not logger_instance.handlers:
+        logger_instance.setLevel(level)
+        fh = logging.FileHandler(log_file, mode='a', encoding='utf-8')
+        fh.setLevel(level)
+        ch = logging.StreamHandler()
+        ch.setLevel(logging.INFO)
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(module)s:%(lineno)d - %(message)s')
+        fh.setFormatter(formatter)
+        ch.setFormatter(formatter)
+        logger_instance.addHandler(fh)
+        logger_instance.addHandler(ch)
+    return logger_instance
+
+logger = setup_logger()
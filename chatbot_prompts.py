@@ -0,0 +1,188 @@
+# chatbot_prompts.py
+# --- HR SPECIFIC CONFIG ---
+HR_KEKA_LINKS = [
+    {"text": "View Documents", "url": "https://hoonartek.keka.com/#/org/documents/org/folder/414"} 
+]
+HR_FALLBACK_MESSAGE = "I couldn't find specific information for your HR query in my documents. You might find these Keka resources helpful:"
+HR_ERROR_FALLBACK_MESSAGE = "I'm having a little trouble processing HR requests at the moment. You can try these Keka links or ask again later."
+
+# --- PROMPT TEMPLATES ---
+RELEVANCE_CHECK_PROMPT_TEMPLATE = """
+Original User Query: "{user_query}"
+Simplified Search Query Used: "{simplified_query}"
+Retrieved Context Snippet(s) from Internal Documents:
+---
+{retrieved_context}
+---
+Based on the "Retrieved Context Snippet(s)", is it highly likely to contain a direct and useful answer to the "Original User Query"?
+The context is only relevant if it directly addresses the main subject of the user's query.
+Consider if the context is specific enough to be helpful or just vaguely related.
+Answer strictly with only "YES" or "NO".
+"""
+
+INITIAL_ANALYSIS_PROMPT_TEMPLATE = """
+User Query: "{user_query}"
+Current Assistant Mode: "{assistant_mode}" # e.g., "IT" or "HR"
+
+Analyze the user query for our L1 {assistant_mode} support chatbot. Your goal is to determine the query's nature.
+
+Consider the following categories:
+1.  **Internal Documentation ("Internal_Docs"):**
+    *   Query is clearly related to {assistant_mode} and likely answerable by internal {assistant_mode} documents.
+    *   Examples for IT: "how to install VPN client", "reset windows password", "software license request".
+    *   Examples for HR: "what is the leave policy", "employee benefits inquiry", "requesting a salary slip", "understanding performance review process".
+
+2.  **Web Search for IT Topics ("Web_Search_IT"):** (This source is ONLY for IT Mode)
+    *   Query is IT-related but might be too new, specific, or about third-party software not extensively covered internally by IT docs.
+    *   If Assistant Mode is HR, this category should NOT be chosen.
+
+3.  **Greeting ("Greeting"):**
+    *   Simple social greetings like "hi", "hello", "how are you?".
+
+4.  **Topic Mismatch ("TopicMismatch"):**
+    *   Query seems to be about the *other* department's scope.
+    *   **If Current Assistant Mode is "IT", but the query is clearly about HR topics.**
+        *   HR topics include: employee policies (like **dress code**, leave, work from home), payroll, benefits, recruitment, onboarding, employee relations, performance management, HR system questions (e.g., Keka).
+        *   Examples: "what is our company's maternity leave policy?", "questions about my salary slip", "**what is the dress code policy?**", "how to apply for internal job posting?".
+    *   **If Current Assistant Mode is "HR", but the query is clearly about IT topics.**
+        *   IT topics include: hardware issues (laptop, printer), software problems/requests, network connectivity (VPN, Wi-Fi), password resets, system access, IT security.
+        *   Examples: "VPN setup", "software installation error", "printer not working", "my computer is slow".
+    *   Be reasonably confident about the mismatch. If unsure, prefer "Internal_Docs" for the current mode UNLESS the query strongly suggests the other department's core responsibilities as listed above.
+
+5.  **Out of Scope ("OutOfScope"):**
+    *   Query is clearly not related to either IT or HR support (e.g., "what's the weather?", "capital of France").
+    *   Query is gibberish or random characters.
+
+If the source is "Internal_Docs" or "Web_Search_IT", provide a concise version of the query suitable for semantic search.
+For "Greeting", "TopicMismatch", or "OutOfScope", the simplified query can be the original query or a note reflecting the category (e.g., "HR query: dress code policy", "greeting").
+
+Output your decision strictly in JSON format like this:
+{{
+  "best_source": "Internal_Docs" | "Web_Search_IT" | "Greeting" | "TopicMismatch" | "OutOfScope",
+  "simplified_query_for_search": "concise version of the query or note"
+}}
+
+Example 1 (IT - Internal):
+User Query: "How do I reset my Windows password?"
+Current Assistant Mode: "IT"
+JSON Output: {{ "best_source": "Internal_Docs", "simplified_query_for_search": "reset windows password" }}
+
+Example 2 (Topic Mismatch - HR query in IT mode):
+User Query: "What is our company's maternity leave policy?"
+Current Assistant Mode: "IT"
+JSON Output: {{ "best_source": "TopicMismatch", "simplified_query_for_search": "HR query: maternity leave policy" }}
+
+Example 3 (Topic Mismatch - IT query in HR mode):
+User Query: "My laptop screen is flickering."
+Current Assistant Mode: "HR"
+JSON Output: {{ "best_source": "TopicMismatch", "simplified_query_for_search": "IT query: laptop screen flickering" }}
+
+**Example 4 (Topic Mismatch - HR query 'dress code' in IT mode):**
+User Query: "what is the dress code policy"
+Current Assistant Mode: "IT"
+JSON Output: {{ "best_source": "TopicMismatch", "simplified_query_for_search": "HR query: dress code policy" }}
+
+
+Now, analyze the User Query and Assistant Mode at the top of this prompt.
+"""
+
+
+RESPONSE_GENERATION_PROMPT_TEMPLATE = """
+You are a helpful IT support assistant. Your goal is to provide clear, concise, and actionable answers.
+Answer the user's query: "{user_query}"
+Based *only* on the following provided context.
+**Instructions for Answering:**
+1.  **Natural Language:** Formulate your answer in a natural, conversational way. Avoid overly technical jargon unless the query implies a technical user.
+2.  **Conciseness:** Get straight to the point. Provide the information the user needs without unnecessary fluff.
+3.  **Markdown Formatting:** Use Markdown formatting where appropriate to enhance readability and clarity. This includes:
+    *   **Lists:** For sequences of steps or instructions, use bullet points (e.g., `- Item` or `* Item`) or numbered lists (e.g., `1. Item`). Ensure steps are clear and easy to follow.
+    *   **Emphasis:** Use bold (`**text**`) or italics (`*text*`) for emphasis where it aids understanding.
+    *   **Code Blocks:** If providing code snippets or commands, use Markdown code blocks (e.g., ```python\ncode\n``` or `inline code`).
+    *   **Headings:** For longer, structured answers, consider using Markdown headings (`## Heading`) if it improves organization, but use sparingly.
+    *   **Link Previews (IMPORTANT!):** If you include an external URL that the user would benefit from visiting (e.g., a support article, documentation), YOU MUST format it for a preview like this: `[PREVIEW](https://example.com/some-article)`. The system will then attempt to fetch the page title to make the link more informative. For any other links where a title preview is not necessary or for internal references, use standard Markdown: `[Visible Text](https://example.com)`.
+4.  **Relevance:** If the context contains information relevant to the user's query, synthesize it into a helpful answer.
+5.  **Address Specificity (If Applicable):**
+    *   If the user asks for a *specific section, notice, or type of document* and the context *does not explicitly contain that exact section title or document type*, clearly state that the specific "notice" or "section" was not found.
+    *   However, *crucially*, even if the specific "notice" or "section" is not found, if the context *does* contain general information related to the query, you MUST still provide that available relevant information to the user.
+6.  **Handling Insufficient Context:** If the context is genuinely insufficient or contains no relevant information at all, then politely state that you couldn't find specific information for that query.
+7.  **No Fabrication:** Do not make up information.
+8.  **Source Attribution (Subtle):**
+    *   Do NOT explicitly state "This information is from FAQ file X" or "According to SOP Y."
+    *   **Citing Web Sources**: If `Context (Source: ...)` indicates "Web Search" and your answer directly uses information from a specific article or support page URL found within that web search context, you **MUST** cite that URL. Use the `[PREVIEW](URL_HERE)` format for this citation.
+    *   For internal documents, integrate the information seamlessly.
+! important: If there are steps or points make sure that response is formatted in a way that is easy to follow, like using bullet points or numbered lists.
+Context (Source: {source_type_used}):
+"{context}"
+---
+Answer:
+"""
+
+TICKET_ASSIGNMENT_PROMPT_TEMPLATE = """
+You are an AI assistant helping to intelligently route IT support tickets.
+Analyze the following IT support query, the chatbot's attempted resolution (if any), and any user feedback.
+Based on this information, determine the appropriate assignment level (L1 or L2) and priority (Low, Medium, or High).
+**Guidelines for Assignment:**
+- **L1 Support:** Handles common, well-documented issues, password resets, basic software troubleshooting (e.g., "how to use X feature"), first-line connectivity problems, and information gathering for more complex issues. Queries that seem straightforward or have known solutions.
+- **L2 Support:** Handles complex technical problems, issues requiring administrative access or deeper system knowledge, bugs in software/systems, problems where L1 troubleshooting has likely failed or is insufficient, or issues with broader impact.
+- **Priority - High:** User is completely blocked from performing critical work, a system-wide service is down for the user, or a security concern is raised. Significant business impact.
+- **Priority - Medium:** User's work is significantly impacted or a core function is impaired, but some workarounds might exist or the issue is not completely blocking all activities.
+- **Priority - Low:** Minor issue, inconvenience, request for information that is not time-sensitive, or user can still perform most of their work.
+**Input Context:**
+User's Original Query: "{user_query}"
+Chatbot's Last Response to User: "{chatbot_response}"
+User Feedback (if provided, e.g., "Not helpful"): "{user_feedback}"
+**Output Instructions:**
+Provide your response strictly in JSON format with the following keys:
+- "assignment_level": "L1" or "L2"
+- "priority": "Low", "Medium", or "High" (Do not use "Urgent" or "Lowest" for now)
+- "reasoning": "A brief (1-2 sentences) explanation for your assignment and priority choice."
+- "suggested_category": "A brief category for the issue (e.g., 'VPN', 'Password Reset', 'Software Install', 'Hardware Failure', 'Network Connectivity', 'Application Error')."
+Example JSON Output:
+{{
+  "assignment_level": "L1",
+  "priority": "Medium",
+  "reasoning": "User is unable to connect to VPN. Standard L1 troubleshooting steps for VPN connectivity should be attempted first. Priority is Medium as it likely impacts user's ability to perform some tasks.",
+  "suggested_category": "VPN"
+}}
+Now, analyze the provided input:
+User's Original Query: "{user_query}"
+Chatbot's Last Response to User: "{chatbot_response}"
+User Feedback: "{user_feedback}"
+"""
+
+# Single-call pipeline (rag_pipeline.PIPELINE_MODE="single_call"): classification, relevance check and answer in one response.
+ANALYZE_AND_ANSWER_PROMPT_TEMPLATE = """
+User Query: "{user_query}"
+Current Assistant Mode: "{assistant_mode}" # e.g., "IT" or "HR"
+Retrieved Context Snippet(s) from Internal {assistant_mode} Documents (retrieved with the raw query):
+---
+{retrieved_context}
+---
+You are the L1 {assistant_mode} support chatbot. Do all three steps below and reply with a single JSON object only.
+
+Step 1 - Classify the query as "best_source":
+- "Internal_Docs": clearly related to {assistant_mode} and likely answerable by internal {assistant_mode} documents.
+- "Web_Search_IT": (ONLY when the mode is IT) IT-related but too new, specific, or about third-party software not covered internally.
+- "Greeting": simple social greetings like "hi", "hello", "how are you?".
+- "TopicMismatch": clearly about the *other* department. HR topics: employee policies (dress code, leave, work from home), payroll, benefits, recruitment, onboarding, performance, Keka. IT topics: hardware (laptop, printer), software, VPN/Wi-Fi, passwords, system access, IT security. If unsure, prefer "Internal_Docs".
+- "OutOfScope": not related to IT or HR support, or gibberish.
+Also give "simplified_query_for_search": a concise version of the query for semantic search (or a note such as "HR query: dress code policy" or "greeting").
+
+Step 2 - Only if best_source is "Internal_Docs": set "context_relevant" to "YES" if the retrieved context is highly likely to contain a direct and useful answer to the query, otherwise "NO". The context is only relevant if it directly addresses the main subject of the query, not if it is vaguely related.
+
+Step 3 - Only if best_source is "Internal_Docs" and context_relevant is "YES": write "answer" based *only* on the retrieved context:
+- Natural, conversational and concise; no fabrication.
+- Use Markdown: numbered or bulleted lists for steps, bold for emphasis, code blocks for commands.
+- For an external URL the user should visit, use `[PREVIEW](https://example.com/some-article)`; otherwise `[Visible Text](https://example.com)`.
+- If a specific notice or section was asked for but is not in the context, say so, and still give the related information that is there.
+- Do NOT say which file the information came from.
+Otherwise set "answer" to "".
+
+Output strictly this JSON (escape newlines inside "answer" as \\n):
+{{
+  "best_source": "Internal_Docs" | "Web_Search_IT" | "Greeting" | "TopicMismatch" | "OutOfScope",
+  "simplified_query_for_search": "concise version of the query or note",
+  "context_relevant": "YES" | "NO",
+  "answer": "Markdown answer or empty string"
+}}
+"""
@@ -0,0 +1,103 @@
+# chatbot_vectorstore.py
+import os
+
+from chatbot_logging import logger
+from chatbot_documents import (load_it_documents, load_hr_documents_from_folder, list_it_source_files, iter_it_source_file,
+                               list_hr_source_files, iter_hr_document_file)
+from index_manifest import FAISS_INCREMENTAL, index_settings, load_manifest, sync_faiss_index
+from index_versions import current_version_path
+
+# --- VECTOR STORE & RETRIEVAL (Generic and Specific) ---
+FAISS_MMAP = os.getenv("FAISS_MMAP", "False").lower() == "true"
+# Indexes are built offline with build_indexes.py and servers only load the version CURRENT points at. Set this to
+# true to get the old behaviour back (build a missing index, or rebuild with force_recreate, during startup).
+INDEX_BUILD_ON_STARTUP = os.getenv("INDEX_BUILD_ON_STARTUP", "False").lower() == "true"
+
+# mode -> (index name, base path, whole-corpus loader, source file lister, per-file loader); shared with build_indexes.py
+INDEX_SPECS = {
+    "it": ("faiss_it_combined_index", "data/vector_store_it", load_it_documents, list_it_source_files, iter_it_source_file),
+    "hr": ("faiss_hr_documents_index", "data/vector_store_hr", load_hr_documents_from_folder, list_hr_source_files, iter_hr_document_file),
+}
+
+def load_faiss_index(index_path, embedding_model, mmap=FAISS_MMAP):
+    """FAISS.load_local, optionally memory-mapping the vectors so forked workers share the OS page cache."""
+    from langchain_community.vectorstores import FAISS
+    if not mmap: return FAISS.load_local(index_path, embedding_model, allow_dangerous_deserialization=True)
+    import faiss, pickle
+    # IO_FLAG_MMAP_IFC maps flat (IndexFlat*) codes too; plain IO_FLAG_MMAP only covers IVF lists.
+    mmap_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+    index = faiss.read_index(os.path.join(index_path, "index.faiss"), mmap_flag | faiss.IO_FLAG_READ_ONLY)
+    with open(os.path.join(index_path, "index.pkl"), "rb") as f: docstore, index_to_docstore_id = pickle.load(f)
+    logger.info(f"FAISS index at {index_path} opened memory-mapped ({index.ntotal} vectors).")
+    return FAISS(embedding_model, index, docstore, index_to_docstore_id)
+
+def create_or_load_faiss_index(index_name, docs_loader_func, embedding_model,
+                               vector_store_base_path, force_recreate=False, source_files_func=None, file_loader_func=None):
+    """Loads the index from disk; builds it when missing or force_recreate is set. Given the per-file source
+    functions (and FAISS_INCREMENTAL), a build only re-parses and re-embeds files that changed since the last one."""
+    os.makedirs(vector_store_base_path, exist_ok=True)
+    index_path = os.path.join(vector_store_base_path, index_name)
+    if os.path.exists(index_path) and not force_recreate:
+        logger.info(f"Loading existing FAISS index from: {index_path}")
+        try: return load_faiss_index(index_path, embedding_model)
+        except Exception as e: logger.warning(f"Error loading FAISS index '{index_name}' from {index_path}: {e}. Recreating.", exc_info=True)
+    else: logger.info(f"Force recreate is {force_recreate} or index not found at {index_path}. Will attempt to create.")
+    if FAISS_INCREMENTAL and source_files_func and file_loader_func:
+        logger.info(f"Syncing FAISS index: '{index_name}' at {vector_store_base_path}")
+        try: return sync_faiss_index(index_path, source_files_func(), file_loader_func, embedding_model)[0]
+        except Exception as e: logger.error(f"Error syncing FAISS index '{index_name}': {e}", exc_info=True); return None
+    logger.info(f"Creating FAISS index: '{index_name}' at {vector_store_base_path}")
+    docs = docs_loader_func()
+    if not docs: logger.warning(f"No documents for '{index_name}'. Index not created."); return None
+    try:
+        from langchain_community.vectorstores import FAISS
+        from embedding_cache import embeddings_for_build
+        vector_store = FAISS.from_documents(docs, embeddings_for_build(embedding_model))
+        vector_store.embedding_function = embedding_model
+        vector_store.save_local(index_path)
+        logger.info(f"FAISS index '{index_name}' created and saved to {index_path}.")
+        return vector_store
+    except Exception as e: logger.error(f"Error creating FAISS index '{index_name}': {e}", exc_info=True); return None
+
+def load_prebuilt_index(index_path, embedding_model):
+    """The version of the index CURRENT points at, or None. Refuses a version built with another embedding model,
+    whose vectors would not be comparable with this model's query vectors."""
+    version_path = current_version_path(index_path)
+    if not version_path: return None
+    manifest = load_manifest(version_path) or {}
+    built_with, serving_with = manifest.get("settings", {}).get("embedding_model"), index_settings(embedding_model)["embedding_model"]
+    if built_with != serving_with:
+        logger.error(f"Index version {version_path} was built with '{built_with}', server uses '{serving_with}'. Not loading it."); return None
+    vector_store = load_faiss_index(version_path, embedding_model)
+    logger.info(f"Loaded FAISS index version {manifest.get('version')} from {version_path} ({vector_store.index.ntotal} vectors).")
+    return vector_store
+
+def get_index_vector_store(mode, embedding_model, force_recreate=False):
+    """Serving-path load of the IT or HR index: the prebuilt CURRENT version, else the legacy flat index if one is on
+    disk. Nothing is built here unless INDEX_BUILD_ON_STARTUP is set."""
+    index_name, base_path, docs_loader_func, source_files_func, file_loader_func = INDEX_SPECS[mode]
+    index_path = os.path.join(base_path, index_name)
+    if INDEX_BUILD_ON_STARTUP and force_recreate:
+        return create_or_load_faiss_index(index_name, docs_loader_func, embedding_model, base_path, force_recreate, source_files_func, file_loader_func)
+    if force_recreate: logger.warning(f"force_recreate ignored for '{index_name}': rebuild it with `python build_indexes.py {mode} --force`.")
+    try:
+        vector_store = load_prebuilt_index(index_path, embedding_model)
+        if vector_store: return vector_store
+    except Exception as e: logger.error(f"Error loading current version of FAISS index '{index_name}': {e}", exc_info=True)
+    if INDEX_BUILD_ON_STARTUP:
+        return create_or_load_faiss_index(index_name, docs_loader_func, embedding_model, base_path, False, source_files_func, file_loader_func)
+    if os.path.exists(os.path.join(index_path, "index.faiss")):
+        logger.warning(f"No built version of '{index_name}'; loading the legacy index at {index_path}. Run `python build_indexes.py {mode}`.")
+        try: return load_faiss_index(index_path, embedding_model)
+        except Exception as e: logger.error(f"Error loading FAISS index '{index_name}' from {index_path}: {e}", exc_info=True); return None
+    logger.error(f"No FAISS index '{index_name}' to load. Build it with `python build_indexes.py {mode}`."); return None
+
+def get_it_retriever(embedding_model, force_recreate=False, k_results=5):
+    vector_store = get_index_vector_store("it", embedding_model, force_recreate)
+    if vector_store: return vector_store.as_retriever(search_kwargs={"k": k_results})
+    logger.warning(f"IT vector store '{INDEX_SPECS['it'][0]}' not available."); return None
+
+def get_hr_retriever(embedding_model, force_recreate=False, k_results=3):
+    vector_store = get_index_vector_store("hr", embedding_model, force_recreate)
+    if vector_store: return vector_store.as_retriever(search_kwargs={"k": k_results})
+    logger.warning(f"HR vector store '{INDEX_SPECS['hr'][0]}' not available."); return None
@@ -0,0 +1,82 @@
+# chatbot_web.py
+import re
+from typing import Any, Dict
+
+from chatbot_logging import logger
+
+# --- SEARCH TOOL ---
+def perform_duckduckgo_search(query_text: str, max_results: int = 3) -> str:
+    from duckduckgo_search import DDGS
+    logger.info(f"DDG search: '{query_text}' (max_results={max_results})")
+    try:
+        with DDGS() as ddgs: search_results = list(ddgs.text(query_text, max_results=max_results))
+        if not search_results: return "Web search did not yield specific results."
+        return "Web Search Results:\n\n" + "\n---\n".join([f"Title: {r.get('title', 'N/A')}\nURL: {r.get('href', 'N/A')}\nSnippet: {r.get('body', 'N/A')}" for r in search_results]).strip()
+    except Exception as e: logger.error(f"DDG search error: {e}", exc_info=True); return "Web search failed."
+
+# --- URL TITLE FETCHER ---
+def fetch_url_title(url: str) -> str:
+    import requests
+    from bs4 import BeautifulSoup
+    logger.info(f"Fetching title for URL: {url}")
+    try:
+        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
+        response = requests.get(url, headers=headers, timeout=5, allow_redirects=True)
+        response.raise_for_status()
+        soup = BeautifulSoup(response.content, 'html.parser')
+        title_tag = soup.find('title')
+        if title_tag and title_tag.string: return title_tag.string.strip()
+        h1_tag = soup.find('h1')
+        if h1_tag and h1_tag.string: return h1_tag.string.strip()
+        og_title = soup.find("meta", property="og:title")
+        if og_title and og_title.get("content"): return og_title["content"].strip()
+        return url 
+    except requests.exceptions.RequestException as e: logger.error(f"Request error fetching title for {url}: {e}", exc_info=False); return url
+    except Exception as e: logger.error(f"Generic error fetching title for {url}: {e}", exc_info=True); return url
+
+# --- LINK EXTRACTION ---
+def extract_and_prepare_links(markdown_text: str):
+    processed_text = markdown_text; links_data = []
+    link_pattern = re.compile(r'\[([^\]]*)\]\(([^)]+)\)')
+    matches_for_text_replacement = []
+    unique_links_by_url: Dict[str, Dict[str, Any]] = {}
+
+    for match in link_pattern.finditer(markdown_text):
+        original_markdown_link_text = match.group(1).strip()
+        url = match.group(2).strip()
+        is_preview_style = (original_markdown_link_text.upper() == "PREVIEW")
+        matches_for_text_replacement.append({
+            "start": match.start(), "end": match.end(),
+            "original_text": original_markdown_link_text,
+            "is_preview_style": is_preview_style, "url": url
+        })
+        if url not in unique_links_by_url:
+            unique_links_by_url[url] = {"url": url, "text_options": [original_markdown_link_text], "is_preview_style_option": is_preview_style}
+        else:
+            unique_links_by_url[url]["text_options"].append(original_markdown_link_text)
+            if is_preview_style: unique_links_by_url[url]["is_preview_style_option"] = True
+    
+    titles_by_url = {url: fetch_url_title(url) for url in unique_links_by_url} # One fetch per URL, reused for placeholders below
+    for url, link_details in unique_links_by_url.items():
+        title = titles_by_url[url]
+        button_text = "View Link" 
+        valid_texts = [t for t in link_details["text_options"] if t and t.upper() != "PREVIEW"]
+        if valid_texts: button_text = min(valid_texts, key=len) 
+        elif title != url : button_text = title
+        links_data.append({"url": url, "text": button_text, "title_preview": title if title != url else url})
+
+    matches_for_text_replacement.sort(key=lambda x: x["start"], reverse=True)
+    temp_processed_text_list = list(markdown_text)
+    for rep_info in matches_for_text_replacement:
+        title_for_placeholder = titles_by_url[rep_info["url"]]
+        placeholder_text = rep_info["original_text"]
+        if not placeholder_text or rep_info["is_preview_style"]:
+            if title_for_placeholder != rep_info["url"]: placeholder_text = title_for_placeholder
+            else: placeholder_text = "link details" 
+        replacement_span = f" ({placeholder_text} - see link below)"
+        temp_processed_text_list[rep_info["start"]:rep_info["end"]] = list(replacement_span)
+    processed_text = "".join(temp_processed_text_list)
+            
+    logger.info(f"Extracted links data (v3): {links_data}")
+    logger.debug(f"Processed text (links replaced v3): {processed_text[:300]}...")
+    return processed_text, links_data
@@ -0,0 +1,159 @@
+# classification_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from async_utils import run_blocking
+from chatbot_logging import logger
+from chatbot_llm import clean_json_response
+from chatbot_prompts import INITIAL_ANALYSIS_PROMPT_TEMPLATE
+from rag_pipeline import VALID_SOURCES
+
+# --- CLASSIFICATION CACHE CONFIG ---
+CLASSIFICATION_CACHE_ENABLED = os.getenv("CLASSIFICATION_CACHE_ENABLED", "True").lower() == "true"
+CLASSIFICATION_CACHE_TTL_SECONDS = float(os.getenv("CLASSIFICATION_CACHE_TTL_SECONDS", str(12 * 3600)))
+CLASSIFICATION_CACHE_MAX_ENTRIES = int(os.getenv("CLASSIFICATION_CACHE_MAX_ENTRIES", "5000")) # In-memory LRU bound
+CLASSIFICATION_CACHE_DB_PATH = os.getenv("CLASSIFICATION_CACHE_DB_PATH", "") # e.g. data/classifications.db; empty = memory only
+
+# Persisted entries written under a different analysis prompt are never read back.
+PROMPT_VERSION = hashlib.sha1(INITIAL_ANALYSIS_PROMPT_TEMPLATE.encode("utf-8")).hexdigest()[:12]
+
+def normalize_query(query: str) -> str:
+    return " ".join((query or "").casefold().split()).rstrip(" ?!.")
+
+class ClassificationCache:
+    """Exact-match memo of INITIAL_ANALYSIS_PROMPT_TEMPLATE results, keyed by normalized query + assistant mode.
+
+    An in-process LRU with TTL; when db_path is set, entries are also written through to SQLite so they
+    survive restarts and are shared by every worker. Only well-formed classifications are stored.
+    classify() answers memo hits on the event loop and does the SQLite reads/writes on the "cache" executor.
+    """
+
+    def __init__(self, ttl_seconds: float = CLASSIFICATION_CACHE_TTL_SECONDS, max_entries: int = CLASSIFICATION_CACHE_MAX_ENTRIES,
+                 db_path: str = CLASSIFICATION_CACHE_DB_PATH, enabled: bool = CLASSIFICATION_CACHE_ENABLED):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.enabled = enabled
+        self._entries = OrderedDict() # key -> (expires_at, analysis dict)
+        self._lock = threading.Lock() # Memo and metrics
+        self._db_lock = threading.Lock() # SQLite connection; never held together with _lock, so memo hits don't wait on disk
+        self._db, self._db_pid = None, None
+        self._metrics = {"hits": 0, "persisted_hits": 0, "misses": 0, "stores": 0, "evicted_lru": 0, "expired": 0}
+        if self.enabled and self.db_path:
+            db_dir = os.path.dirname(db_path)
+            if db_dir: os.makedirs(db_dir, exist_ok=True)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS query_classifications (cache_key TEXT PRIMARY KEY, analysis TEXT NOT NULL, expires_at REAL NOT NULL)")
+            self._conn.execute("DELETE FROM query_classifications WHERE expires_at <= ?", (time.time(),))
+            logger.info(f"Classification cache persisted at {db_path}.")
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # Opened per process: the cache may be created before gunicorn forks its workers.
+        if self._db_pid != os.getpid():
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db_pid = os.getpid()
+        return self._db
+
+    @staticmethod
+    def cache_key(query: str, mode: str) -> str:
+        return f"{PROMPT_VERSION}|{(mode or 'GENERAL').upper()}|{normalize_query(query)}"
+
+    def get(self, query: str, mode: str) -> Optional[dict]:
+        if not self.enabled or not normalize_query(query): return None
+        key = self.cache_key(query, mode)
+        return self._get_memory(key) or (self._get_persisted(key) if self.db_path else self._count_miss())
+
+    async def get_async(self, query: str, mode: str) -> Optional[dict]:
+        if not self.enabled or not normalize_query(query): return None
+        key = self.cache_key(query, mode)
+        cached = self._get_memory(key)
+        if cached or not self.db_path: return cached or self._count_miss()
+        return await run_blocking("cache", self._get_persisted, key)
+
+    def _get_memory(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] <= time.time():
+                del self._entries[key]; self._metrics["expired"] += 1; entry = None
+            if not entry: return None
+            self._entries.move_to_end(key); self._metrics["hits"] += 1
+            return dict(entry[1])
+
+    def _get_persisted(self, key: str) -> Optional[dict]:
+        with self._db_lock:
+            row = self._conn.execute("SELECT analysis, expires_at FROM query_classifications WHERE cache_key = ? AND expires_at > ?", (key, time.time())).fetchone()
+        if not row: return self._count_miss()
+        analysis = json.loads(row[0])
+        with self._lock:
+            self._put_locked(key, row[1], analysis)
+            self._metrics["hits"] += 1; self._metrics["persisted_hits"] += 1
+        return dict(analysis)
+
+    def _count_miss(self) -> None:
+        with self._lock: self._metrics["misses"] += 1
+
+    def put(self, query: str, mode: str, analysis: dict):
+        entry = self._put_memory(query, mode, analysis)
+        if entry and self.db_path: self._put_persisted(*entry)
+
+    async def put_async(self, query: str, mode: str, analysis: dict):
+        entry = self._put_memory(query, mode, analysis)
+        if entry and self.db_path: await run_blocking("cache", self._put_persisted, *entry)
+
+    def _put_memory(self, query: str, mode: str, analysis: dict) -> Optional[tuple]:
+        """Memoizes a well-formed analysis; returns (key, expires_at, analysis) for the SQLite write, or None."""
+        if not self.enabled or not normalize_query(query): return None
+        if not isinstance(analysis, dict) or analysis.get("best_source") not in VALID_SOURCES: return None
+        analysis = {k: analysis[k] for k in ("best_source", "simplified_query_for_search") if k in analysis}
+        key, expires_at = self.cache_key(query, mode), time.time() + self.ttl_seconds
+        with self._lock:
+            self._put_locked(key, expires_at, analysis)
+            self._metrics["stores"] += 1
+        return key, expires_at, analysis
+
+    def _put_persisted(self, key: str, expires_at: float, analysis: dict):
+        with self._db_lock:
+            self._conn.execute("INSERT INTO query_classifications (cache_key, analysis, expires_at) VALUES (?, ?, ?) "
+                               "ON CONFLICT(cache_key) DO UPDATE SET analysis = excluded.analysis, expires_at = excluded.expires_at",
+                               (key, json.dumps(analysis), expires_at))
+
+    def _put_locked(self, key: str, expires_at: float, analysis: dict):
+        self._entries[key] = (expires_at, analysis)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False); self._metrics["evicted_lru"] += 1
+
+    async def classify(self, llm, query: str, mode: str, session_id: str = "-") -> Optional[dict]:
+        """Parsed analysis JSON for (query, mode): from the memo, else one Gemini call whose valid result is memoized.
+
+        Returns None when the model's output can't be parsed; LLM errors propagate to the caller as before.
+        """
+        cached = await self.get_async(query, mode)
+        if cached:
+            logger.info(f"SID: {session_id} | Classification cache hit for '{query}' ({mode}): {cached.get('best_source')}")
+            return cached
+        if not llm: raise Exception("LLM not initialized for query analysis.")
+        analysis_response = await llm.generate_content_async(INITIAL_ANALYSIS_PROMPT_TEMPLATE.format(user_query=query, assistant_mode=(mode or "General").upper()), stage="analysis")
+        logger.debug(f"SID: {session_id} | RAW LLM Analysis Response Text: {analysis_response.text}")
+        parsed_analysis = clean_json_response(analysis_response.text)
+        await self.put_async(query, mode, parsed_analysis)
+        return parsed_analysis
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._metrics["hits"] + self._metrics["misses"]
+            return {"enabled": self.enabled, "persistent": bool(self.db_path), "entries": len(self._entries),
+                    "hit_rate": round(self._metrics["hits"] / lookups, 3) if lookups else 0.0, **self._metrics}
+
+    def close(self):
+        with self._db_lock:
+            if self._db is not None and self._db_pid == os.getpid(): self._db.close()
+            self._db, self._db_pid = None, None
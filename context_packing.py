@@ -0,0 +1,100 @@
+# context_packing.py
+import os
+import re
+import threading
+
+# --- CONTEXT PACKING CONFIG ---
+# Retrieved chunks are packed to a per-stage token budget instead of being joined as-is: chunks the splitter cut
+# from the same source/page are stitched back together at their overlap (chunk_overlap=150), duplicates are
+# dropped, and long blocks keep only the sentences that share terms with the query (plus their neighbours).
+CONTEXT_PACKING = os.getenv("CONTEXT_PACKING", "True").lower() == "true"
+CONTEXT_TOKENS_RELEVANCE = int(os.getenv("CONTEXT_TOKENS_RELEVANCE", "750")) # The old [:3000] characters
+CONTEXT_TOKENS_GENERATION = int(os.getenv("CONTEXT_TOKENS_GENERATION", "2000"))
+CONTEXT_TOKENS_SINGLE_CALL = int(os.getenv("CONTEXT_TOKENS_SINGLE_CALL", "1500"))
+CONTEXT_EXTRACT_MIN_TOKENS = int(os.getenv("CONTEXT_EXTRACT_MIN_TOKENS", "150")) # Smaller blocks (e.g. one FAQ) are kept whole
+CONTEXT_SENTENCE_WINDOW = int(os.getenv("CONTEXT_SENTENCE_WINDOW", "1")) # Neighbouring sentences kept around each match
+
+_STOPWORDS = {"a", "an", "the", "to", "of", "for", "in", "on", "at", "by", "with", "from", "and", "or", "is", "are", "was", "be",
+              "do", "does", "i", "my", "me", "we", "our", "you", "your", "it", "this", "that", "how", "what", "can", "query", "about"}
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+|\n+")
+
+_stats_lock = threading.Lock()
+_packing_stats = {"packed_contexts": 0, "context_tokens_raw": 0, "context_tokens_packed": 0}
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4) # ~4 characters per token for English text on Gemini
+
+def query_terms(text: str) -> set:
+    # Five-letter prefixes are a cheap stand-in for stemming ("connect", "connection", "connecting").
+    return {word[:5] for word in re.findall(r"[a-z0-9]+", (text or "").lower()) if word not in _STOPWORDS}
+
+def format_docs_context(docs) -> str:
+    return "\n\n---\n\n".join([f"Source: {d.metadata.get('source', 'Document')}\n{d.page_content}" for d in docs])
+
+def _overlap(first: str, second: str, min_chars: int = 20, max_chars: int = 400) -> int:
+    """Length of the longest suffix of `first` that is a prefix of `second` (0 if shorter than min_chars)."""
+    for size in range(min(len(first), len(second), max_chars), min_chars - 1, -1):
+        if first.endswith(second[:size]): return size
+    return 0
+
+def merge_chunks(docs) -> list:
+    """[(source, text)] in rank order of each block's best chunk; overlapping chunks of one source/page are stitched."""
+    blocks, order, seen = {}, [], set()
+    for doc in docs:
+        text = doc.page_content.strip()
+        normalized = " ".join(text.split())
+        if not text or normalized in seen: continue
+        seen.add(normalized)
+        key = (doc.metadata.get("source", "Document"), doc.metadata.get("page"))
+        if key not in blocks:
+            blocks[key] = text; order.append(key); continue
+        block = blocks[key]
+        if text in block: continue
+        if _overlap(block, text): blocks[key] = block + text[_overlap(block, text):]
+        elif _overlap(text, block): blocks[key] = text + block[_overlap(text, block):]
+        else: blocks[key] = f"{block}\n…\n{text}"
+    return [(key[0], blocks[key]) for key in order]
+
+def extract_relevant(text: str, terms: set, window: int = CONTEXT_SENTENCE_WINDOW) -> str:
+    """The sentences of a long block that share a term with the query, with `window` neighbours; "" if none match."""
+    if estimate_tokens(text) <= CONTEXT_EXTRACT_MIN_TOKENS or not terms: return text
+    sentences = [sentence.strip() for sentence in _SENTENCE_BREAK.split(text) if sentence.strip()]
+    hits = [i for i, sentence in enumerate(sentences) if query_terms(sentence) & terms]
+    if not hits: return ""
+    keep = sorted({j for i in hits for j in range(i - window, i + window + 1) if 0 <= j < len(sentences)})
+    pieces = []
+    for position, index in enumerate(keep):
+        if position and index != keep[position - 1] + 1: pieces.append("…")
+        pieces.append(sentences[index])
+    return " ".join(pieces)
+
+def pack_context(docs, queries, token_budget: int) -> str:
+    """Context for a prompt stage: merged, deduplicated, query-focused chunks in rank order, within token_budget."""
+    if not docs: return ""
+    terms = set().union(*(query_terms(query) for query in queries))
+    parts, used = [], 0
+    for rank, (source, text) in enumerate(merge_chunks(docs)):
+        extracted = extract_relevant(text, terms) or (text if rank == 0 else "") # The best hit is never dropped outright
+        if not extracted: continue
+        part = f"Source: {source}\n{extracted}"
+        cost = estimate_tokens(part)
+        if used + cost > token_budget:
+            remaining_chars = (token_budget - used) * 4
+            if remaining_chars >= 200: parts.append(part[:remaining_chars].rsplit(" ", 1)[0] + " …")
+            break
+        parts.append(part); used += cost
+    packed = "\n\n---\n\n".join(parts)
+    with _stats_lock:
+        _packing_stats["packed_contexts"] += 1
+        _packing_stats["context_tokens_raw"] += estimate_tokens(format_docs_context(docs))
+        _packing_stats["context_tokens_packed"] += estimate_tokens(packed)
+    return packed
+
+def build_context(docs, queries, token_budget: int, legacy_char_limit: int = 0) -> str:
+    """pack_context(), or with CONTEXT_PACKING=false the previous join (cut at legacy_char_limit characters when set)."""
+    if CONTEXT_PACKING: return pack_context(docs, queries, token_budget)
+    context = format_docs_context(docs)
+    return context[:legacy_char_limit] if legacy_char_limit else context
+
+def get_packing_stats() -> dict:
+    with _stats_lock: return dict(_packing_stats)
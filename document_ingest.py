@@ -0,0 +1,104 @@
+# document_ingest.py
+import multiprocessing
+import os
+import pickle
+import shutil
+import tempfile
+import time
+
+from chatbot_logging import logger
+
+# --- PARALLEL, STREAMING PARSING CONFIG ---
+# PDF/DOCX/XLSX parsing is CPU-bound, so index builds parse files in worker processes, one process per file and
+# up to INGEST_WORKERS at a time. A worker writes its chunks to a spill file on local disk in batches of
+# INGEST_BATCH_CHUNKS as pages are parsed, and the builder reads them back batch by batch. Workers never wait for
+# the builder, and builder memory stays at a few batches whatever the file or corpus size. A file that raises,
+# crashes the parser or is not fully parsed INGEST_FILE_TIMEOUT_SECONDS after its worker started is killed and
+# reported without affecting the rest. Files come back in input order, so builds are reproducible.
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(min(4, os.cpu_count() or 1)))) # <= 1 parses in-process
+INGEST_FILE_TIMEOUT_SECONDS = float(os.getenv("INGEST_FILE_TIMEOUT_SECONDS", "600")) # Per file, from its worker's start
+INGEST_BATCH_CHUNKS = int(os.getenv("INGEST_BATCH_CHUNKS", "64")) # Chunks per parse -> embed -> add step
+INGEST_START_METHOD = os.getenv("INGEST_START_METHOD", "") # "" = platform default; "spawn" needs importable loaders
+INGEST_SPILL_DIR = os.getenv("INGEST_SPILL_DIR") or None # Parent of the per-build spill directory; None = system temp
+_POLL_SECONDS = 0.05 # How often the builder checks a spill file that has no complete batch yet
+
+class FileParseError(Exception):
+    """A file failed in a worker process: the parser raised, the process died, or it ran past its deadline."""
+
+def batched(items, size: int = INGEST_BATCH_CHUNKS):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size: yield batch; batch = []
+    if batch: yield batch
+
+def _parse_in_child(conn, file_iter, path, batch_size, spill_path):
+    # Batches are written as length-prefixed pickles, flushed one at a time so the builder can read while we parse.
+    # The pipe only carries the final status, so the worker never blocks on it.
+    try:
+        with open(spill_path, "ab") as spill:
+            for batch in batched(file_iter(path), batch_size):
+                payload = pickle.dumps(batch, protocol=pickle.HIGHEST_PROTOCOL)
+                spill.write(len(payload).to_bytes(8, "little") + payload); spill.flush()
+        conn.send(("done", None))
+    except Exception as e: conn.send(("error", f"{type(e).__name__}: {e}"))
+    finally: conn.close()
+
+def _read_spilled_batches(process, receiver, path, spill_path, deadline, timeout):
+    """Batches of one file, read from its spill file as the worker writes them; raises FileParseError if it fails."""
+    offset, status = 0, None
+    with open(spill_path, "rb") as spill:
+        while True:
+            spill.seek(offset)
+            header = spill.read(8)
+            if len(header) == 8:
+                size = int.from_bytes(header, "little")
+                payload = spill.read(size)
+                if len(payload) == size:
+                    offset += 8 + size; yield pickle.loads(payload); continue
+            if status == "done": return # Every batch is written before "done" is sent
+            if receiver.poll(max(0.0, min(_POLL_SECONDS, deadline - time.monotonic()))):
+                try: status, message = receiver.recv()
+                except EOFError: # Segfault, OOM kill, ...
+                    process.join(5); raise FileParseError(f"parser process for {path} died (exit code {process.exitcode})") from None
+                if status == "error": raise FileParseError(f"{path}: {message}")
+            elif time.monotonic() > deadline:
+                raise FileParseError(f"parsing {path} did not finish within {timeout:.0f}s")
+
+def iter_parsed_files(file_iter, paths, workers: int = INGEST_WORKERS, timeout: float = INGEST_FILE_TIMEOUT_SECONDS,
+                      batch_size: int = INGEST_BATCH_CHUNKS):
+    """Yields (path, batches) in input order, where `batches` yields lists of at most batch_size chunks of that file
+    and raises if the file fails. Consume each file's batches before moving to the next file."""
+    paths = list(paths)
+    if workers <= 1 or len(paths) <= 1:
+        for path in paths: yield path, batched(file_iter(path), batch_size)
+        return
+    context = multiprocessing.get_context(INGEST_START_METHOD or None)
+    spill_dir = tempfile.mkdtemp(prefix="ingest_spill_", dir=INGEST_SPILL_DIR)
+    running, next_to_start = {}, 0 # index -> (process, receiving end, spill path, deadline)
+    try:
+        for index, path in enumerate(paths):
+            while next_to_start < len(paths) and len(running) < workers:
+                spill_path = os.path.join(spill_dir, f"{next_to_start}.batches")
+                open(spill_path, "wb").close()
+                receiver, sender = context.Pipe(duplex=False)
+                process = context.Process(target=_parse_in_child, args=(sender, file_iter, paths[next_to_start], batch_size, spill_path), daemon=True)
+                process.start(); sender.close()
+                running[next_to_start] = (process, receiver, spill_path, time.monotonic() + timeout); next_to_start += 1
+            process, receiver, spill_path, deadline = running[index]
+            yield path, _read_spilled_batches(process, receiver, path, spill_path, deadline, timeout)
+            del running[index]
+            process.kill(); process.join(5); receiver.close() # Already exited unless the file failed or was abandoned
+            os.remove(spill_path)
+    finally:
+        for process, receiver, _, _ in running.values(): # Consumer stopped early
+            process.kill(); process.join(5); receiver.close()
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+def parse_files(file_iter, paths, workers: int = INGEST_WORKERS) -> list:
+    """All chunks of `paths` in input order; a file that fails contributes none (and is logged)."""
+    chunks = []
+    for path, batches in iter_parsed_files(file_iter, paths, workers):
+        try: chunks.extend([chunk for batch in batches for chunk in batch])
+        except Exception as e: logger.error(f"Error parsing {path}: {e}")
+    return chunks
@@ -0,0 +1,131 @@
+# embedding_cache.py
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from chatbot_logging import logger
+
+# --- EMBEDDING CACHE CONFIG ---
+# Index builds embed chunks through CachedEmbeddings: a chunk whose exact text was embedded before by the same
+# model (in either index, in any earlier build) is read back instead of re-encoded. Vectors live in an append-only
+# float32 file read through a memory map; a SQLite table maps sha256(text) -> row. One directory per model.
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "True").lower() == "true"
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "data/embedding_cache")
+EMBEDDING_CACHE_WRITE_ROWS = int(os.getenv("EMBEDDING_CACHE_WRITE_ROWS", "256")) # Misses encoded and persisted per step
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """sha256(text) -> float32 vector for one embedding model. Safe for several processes building at once:
+    appends happen inside a SQLite write transaction, which serializes writers."""
+
+    def __init__(self, model_name: str, cache_dir: str = EMBEDDING_CACHE_DIR):
+        self.model_name = model_name
+        self.directory = os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name))
+        self.vectors_path = os.path.join(self.directory, "vectors.f32")
+        self.db_path = os.path.join(self.directory, "index.db")
+        os.makedirs(self.directory, exist_ok=True)
+        self.dim = None
+        self._db, self._db_pid = None, None
+        self._map = None
+        self._lock = threading.Lock()
+        self._conn.execute("CREATE TABLE IF NOT EXISTS vectors (text_hash TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+        if row: self.dim = int(row[0])
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # Opened per process, like the other SQLite-backed stores.
+        if self._db_pid != os.getpid():
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None, timeout=60)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db_pid = os.getpid()
+        return self._db
+
+    def _vectors(self, rows_needed: int) -> np.ndarray:
+        if self._map is None or self._map.shape[0] < rows_needed:
+            rows = os.path.getsize(self.vectors_path) // (4 * self.dim)
+            self._map = np.memmap(self.vectors_path, dtype="float32", mode="r", shape=(rows, self.dim))
+        return self._map
+
+    def get_many(self, hashes: list) -> dict:
+        """{hash: vector} for the hashes that are cached."""
+        if not hashes or self.dim is None: return {}
+        rows = {}
+        with self._lock:
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start:start + 500]
+                query = f"SELECT text_hash, row FROM vectors WHERE text_hash IN ({','.join('?' * len(batch))})"
+                rows.update(self._conn.execute(query, batch).fetchall())
+            if not rows: return {}
+            vectors = self._vectors(max(rows.values()) + 1)
+            return {key: np.array(vectors[row]) for key, row in rows.items()}
+
+    def put_many(self, hashes: list, vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self.dim is None:
+                    stored = conn.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+                    self.dim = int(stored[0]) if stored else vectors.shape[1]
+                    conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('dim', ?)", (str(self.dim),))
+                if vectors.shape[1] != self.dim: raise ValueError(f"Vector size {vectors.shape[1]} does not match cache size {self.dim} for {self.model_name}")
+                # Rows past the last committed one (a writer that died before committing) are simply overwritten.
+                first_row = conn.execute("SELECT COALESCE(MAX(row), -1) + 1 FROM vectors").fetchone()[0]
+                with open(self.vectors_path, "r+b" if os.path.exists(self.vectors_path) else "wb") as f:
+                    f.seek(first_row * 4 * self.dim); f.write(vectors.tobytes()); f.flush(); os.fsync(f.fileno())
+                conn.executemany("INSERT OR IGNORE INTO vectors (text_hash, row) VALUES (?, ?)",
+                                 [(key, first_row + i) for i, key in enumerate(hashes)])
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK"); raise
+
+    def size(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+class CachedEmbeddings(Embeddings):
+    """Wraps an embedding model for index builds: embed_documents serves repeated texts from the EmbeddingCache and
+    encodes the rest in steps of EMBEDDING_CACHE_WRITE_ROWS (persisted as they finish). Queries pass straight through."""
+
+    def __init__(self, inner, cache: EmbeddingCache):
+        self.inner = inner
+        self.cache = cache
+        self.model_name = cache.model_name
+        self.metrics = {"texts": 0, "cache_hits": 0, "encoded": 0, "encode_seconds": 0.0}
+
+    def embed_documents(self, texts: list) -> list:
+        hashes = [text_hash(text) for text in texts]
+        found = self.cache.get_many(list(dict.fromkeys(hashes)))
+        missing = list(dict.fromkeys(h for h in hashes if h not in found)) # Duplicate texts are encoded once
+        text_by_hash = dict(zip(hashes, texts))
+        for start in range(0, len(missing), EMBEDDING_CACHE_WRITE_ROWS):
+            batch = missing[start:start + EMBEDDING_CACHE_WRITE_ROWS]
+            started = time.perf_counter()
+            vectors = np.asarray(self.inner.embed_documents([text_by_hash[h] for h in batch]), dtype="float32")
+            self.metrics["encode_seconds"] += time.perf_counter() - started
+            self.cache.put_many(batch, vectors)
+            found.update(zip(batch, vectors))
+        missing_set = set(missing)
+        self.metrics["texts"] += len(texts); self.metrics["encoded"] += len(missing)
+        self.metrics["cache_hits"] += sum(1 for h in hashes if h not in missing_set)
+        return [found[h].tolist() for h in hashes]
+
+    def embed_query(self, text: str) -> list:
+        return self.inner.embed_query(text)
+
+def embeddings_for_build(embedding_model, enabled: bool = EMBEDDING_CACHE_ENABLED):
+    """The model wrapped in CachedEmbeddings (or unchanged when disabled or the cache can't be opened)."""
+    if not enabled or isinstance(embedding_model, CachedEmbeddings): return embedding_model
+    try: return CachedEmbeddings(embedding_model, EmbeddingCache(getattr(embedding_model, "model_name", type(embedding_model).__name__)))
+    except Exception as e:
+        logger.warning(f"Embedding cache unavailable ({e}); embedding without it."); return embedding_model
@@ -0,0 +1,25 @@
+# gunicorn.conf.py
+# Multi-worker deployment that loads the embedding model and FAISS indexes once, before forking:
+#   python build_indexes.py   # Indexes are built offline; workers only load the CURRENT version
+#   gunicorn main2:app -c gunicorn.conf.py
+# Workers share those pages copy-on-write, and FAISS vectors are memory-mapped from disk, so total
+# memory grows by a small per-worker overhead rather than a full model + index copy per worker.
+# (Plain `uvicorn --workers N` spawns fresh interpreters and cannot share anything.)
+import gc
+import os
+
+os.environ.setdefault("PRELOAD_SHARED_RESOURCES", "True")
+os.environ.setdefault("FAISS_MMAP", "True")
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.getenv("GUNICORN_PRELOAD", "True").lower() == "true"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "180"))
+
+def when_ready(server):
+    # Runs in the master after the app (and its shared resources) is loaded, just before workers fork.
+    # Freezing moves every object allocated so far out of the collector's reach, so garbage collections
+    # in the workers don't write to those pages and un-share them.
+    gc.freeze()
+    server.log.info(f"Preloaded app; {gc.get_freeze_count()} objects frozen before forking {workers} workers.")
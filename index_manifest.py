@@ -0,0 +1,158 @@
+# index_manifest.py
+import hashlib
+import json
+import os
+import time
+from typing import Optional
+
+from chatbot_logging import logger
+from chatbot_documents import CHUNK_SIZE, CHUNK_OVERLAP
+from document_ingest import batched, iter_parsed_files
+
+# --- INCREMENTAL INDEX CONFIG ---
+# Each FAISS index directory carries manifest.json: source file -> content hash -> the docstore IDs of its chunks.
+# A rebuild re-parses and re-embeds only added or changed files and deletes the vectors of removed ones, so its
+# cost follows what changed. Parsed chunks are cached by file hash, so a file that comes back unchanged (or an
+# index rebuilt from scratch for the same sources) is not parsed again. Files stream through parse -> embed -> add
+# in batches of INGEST_BATCH_CHUNKS, so memory use does not grow with file or corpus size.
+FAISS_INCREMENTAL = os.getenv("FAISS_INCREMENTAL", "True").lower() == "true"
+PARSED_CACHE_DIR = os.getenv("PARSED_CACHE_DIR", "data/parsed_cache")
+MANIFEST_FILENAME = "manifest.json"
+MANIFEST_FORMAT = 1
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""): digest.update(block)
+    return digest.hexdigest()
+
+def index_settings(embedding_model) -> dict:
+    """What the vectors depend on besides the files; a manifest with other settings forces a full rebuild."""
+    return {"format": MANIFEST_FORMAT, "embedding_model": getattr(embedding_model, "model_name", type(embedding_model).__name__),
+            "chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP}
+
+def load_manifest(index_path: str) -> Optional[dict]:
+    path = os.path.join(index_path, MANIFEST_FILENAME)
+    if not os.path.exists(path): return None
+    try:
+        with open(path, "r", encoding="utf-8") as f: return json.load(f)
+    except Exception as e: logger.warning(f"Unreadable index manifest {path}: {e}"); return None
+
+def save_manifest(index_path: str, manifest: dict):
+    path = os.path.join(index_path, MANIFEST_FILENAME)
+    with open(path + ".tmp", "w", encoding="utf-8") as f: json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path) # Readers never see a half-written manifest
+
+def chunk_id_prefix(source_key: str, file_hash: str) -> str:
+    return hashlib.sha256(f"{source_key}|{file_hash}".encode()).hexdigest()[:16] # Two copies of one file get distinct IDs
+
+def _parsed_cache_path(path: str, file_hash: str, file_loader) -> str:
+    # Loader and file name are part of the key: chunk metadata carries both (doc_type, source).
+    key = hashlib.sha256(f"{file_hash}|{os.path.basename(path)}|{file_loader.__module__}.{file_loader.__name__}|{CHUNK_SIZE}|{CHUNK_OVERLAP}".encode()).hexdigest()
+    return os.path.join(PARSED_CACHE_DIR, f"{key}.jsonl")
+
+def _read_parsed_cache(cache_path: str):
+    """Batches of cached chunks, one JSON line per chunk."""
+    from langchain_core.documents import Document
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            yield from batched(Document(page_content=item["page_content"], metadata=item["metadata"]) for item in map(json.loads, f))
+    except (OSError, ValueError, KeyError):
+        if os.path.exists(cache_path): os.remove(cache_path) # Unreadable entry: the file is re-parsed on the next build
+        raise
+
+def _write_parsed_cache(cache_path: str, batches):
+    """Passes batches through while writing them to the cache; the entry only appears once the file parsed fully.
+    Files that yield no chunks (e.g. scanned PDFs) are not cached, so they are retried on the next build."""
+    os.makedirs(PARSED_CACHE_DIR, exist_ok=True)
+    written = 0
+    try:
+        with open(cache_path + ".tmp", "w", encoding="utf-8") as f:
+            for batch in batches:
+                for d in batch: f.write(json.dumps({"page_content": d.page_content, "metadata": d.metadata}) + "\n")
+                written += len(batch)
+                yield batch
+        if written: os.replace(cache_path + ".tmp", cache_path)
+    finally:
+        if os.path.exists(cache_path + ".tmp"): os.remove(cache_path + ".tmp")
+
+def iter_file_batches(paths: list, hashes: dict, file_loader, stats: dict):
+    """Yields (path, batches) in input order; cached files stream from the parsed-text cache, the rest are parsed in
+    worker processes (document_ingest.iter_parsed_files). Each file's batches must be consumed before the next."""
+    cache_paths = {path: _parsed_cache_path(path, hashes[path], file_loader) for path in paths}
+    to_parse = [path for path in paths if not os.path.exists(cache_paths[path])]
+    stats["files_parsed"] += len(to_parse)
+    parsed = iter_parsed_files(file_loader, to_parse)
+    for path in paths:
+        if path in to_parse: yield path, _write_parsed_cache(cache_paths[path], next(parsed)[1])
+        else: yield path, _read_parsed_cache(cache_paths[path])
+
+def _load_for_update(index_path: str, embedding_model, settings: dict):
+    """(vector_store, manifest) of the index on disk if it can be updated in place, else (None, None)."""
+    manifest = load_manifest(index_path)
+    if manifest is None: reason = "no manifest"
+    elif manifest.get("settings") != settings: reason = f"settings changed ({manifest.get('settings')} -> {settings})"
+    else:
+        try:
+            from chatbot_vectorstore import load_faiss_index
+            vector_store = load_faiss_index(index_path, embedding_model, mmap=False) # Must be writable
+            expected = sum(len(entry["chunk_ids"]) for entry in manifest["files"].values())
+            if vector_store.index.ntotal == expected: return vector_store, manifest
+            reason = f"index holds {vector_store.index.ntotal} vectors, manifest lists {expected}"
+        except Exception as e: reason = f"index not loadable ({e})"
+    if os.path.exists(index_path): logger.info(f"Full rebuild of {index_path}: {reason}.")
+    return None, None
+
+def sync_faiss_index(index_path: str, source_files: list, file_loader, embedding_model):
+    """Brings the FAISS index at index_path in line with source_files. Returns (vector_store or None, stats)."""
+    started = time.perf_counter()
+    settings = index_settings(embedding_model)
+    vector_store, manifest = _load_for_update(index_path, embedding_model, settings)
+    from embedding_cache import CachedEmbeddings, embeddings_for_build # numpy/LangChain: only needed when building
+    build_model = embeddings_for_build(embedding_model) # Unchanged chunk texts are not re-encoded; queries use the plain model
+    indexed = manifest["files"] if manifest else {}
+    current = {os.path.normpath(path): file_sha256(path) for path in source_files}
+    # Files recorded without chunks failed to parse last time; retry them.
+    stale = [key for key, entry in indexed.items() if key not in current or entry["sha256"] != current[key] or not entry["chunk_ids"]]
+    pending = [key for key in current if key not in indexed or key in stale]
+    stats = {"files": len(current), "unchanged": len(current) - len(pending), "added": sum(key not in indexed for key in pending),
+             "changed": sum(key in indexed for key in pending), "removed": sum(key not in current for key in stale),
+             "files_parsed": 0, "chunks_deleted": 0, "chunks_embedded": 0}
+    files = {key: entry for key, entry in indexed.items() if key not in stale}
+
+    stale_ids = [chunk_id for key in stale for chunk_id in indexed[key]["chunk_ids"]]
+    if vector_store is not None and stale_ids:
+        vector_store.delete(stale_ids); stats["chunks_deleted"] = len(stale_ids)
+    for key, batches in iter_file_batches(pending, current, file_loader, stats):
+        prefix, ids = chunk_id_prefix(key, current[key]), []
+        try:
+            for batch in batches: # Parse -> embed -> add, one bounded batch at a time
+                texts = [doc.page_content for doc in batch]
+                batch_ids = [f"{prefix}:{len(ids) + i}" for i in range(len(batch))]
+                text_embeddings = list(zip(texts, build_model.embed_documents(texts)))
+                metadatas = [doc.metadata for doc in batch]
+                if vector_store is None:
+                    from langchain_community.vectorstores import FAISS
+                    vector_store = FAISS.from_embeddings(text_embeddings, embedding_model, metadatas=metadatas, ids=batch_ids)
+                else: vector_store.add_embeddings(text_embeddings, metadatas=metadatas, ids=batch_ids)
+                ids.extend(batch_ids)
+        except Exception as e:
+            logger.error(f"Indexing {key} failed after {len(ids)} chunks: {e}", exc_info=True)
+            if ids: vector_store.delete(ids) # Recorded without chunks below, so the next build retries the file
+            ids = []
+        stats["chunks_embedded"] += len(ids)
+        files[key] = {"sha256": current[key], "chunk_ids": ids, "indexed_at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        logger.info(f"Indexed {key}: {len(ids)} chunks.")
+
+    if isinstance(build_model, CachedEmbeddings):
+        stats["chunks_encoded"], stats["embedding_cache_hits"] = build_model.metrics["encoded"], build_model.metrics["cache_hits"]
+    if vector_store is None: logger.warning(f"No documents to index at {index_path}."); return None, stats
+    if pending or stale or manifest is None:
+        os.makedirs(index_path, exist_ok=True)
+        vector_store.save_local(index_path)
+        save_manifest(index_path, {"settings": settings, "files": files, "vectors": vector_store.index.ntotal,
+                                   "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S")})
+    stats["vectors"] = vector_store.index.ntotal
+    stats["seconds"] = round(time.perf_counter() - started, 2)
+    logger.info(f"FAISS index {index_path} synced: {stats}")
+    return vector_store, stats
@@ -0,0 +1,115 @@
+# index_versions.py
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import stat
+import time
+from typing import Optional
+
+from chatbot_logging import logger
+from index_manifest import load_manifest, save_manifest, sync_faiss_index
+
+# --- VERSIONED INDEX CONFIG ---
+# Indexes are built offline (build_indexes.py) into immutable version directories next to the old flat index:
+#   <base>/<index_name>.versions/<YYYYmmdd-HHMMSS>-<content hash>/   index.faiss, index.pkl, manifest.json
+#   <base>/<index_name>.versions/CURRENT                              name of the version servers load
+# A build works in a staging directory (seeded from the current version, so only changed files are re-embedded),
+# renames it into place once complete and then swaps CURRENT with an atomic rename. Servers never see a partial
+# index, and rolling back is pointing CURRENT at an older version.
+INDEX_VERSIONS_KEEP = int(os.getenv("INDEX_VERSIONS_KEEP", "3")) # Published versions kept per index (plus CURRENT)
+CURRENT_POINTER = "CURRENT"
+STAGING_PREFIX = ".staging-"
+
+class IndexBuildError(Exception):
+    """An index version could not be built or activated."""
+
+def versions_root(index_path: str) -> str:
+    return index_path.rstrip("/\\") + ".versions"
+
+def list_versions(index_path: str) -> list:
+    """Published versions, oldest first (names start with the build time)."""
+    root = versions_root(index_path)
+    if not os.path.isdir(root): return []
+    return sorted(name for name in os.listdir(root) if not name.startswith(".") and os.path.isdir(os.path.join(root, name)))
+
+def current_version(index_path: str) -> Optional[str]:
+    try:
+        with open(os.path.join(versions_root(index_path), CURRENT_POINTER), "r", encoding="utf-8") as f: version = f.read().strip()
+    except FileNotFoundError: return None
+    if version and os.path.isdir(os.path.join(versions_root(index_path), version)): return version
+    logger.error(f"{CURRENT_POINTER} of {index_path} points at missing version '{version}'."); return None
+
+def current_version_path(index_path: str) -> Optional[str]:
+    version = current_version(index_path)
+    return os.path.join(versions_root(index_path), version) if version else None
+
+def activate_version(index_path: str, version: str):
+    """Points CURRENT at a published version; servers pick it up the next time they load the index."""
+    root = versions_root(index_path)
+    if version not in list_versions(index_path): raise IndexBuildError(f"No version '{version}' of {index_path}.")
+    pointer = os.path.join(root, CURRENT_POINTER)
+    with open(pointer + ".tmp", "w", encoding="utf-8") as f: f.write(version + "\n"); f.flush(); os.fsync(f.fileno())
+    os.replace(pointer + ".tmp", pointer) # Readers see the old version or the new one, never neither
+    logger.info(f"Index {index_path}: {CURRENT_POINTER} -> {version}")
+
+def prune_versions(index_path: str, keep: int = INDEX_VERSIONS_KEEP) -> list:
+    """Deletes all but the newest `keep` versions, never the current one. Returns the deleted names."""
+    current, versions = current_version(index_path), list_versions(index_path)
+    doomed = [version for version in versions[:max(0, len(versions) - keep)] if version != current]
+    for version in doomed: shutil.rmtree(os.path.join(versions_root(index_path), version), onerror=_make_writable_and_retry)
+    return doomed
+
+def _make_writable_and_retry(func, path, _):
+    os.chmod(path, stat.S_IWUSR | stat.S_IRUSR); func(path)
+
+@contextlib.contextmanager
+def _build_lock(root: str):
+    import fcntl # Builds run on the Linux deployment hosts
+    with open(os.path.join(root, ".build.lock"), "w") as lock_file:
+        try: fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError: raise IndexBuildError(f"Another build of {root} is already running.") from None
+        yield
+
+def _content_hash(manifest: dict) -> str:
+    files = {key: entry["sha256"] for key, entry in manifest["files"].items()}
+    return hashlib.sha256(json.dumps({"settings": manifest["settings"], "files": files}, sort_keys=True).encode()).hexdigest()[:8]
+
+def build_index_version(index_path: str, source_files: list, file_loader, embedding_model, force: bool = False,
+                        activate: bool = True, keep: int = INDEX_VERSIONS_KEEP) -> dict:
+    """Builds a new version of the index from source_files and (with activate) makes it current.
+
+    Starts from a copy of the current version, so unchanged files are not re-parsed or re-embedded; force builds
+    from scratch. When nothing changed, no version is published. Returns the build stats plus "version" (the
+    version now holding these sources) and "published"."""
+    root = versions_root(index_path)
+    os.makedirs(root, exist_ok=True)
+    with _build_lock(root):
+        for name in os.listdir(root): # Left behind by a build that crashed
+            if name.startswith(STAGING_PREFIX): shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+        base_version = current_version(index_path)
+        staging = os.path.join(root, f"{STAGING_PREFIX}{os.getpid()}")
+        if base_version and not force: shutil.copytree(os.path.join(root, base_version), staging, copy_function=shutil.copyfile)
+        vector_store, stats = sync_faiss_index(staging, source_files, file_loader, embedding_model)
+        if vector_store is None:
+            shutil.rmtree(staging, ignore_errors=True); raise IndexBuildError(f"No documents could be indexed for {index_path}.")
+        if base_version and not force and not (stats["added"] or stats["changed"] or stats["removed"]):
+            shutil.rmtree(staging)
+            logger.info(f"Index {index_path} is up to date at version {base_version}; nothing published.")
+            return {**stats, "version": base_version, "published": False}
+
+        manifest = load_manifest(staging)
+        version = name = f"{time.strftime('%Y%m%d-%H%M%S')}-{_content_hash(manifest)}"
+        for suffix in range(1, 100):
+            if not os.path.exists(os.path.join(root, version)): break
+            version = f"{name}.{suffix}" # Same sources rebuilt within the same second (e.g. --force)
+        manifest.update({"version": version, "based_on": None if force else base_version, "build_stats": stats})
+        save_manifest(staging, manifest)
+        for filename in os.listdir(staging): os.chmod(os.path.join(staging, filename), stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        os.rename(staging, os.path.join(root, version)) # Published only once complete
+        logger.info(f"Index {index_path}: published version {version} ({stats['vectors']} vectors).")
+        if activate: activate_version(index_path, version)
+        pruned = prune_versions(index_path, keep)
+        if pruned: logger.info(f"Index {index_path}: pruned old versions {pruned}.")
+        return {**stats, "version": version, "published": True}
@@ -0,0 +1,169 @@
+# intent_router.py
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+
+from chatbot_logging import logger
+from async_utils import run_blocking
+from app_resources import get_shared_resource
+from rag_pipeline import distance_to_similarity
+
+# --- INTENT ROUTER CONFIG ---
+# Local nearest-prototype classifier on the shared sentence-transformer embeddings. It settles Greeting, OutOfScope
+# and TopicMismatch turns without Gemini and escalates everything else (including every in-domain query, which
+# still needs the LLM's simplified search query). Calibrate thresholds with testing/eval_intent_router.py.
+INTENT_ROUTER_ENABLED = os.getenv("INTENT_ROUTER_ENABLED", "False").lower() == "true"
+INTENT_ROUTER_MIN_CONFIDENCE = float(os.getenv("INTENT_ROUTER_MIN_CONFIDENCE", "0.85")) # Below this the LLM decides
+INTENT_ROUTER_TEMPERATURE = float(os.getenv("INTENT_ROUTER_TEMPERATURE", "0.05")) # Softmax temperature over label scores
+INTENT_ROUTER_TOP_K = int(os.getenv("INTENT_ROUTER_TOP_K", "3")) # Label score = mean of its k most similar examples
+INTENT_ROUTER_MAX_GREETING_WORDS = int(os.getenv("INTENT_ROUTER_MAX_GREETING_WORDS", "6")) # "hi, my VPN is down" is not a greeting
+INTENT_ROUTER_EXAMPLES_PATH = os.getenv("INTENT_ROUTER_EXAMPLES_PATH", "") # JSON {label: [examples]}, merged over the defaults
+
+DEFAULT_INTENT_EXAMPLES = {
+    "Greeting": ["hi", "hello", "hey", "hey there", "good morning", "good afternoon", "good evening", "how are you",
+                 "how are u", "hi, how are you doing", "thanks", "thank you", "thank you so much", "ok thanks", "bye",
+                 "goodbye", "see you", "namaste", "yo", "hello bot"],
+    "OutOfScope": ["what's the weather today", "what is the capital of france", "tell me a joke", "who won the cricket match",
+                   "recommend a good movie", "what is the stock price of google", "sing a song", "asdfgh", "qwerty zxcv",
+                   "how do i cook pasta", "who is the prime minister", "what is 25 times 4", "write me a poem",
+                   "best places to travel in summer", "what is the meaning of life"],
+    "IT": ["how to install vpn client", "vpn is not connecting", "reset my windows password", "my laptop is very slow",
+           "printer is not working", "wifi keeps disconnecting", "request a software license", "outlook is not opening",
+           "how to map a network drive", "my computer won't turn on", "install microsoft teams", "access to shared folder",
+           "blue screen error on laptop", "keyboard not working", "how to connect to office wifi", "email not syncing on phone",
+           "update antivirus", "my account is locked", "laptop battery draining fast", "software installation error"],
+    "HR": ["what is the leave policy", "what is the dress code policy", "how many casual leaves do i get",
+           "maternity leave policy", "how to download my salary slip", "when is salary credited", "employee referral bonus",
+           "work from home policy", "how to apply for leave in keka", "performance review process", "employee benefits",
+           "notice period for resignation", "how to apply for internal job posting", "holiday list for this year",
+           "onboarding documents required", "can i wear jeans on friday", "reimbursement policy", "payroll query",
+           "health insurance coverage", "how to update my bank details in keka"],
+}
+
+@dataclass(slots=True)
+class RouteDecision:
+    label: str # Winning prototype label: Greeting, OutOfScope, IT or HR
+    confidence: float
+    best_source: Optional[str] = None # Set when the router settles the turn; None means escalate to the LLM
+    reason: str = ""
+    label_scores: dict = field(default_factory=dict)
+    index_scores: dict = field(default_factory=dict) # mode -> top cosine similarity in that mode's FAISS index
+    elapsed_ms: float = 0.0
+
+def _top_index_similarity(retriever, vector: np.ndarray) -> Optional[float]:
+    index = getattr(getattr(retriever, "vectorstore", None), "index", None)
+    if index is None or not getattr(index, "ntotal", 0): return None
+    distances, _ = index.search(vector.reshape(1, -1), 1)
+    return distance_to_similarity(distances[0][0], index)
+
+class IntentRouter:
+    """Nearest-prototype intent classifier that escalates to the LLM whenever it is not confident."""
+
+    def __init__(self, examples: Optional[dict] = None, min_confidence: float = INTENT_ROUTER_MIN_CONFIDENCE,
+                 temperature: float = INTENT_ROUTER_TEMPERATURE, top_k: int = INTENT_ROUTER_TOP_K, enabled: bool = INTENT_ROUTER_ENABLED):
+        self.examples = examples if examples is not None else self._load_examples()
+        self.min_confidence = min_confidence
+        self.temperature = temperature
+        self.top_k = top_k
+        self.enabled = enabled
+        self._prototypes = None # (embedding model the matrices were built with, {label: row matrix})
+        self._lock = threading.Lock()
+        self._metrics = {"routed_greeting": 0, "routed_out_of_scope": 0, "routed_topic_mismatch": 0, "escalated": 0, "total_ms": 0.0}
+
+    @staticmethod
+    def _load_examples() -> dict:
+        examples = {label: list(texts) for label, texts in DEFAULT_INTENT_EXAMPLES.items()}
+        if INTENT_ROUTER_EXAMPLES_PATH:
+            try:
+                with open(INTENT_ROUTER_EXAMPLES_PATH, "r", encoding="utf-8") as f: extra = json.load(f)
+                for label, texts in extra.items(): examples.setdefault(label, []).extend(texts)
+                logger.info(f"Intent router: loaded extra examples from {INTENT_ROUTER_EXAMPLES_PATH}.")
+            except Exception as e: logger.error(f"Intent router: could not load {INTENT_ROUTER_EXAMPLES_PATH}: {e}", exc_info=True)
+        return examples
+
+    def _prototype_matrices(self, embedding_model) -> dict:
+        with self._lock:
+            if self._prototypes is None or self._prototypes[0] is not embedding_model:
+                started = time.perf_counter()
+                matrices = {}
+                for label, texts in self.examples.items():
+                    vectors = np.asarray(embedding_model.embed_documents(texts), dtype="float32")
+                    matrices[label] = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+                self._prototypes = (embedding_model, matrices)
+                logger.info(f"Intent router: embedded {sum(len(t) for t in self.examples.values())} examples in {(time.perf_counter() - started) * 1000:.0f} ms.")
+            return self._prototypes[1]
+
+    def prepare(self) -> bool:
+        """Embeds the examples ahead of the first query (called during warm-up)."""
+        embedding_model = get_shared_resource("embedding_model")
+        if not self.enabled or embedding_model is None: return False
+        self._prototype_matrices(embedding_model); return True
+
+    def decide(self, query: str, mode: str, vector: np.ndarray, prototypes: dict, index_scores: Optional[dict] = None) -> RouteDecision:
+        index_scores = index_scores or {}
+        label_scores = {label: float(np.mean(np.sort(matrix @ vector)[-self.top_k:])) for label, matrix in prototypes.items()}
+        labels = list(label_scores)
+        logits = np.array([label_scores[label] for label in labels]) / self.temperature
+        probabilities = np.exp(logits - logits.max()); probabilities /= probabilities.sum()
+        best = int(np.argmax(probabilities))
+        decision = RouteDecision(label=labels[best], confidence=float(probabilities[best]), label_scores=label_scores, index_scores=index_scores)
+        mode = (mode or "").upper()
+        if decision.confidence < self.min_confidence: decision.reason = "low confidence"
+        elif decision.label == "Greeting":
+            if len(query.split()) > INTENT_ROUTER_MAX_GREETING_WORDS: decision.reason = "too long for a greeting"
+            else: decision.best_source = "Greeting"
+        elif decision.label == "OutOfScope": decision.best_source = "OutOfScope"
+        elif decision.label == mode: decision.reason = "in-domain query needs the LLM's search query"
+        elif decision.label in ("IT", "HR") and mode in ("IT", "HR"):
+            own_score, other_score = index_scores.get(mode), index_scores.get(decision.label)
+            # The other department's documents must match at least as well as this mode's before switching the user away.
+            if own_score is not None and other_score is not None and other_score < own_score: decision.reason = "own index matches better"
+            else: decision.best_source = "TopicMismatch"
+        else: decision.reason = f"no routing rule for {decision.label} in mode {mode or 'none'}"
+        return decision
+
+    def route(self, query: str, mode: str) -> Optional[RouteDecision]:
+        """Blocking: embeds the query, scores it against the prototypes and both FAISS indexes."""
+        embedding_model = get_shared_resource("embedding_model")
+        if embedding_model is None: return None
+        started = time.perf_counter()
+        prototypes = self._prototype_matrices(embedding_model)
+        vector = np.asarray(embedding_model.embed_query(query), dtype="float32")
+        vector /= max(float(np.linalg.norm(vector)), 1e-12)
+        index_scores = {}
+        for index_mode, component in (("IT", "it_retriever"), ("HR", "hr_retriever")):
+            try: score = _top_index_similarity(get_shared_resource(component), vector)
+            except Exception as e: logger.warning(f"Intent router: {index_mode} index score unavailable: {e}"); score = None
+            if score is not None: index_scores[index_mode] = score
+        decision = self.decide(query, mode, vector, prototypes, index_scores)
+        decision.elapsed_ms = (time.perf_counter() - started) * 1000
+        return decision
+
+    async def classify(self, query: str, mode: str, session_id: str = "-") -> Optional[dict]:
+        """Analysis-shaped dict ({"best_source", "simplified_query_for_search"}) when the router settles the turn, else None."""
+        if not self.enabled or not query or not query.strip(): return None
+        try: decision = await run_blocking("retrieval", self.route, query.strip(), mode)
+        except Exception as e:
+            logger.warning(f"SID: {session_id} | Intent router failed for '{query}': {e}. Escalating to LLM."); return None
+        if decision is None: return None
+        metric = {"Greeting": "routed_greeting", "OutOfScope": "routed_out_of_scope", "TopicMismatch": "routed_topic_mismatch"}.get(decision.best_source, "escalated")
+        with self._lock:
+            self._metrics[metric] += 1; self._metrics["total_ms"] += decision.elapsed_ms
+        if not decision.best_source:
+            logger.info(f"SID: {session_id} | Intent router escalated '{query}' ({decision.label} {decision.confidence:.2f}, {decision.reason}) in {decision.elapsed_ms:.1f} ms")
+            return None
+        logger.info(f"SID: {session_id} | Intent router: '{query}' -> {decision.best_source} ({decision.label} {decision.confidence:.2f}) in {decision.elapsed_ms:.1f} ms")
+        return {"best_source": decision.best_source, "simplified_query_for_search": query.strip()}
+
+    def stats(self) -> dict:
+        with self._lock:
+            turns = sum(v for k, v in self._metrics.items() if k != "total_ms")
+            routed = turns - self._metrics["escalated"]
+            return {"enabled": self.enabled, "routed_rate": round(routed / turns, 3) if turns else 0.0,
+                    "avg_ms": round(self._metrics["total_ms"] / turns, 1) if turns else 0.0,
+                    **{k: v for k, v in self._metrics.items() if k != "total_ms"}}
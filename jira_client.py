@@ -0,0 +1,159 @@
+# jira_client.py
+# Pooled, rate-limited Jira REST client shared by ticketing_utils (get_jira_client()). It is blocking by design: every
+# Jira call is made by the jira_outbox workers, which run it on the "jira" executor (async_utils.run_blocking), and
+# request handlers never call Jira directly. The async surface for handlers is JiraOutbox's *_async methods, which
+# queue the side effect off the event loop. An httpx-based async twin of JiraClient was dropped because nothing on
+# the event loop needed it.
+import os
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+
+try:
+    from chatbot_logging import logger
+except ImportError:
+    import logging
+    logger = logging.getLogger(__name__)
+    if not logger.handlers:
+        logger.addHandler(logging.StreamHandler())
+        logger.setLevel(logging.INFO)
+        logger.warning("jira_client.py: Using fallback logger.")
+
+# --- JIRA CLIENT CONFIG ---
+JIRA_HTTP_POOL_SIZE = int(os.getenv("JIRA_HTTP_POOL_SIZE", "10")) # Keep-alive connections per host
+JIRA_RATE_LIMIT_PER_SECOND = float(os.getenv("JIRA_RATE_LIMIT_PER_SECOND", "10")) # 0 disables client-side limiting
+JIRA_RATE_LIMIT_BURST = int(os.getenv("JIRA_RATE_LIMIT_BURST", "20"))
+JIRA_MAX_429_RETRIES = int(os.getenv("JIRA_MAX_429_RETRIES", "2"))
+JIRA_MAX_RETRY_AFTER_SECONDS = float(os.getenv("JIRA_MAX_RETRY_AFTER_SECONDS", "30"))
+
+JIRA_DEFAULT_HEADERS = {"Accept": "application/json", "Content-Type": "application/json"}
+
+def parse_retry_after(value, default: float = 1.0) -> float:
+    """Retry-After is either delta-seconds or an HTTP date."""
+    if not value: return default
+    try: return max(0.0, float(value))
+    except ValueError: pass
+    try: return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError): return default
+
+class TokenBucket:
+    """Thread-safe token bucket shared by every Jira call in the process.
+
+    A 429 pauses the whole bucket until Retry-After has passed, so concurrent workers back off
+    together instead of each hammering Jira with its own retry.
+    """
+
+    def __init__(self, rate_per_second: float = JIRA_RATE_LIMIT_PER_SECOND, burst: int = JIRA_RATE_LIMIT_BURST):
+        self.rate_per_second = rate_per_second
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Takes a token if one is available and returns 0, otherwise returns seconds to wait before trying again."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._blocked_until: return self._blocked_until - now
+            if self.rate_per_second <= 0: return 0.0
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate_per_second)
+            self._updated_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate_per_second
+
+    def acquire(self):
+        while (wait := self.reserve()) > 0: time.sleep(wait)
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+class EndpointLatencyStats:
+    """Per-endpoint call counters and latency percentiles over a sliding window of recent calls."""
+
+    def __init__(self, window: int = 512):
+        self.window = window
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint: str, elapsed_ms: float, status_code=None):
+        with self._lock:
+            entry = self._endpoints.get(endpoint)
+            if entry is None:
+                entry = {"calls": 0, "errors": 0, "rate_limited": 0, "total_ms": 0.0, "max_ms": 0.0, "samples": deque(maxlen=self.window)}
+                self._endpoints[endpoint] = entry
+            entry["calls"] += 1; entry["total_ms"] += elapsed_ms; entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+            entry["samples"].append(elapsed_ms)
+            if status_code == 429: entry["rate_limited"] += 1
+            if status_code is None or status_code >= 400: entry["errors"] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            result = {}
+            for endpoint, entry in self._endpoints.items():
+                samples = sorted(entry["samples"])
+                result[endpoint] = {
+                    "calls": entry["calls"], "errors": entry["errors"], "rate_limited": entry["rate_limited"],
+                    "avg_ms": round(entry["total_ms"] / entry["calls"], 1), "max_ms": round(entry["max_ms"], 1),
+                    "p50_ms": round(samples[len(samples) // 2], 1),
+                    "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 1),
+                }
+            return result
+
+class JiraClient:
+    """Blocking Jira REST client on one keep-alive requests.Session.
+
+    Auth and headers are set once on the session, and the mounted HTTPAdapter keeps up to
+    `pool_size` connections open, so calls after the first skip the TCP/TLS handshake.
+    """
+
+    def __init__(self, base_url: str, user_email: str, api_token: str, pool_size: int = JIRA_HTTP_POOL_SIZE,
+                 rate_limiter: TokenBucket = None, stats: EndpointLatencyStats = None, max_429_retries: int = JIRA_MAX_429_RETRIES):
+        self.base_url = base_url.rstrip("/")
+        self.rate_limiter = rate_limiter or TokenBucket()
+        self.stats = stats or EndpointLatencyStats()
+        self.max_429_retries = max_429_retries
+        self.session = requests.Session()
+        self.session.auth = HTTPBasicAuth(user_email, api_token)
+        self.session.headers.update(JIRA_DEFAULT_HEADERS)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, method: str, path: str, endpoint: str, **kwargs) -> requests.Response:
+        """Sends one request, waiting on the shared rate limiter and honouring 429 Retry-After.
+
+        A 429 is retried here up to `max_429_retries` times when Retry-After is short; otherwise the
+        429 response is returned so the caller's own retry policy (e.g. the outbox) takes over.
+        """
+        url = f"{self.base_url}{path}"
+        for attempt in range(self.max_429_retries + 1):
+            self.rate_limiter.acquire()
+            start = time.perf_counter()
+            try: response = self.session.request(method, url, **kwargs)
+            except Exception:
+                self.stats.record(endpoint, (time.perf_counter() - start) * 1000)
+                raise
+            self.stats.record(endpoint, (time.perf_counter() - start) * 1000, response.status_code)
+            if response.status_code != 429: return response
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            self.rate_limiter.pause(min(retry_after, JIRA_MAX_RETRY_AFTER_SECONDS))
+            if attempt >= self.max_429_retries or retry_after > JIRA_MAX_RETRY_AFTER_SECONDS: break
+            logger.warning(f"Jira rate limited on {endpoint}; retrying after {retry_after:.1f}s (attempt {attempt + 1}).")
+        return response
+
+    def get(self, path: str, endpoint: str, **kwargs): return self.request("GET", path, endpoint, **kwargs)
+    def post(self, path: str, endpoint: str, **kwargs): return self.request("POST", path, endpoint, **kwargs)
+    def put(self, path: str, endpoint: str, **kwargs): return self.request("PUT", path, endpoint, **kwargs)
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,357 @@
+# jira_outbox.py
+import asyncio
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Optional
+
+from async_utils import run_blocking
+from ticketing_utils import (
+    create_jira_ticket, add_jira_comment, transition_jira_ticket,
+    find_transition_id_by_name, assign_jira_issue, set_jira_issue_priority, find_jira_issue_by_text, count_jira_comments
+)
+
+try:
+    from chatbot_logging import logger
+except ImportError:
+    import logging
+    logger = logging.getLogger(__name__)
+    if not logger.handlers:
+        logger.addHandler(logging.StreamHandler())
+        logger.setLevel(logging.INFO)
+        logger.warning("jira_outbox.py: Using fallback logger.")
+
+# --- OUTBOX CONFIG ---
+JIRA_OUTBOX_DB_PATH = os.getenv("JIRA_OUTBOX_DB_PATH", "data/jira_outbox.db")
+JIRA_OUTBOX_WORKERS = int(os.getenv("JIRA_OUTBOX_WORKERS", "2"))
+JIRA_OUTBOX_MAX_ATTEMPTS = int(os.getenv("JIRA_OUTBOX_MAX_ATTEMPTS", "6"))
+JIRA_OUTBOX_POLL_SECONDS = float(os.getenv("JIRA_OUTBOX_POLL_SECONDS", "1.0"))
+JIRA_OUTBOX_LEASE_SECONDS = float(os.getenv("JIRA_OUTBOX_LEASE_SECONDS", "120"))
+JIRA_OUTBOX_KEY_WAIT_SECONDS = float(os.getenv("JIRA_OUTBOX_KEY_WAIT_SECONDS", "3.0"))
+
+TICKET_REF_PREFIX = "CHAT-"
+
+# Operations are stored by name so queued work survives restarts.
+OP_CREATE_TICKET = "create_ticket"
+OP_ADD_COMMENT = "add_comment"
+OP_TRANSITION = "transition"
+OP_ASSIGN = "assign"
+OP_SET_PRIORITY = "set_priority"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jira_tickets (
+    ticket_ref TEXT PRIMARY KEY,
+    jira_key TEXT,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS jira_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    ticket_ref TEXT NOT NULL,
+    operation TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    claimed_at REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jira_outbox_ready ON jira_outbox(status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS idx_jira_outbox_ticket ON jira_outbox(ticket_ref, id);
+"""
+
+_HTTP_STATUS_PATTERN = re.compile(r"HTTP Error: (\d{3})")
+
+def turn_idempotency_key(session_id: str, turn_index: int, operation: str, tag: str = "") -> str:
+    """Idempotency key for a side effect of one chat turn. The same turn replayed (a retried request, a re-run
+    handler) maps to the same key; `tag` tells apart several operations of the same type in one turn."""
+    return f"{session_id}:{turn_index}:{operation}" + (f":{tag}" if tag else "")
+
+class JiraOutbox:
+    """SQLite-backed queue of Jira side effects, drained by background workers.
+
+    The chat handler only enqueues work and gets back a local ticket reference (CHAT-...)
+    immediately. Workers apply operations in enqueue order per ticket, retry transient
+    failures with exponential backoff, and map the reference to the real Jira key once
+    the ticket has been created. Callers that may re-enqueue the same side effect
+    (e.g. a retried HTTP request) pass an idempotency_key (see turn_idempotency_key),
+    and a repeat is a no-op. A create or comment retried after its response was lost
+    is first looked up in Jira, so the retry doesn't apply it twice.
+    """
+
+    def __init__(self, db_path: str = JIRA_OUTBOX_DB_PATH, max_attempts: int = JIRA_OUTBOX_MAX_ATTEMPTS,
+                 base_backoff_seconds: float = 2.0, max_backoff_seconds: float = 300.0,
+                 lease_seconds: float = JIRA_OUTBOX_LEASE_SECONDS):
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.base_backoff_seconds = base_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self._db, self._db_pid = None, None # Opened on first use (normally start()), not when the app module is imported
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker_tasks = []
+        self._stopping = False
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # A SQLite connection must not cross fork() (gunicorn --preload imports the app in the master),
+        # so every process opens its own on first use.
+        if self._db_pid != os.getpid():
+            db_dir = os.path.dirname(self.db_path)
+            if db_dir: os.makedirs(db_dir, exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(_SCHEMA)
+            self._db_pid = os.getpid()
+            logger.info(f"Jira outbox ready at {self.db_path} (pid {self._db_pid}).")
+        return self._db
+
+    # --- ENQUEUE API (called from the request path; never touches Jira) ---
+    def create_ticket(self, summary: str, description_text: str, reporter_email: str = None, idempotency_key: str = None) -> str:
+        """Queues the create and returns its reference; a repeated idempotency_key returns the first call's reference."""
+        ticket_ref = f"{TICKET_REF_PREFIX}{uuid.uuid4().hex[:10].upper()}"
+        idempotency_key = idempotency_key or f"{ticket_ref}:{OP_CREATE_TICKET}"
+        payload_json = json.dumps({"summary": summary, "description_text": f"{description_text}\nChatbot reference: {ticket_ref}",
+                                   "reporter_email": reporter_email}, sort_keys=True)
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                existing = self._conn.execute("SELECT ticket_ref FROM jira_outbox WHERE idempotency_key = ?", (idempotency_key,)).fetchone()
+                if not existing:
+                    self._conn.execute("INSERT INTO jira_tickets (ticket_ref, jira_key, created_at) VALUES (?, NULL, ?)", (ticket_ref, now))
+                    self._conn.execute(
+                        "INSERT INTO jira_outbox (idempotency_key, ticket_ref, operation, payload, status, next_attempt_at, created_at, updated_at) "
+                        "VALUES (?, ?, ?, ?, 'pending', ?, ?, ?)", (idempotency_key, ticket_ref, OP_CREATE_TICKET, payload_json, now, now, now))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if existing:
+            logger.info(f"Outbox: duplicate '{OP_CREATE_TICKET}' ignored; key {idempotency_key} is ticket {existing[0]}.")
+            return existing[0]
+        self._notify()
+        return ticket_ref
+
+    def add_comment(self, ticket_ref: str, comment_body: str, is_public: bool = True, idempotency_key: str = None):
+        self._enqueue(ticket_ref, OP_ADD_COMMENT, {"comment_body": comment_body, "is_public": is_public}, idempotency_key)
+
+    def transition(self, ticket_ref: str, transition_id: str = None, transition_names: list = None, idempotency_key: str = None):
+        """Queues a transition by ID or, when no ID is configured, by the first matching transition name."""
+        self._enqueue(ticket_ref, OP_TRANSITION, {"transition_id": transition_id, "transition_names": transition_names or []}, idempotency_key)
+
+    def assign(self, ticket_ref: str, account_id: str, idempotency_key: str = None):
+        self._enqueue(ticket_ref, OP_ASSIGN, {"account_id": account_id}, idempotency_key)
+
+    def set_priority(self, ticket_ref: str, priority_id: str, idempotency_key: str = None):
+        self._enqueue(ticket_ref, OP_SET_PRIORITY, {"priority_id": priority_id}, idempotency_key)
+
+    def _enqueue(self, ticket_ref: str, operation: str, payload: dict, idempotency_key: str = None):
+        payload_json = json.dumps(payload, sort_keys=True)
+        # Identical operations are separate events (the same comment sent twice, resolved -> reopened -> resolved),
+        # so only a caller-supplied key deduplicates.
+        idempotency_key = idempotency_key or f"{ticket_ref}:{operation}:{uuid.uuid4().hex}"
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO jira_outbox (idempotency_key, ticket_ref, operation, payload, status, next_attempt_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, 'pending', ?, ?, ?)", (idempotency_key, ticket_ref, operation, payload_json, now, now, now))
+        if cursor.rowcount == 0: logger.info(f"Outbox: duplicate '{operation}' for {ticket_ref} ignored (key {idempotency_key}).")
+        else: logger.debug(f"Outbox: queued '{operation}' for {ticket_ref}.")
+        self._notify()
+
+    # --- ASYNC REQUEST-PATH API ---
+    # The same calls for async handlers. SQLite writes can wait on the database lock (another worker's
+    # transaction, another process), so they run on the "outbox" executor instead of the event loop.
+    async def create_ticket_async(self, *args, **kwargs) -> str: return await run_blocking("outbox", self.create_ticket, *args, **kwargs)
+    async def add_comment_async(self, *args, **kwargs): await run_blocking("outbox", self.add_comment, *args, **kwargs)
+    async def transition_async(self, *args, **kwargs): await run_blocking("outbox", self.transition, *args, **kwargs)
+    async def assign_async(self, *args, **kwargs): await run_blocking("outbox", self.assign, *args, **kwargs)
+    async def set_priority_async(self, *args, **kwargs): await run_blocking("outbox", self.set_priority, *args, **kwargs)
+    async def display_key_async(self, ticket_ref: str) -> str: return await run_blocking("outbox", self.display_key, ticket_ref)
+
+    # --- TICKET KEY RESOLUTION ---
+    def resolve_ticket_key(self, ticket_ref: str) -> Optional[str]:
+        if not ticket_ref: return None
+        with self._lock:
+            row = self._conn.execute("SELECT jira_key FROM jira_tickets WHERE ticket_ref = ?", (ticket_ref,)).fetchone()
+        return row[0] if row else None
+
+    def display_key(self, ticket_ref: str) -> str:
+        """Jira key if the ticket exists already, otherwise the local chatbot reference."""
+        return self.resolve_ticket_key(ticket_ref) or ticket_ref
+
+    async def wait_for_ticket_key(self, ticket_ref: str, timeout: float = JIRA_OUTBOX_KEY_WAIT_SECONDS) -> str:
+        """Waits briefly for the create operation so user-facing escalation messages can show the Jira key."""
+        deadline = time.monotonic() + timeout
+        while True:
+            jira_key = await run_blocking("outbox", self.resolve_ticket_key, ticket_ref)
+            if jira_key or time.monotonic() >= deadline: return jira_key or ticket_ref
+            await asyncio.sleep(0.1)
+
+    # --- WORKER SIDE ---
+    def _claim_next(self):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Work whose lease expired (worker crashed mid-call) goes back to the queue; delivery is at-least-once.
+                self._conn.execute("UPDATE jira_outbox SET status = 'pending', claimed_at = NULL WHERE status = 'in_progress' AND claimed_at < ?",
+                                   (now - self.lease_seconds,))
+                row = self._conn.execute(
+                    "SELECT o.id, o.ticket_ref, o.operation, o.payload, o.attempts FROM jira_outbox o "
+                    "WHERE o.status = 'pending' AND o.next_attempt_at <= ? AND NOT EXISTS ("
+                    "  SELECT 1 FROM jira_outbox p WHERE p.ticket_ref = o.ticket_ref AND p.id < o.id AND p.status IN ('pending', 'in_progress')) "
+                    "ORDER BY o.id LIMIT 1", (now,)).fetchone()
+                if row:
+                    self._conn.execute("UPDATE jira_outbox SET status = 'in_progress', attempts = attempts + 1, claimed_at = ?, updated_at = ? WHERE id = ?",
+                                       (now, now, row[0]))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if not row: return None
+        return {"id": row[0], "ticket_ref": row[1], "operation": row[2], "payload": json.loads(row[3]), "attempts": row[4] + 1}
+
+    def _execute(self, op: dict) -> dict:
+        ticket_ref, payload = op["ticket_ref"], op["payload"]
+        if op["operation"] == OP_CREATE_TICKET:
+            if op["attempts"] > 1: # An earlier attempt may have created the issue and lost the response (timeout, 5xx, reset)
+                found = find_jira_issue_by_text(ticket_ref) # The description carries "Chatbot reference: <ticket_ref>"
+                if found.get("success") and found.get("ticket_key"):
+                    logger.info(f"Outbox: {ticket_ref} already exists in Jira as {found['ticket_key']}; not creating it again.")
+                    return {"success": True, "ticket_key": found["ticket_key"]}
+                if not found.get("success"):
+                    if self._is_retryable(found): return found # Don't risk a duplicate while Jira is struggling
+                    logger.warning(f"Outbox: duplicate check for {ticket_ref} unavailable ({found.get('error')}); creating anyway.")
+            return create_jira_ticket(summary=payload["summary"], description_text=payload["description_text"], reporter_email=payload.get("reporter_email"))
+        jira_key = self.resolve_ticket_key(ticket_ref)
+        if not jira_key: return {"success": False, "error": "Ticket not created in Jira.", "retryable": False}
+        if op["operation"] == OP_ADD_COMMENT:
+            if op["attempts"] > 1: # Same lost-response case as creates: the comment may already be on the issue
+                found = count_jira_comments(jira_key, payload["comment_body"])
+                if found.get("success") and found["count"] > self._applied_identical_comments(op):
+                    logger.info(f"Outbox: comment {op['id']} for {ticket_ref} is already on {jira_key}; not posting it again.")
+                    return {"success": True}
+                if not found.get("success"):
+                    if self._is_retryable(found): return found
+                    logger.warning(f"Outbox: duplicate check for comment {op['id']} on {jira_key} unavailable ({found.get('error')}); posting anyway.")
+            return add_jira_comment(jira_key, payload["comment_body"], is_public=payload.get("is_public", True))
+        if op["operation"] == OP_TRANSITION:
+            transition_id = payload.get("transition_id") or find_transition_id_by_name(jira_key, payload.get("transition_names", []))
+            # get_available_transitions() returns [] on transport errors too, so a miss is retried like any other failure.
+            if not transition_id: return {"success": False, "error": f"No transition matching {payload.get('transition_names')}."}
+            return transition_jira_ticket(jira_key, transition_id)
+        if op["operation"] == OP_ASSIGN:
+            return assign_jira_issue(jira_key, payload["account_id"])
+        if op["operation"] == OP_SET_PRIORITY:
+            return set_jira_issue_priority(jira_key, payload["priority_id"])
+        return {"success": False, "error": f"Unknown outbox operation '{op['operation']}'.", "retryable": False}
+
+    def _applied_identical_comments(self, op: dict) -> int:
+        """Earlier comments on the same ticket with the same body. They were applied before `op` (per-ticket order),
+        so Jira holding more copies than this means an earlier attempt of `op` got through."""
+        with self._lock:
+            rows = self._conn.execute("SELECT payload FROM jira_outbox WHERE ticket_ref = ? AND operation = ? AND status = 'done' AND id < ?",
+                                      (op["ticket_ref"], OP_ADD_COMMENT, op["id"])).fetchall()
+        return sum(1 for (payload,) in rows if json.loads(payload)["comment_body"] == op["payload"]["comment_body"])
+
+    @staticmethod
+    def _is_retryable(result: dict) -> bool:
+        if "retryable" in result: return result["retryable"]
+        error = str(result.get("error", ""))
+        if "configuration missing" in error: return False
+        status_match = _HTTP_STATUS_PATTERN.search(error)
+        if status_match:
+            status = int(status_match.group(1))
+            return status == 429 or status >= 500
+        return True # Timeouts, connection resets and other unexpected errors
+
+    def process_next(self) -> bool:
+        """Claims and applies one ready operation. Returns False when nothing is ready."""
+        op = self._claim_next()
+        if not op: return False
+        try: result = self._execute(op)
+        except Exception as e:
+            logger.error(f"Outbox: '{op['operation']}' for {op['ticket_ref']} raised: {e}", exc_info=True)
+            result = {"success": False, "error": f"Unexpected error: {e}"}
+        now = time.time()
+        if result.get("success"):
+            with self._lock:
+                if op["operation"] == OP_CREATE_TICKET:
+                    self._conn.execute("UPDATE jira_tickets SET jira_key = ? WHERE ticket_ref = ?", (result.get("ticket_key"), op["ticket_ref"]))
+                self._conn.execute("UPDATE jira_outbox SET status = 'done', last_error = NULL, updated_at = ? WHERE id = ?", (now, op["id"]))
+            logger.info(f"Outbox: '{op['operation']}' for {op['ticket_ref']} done (attempt {op['attempts']}).")
+            return True
+
+        error_text = str(result.get("error", "unknown error"))
+        if self._is_retryable(result) and op["attempts"] < self.max_attempts:
+            backoff = min(self.max_backoff_seconds, self.base_backoff_seconds * (2 ** (op["attempts"] - 1)))
+            next_attempt_at = now + random.uniform(backoff / 2, backoff) # Jitter so a Jira outage doesn't retry in lockstep
+            with self._lock:
+                self._conn.execute("UPDATE jira_outbox SET status = 'pending', claimed_at = NULL, next_attempt_at = ?, last_error = ?, updated_at = ? WHERE id = ?",
+                                   (next_attempt_at, error_text, now, op["id"]))
+            logger.warning(f"Outbox: '{op['operation']}' for {op['ticket_ref']} failed (attempt {op['attempts']}): {error_text}. Retrying in {next_attempt_at - now:.1f}s.")
+            return True
+
+        with self._lock:
+            self._conn.execute("UPDATE jira_outbox SET status = 'dead', last_error = ?, updated_at = ? WHERE id = ?", (error_text, now, op["id"]))
+            if op["operation"] == OP_CREATE_TICKET: # Nothing else for this ticket can succeed without the issue itself.
+                self._conn.execute("UPDATE jira_outbox SET status = 'dead', last_error = 'Ticket creation failed.', updated_at = ? WHERE ticket_ref = ? AND status = 'pending'",
+                                   (now, op["ticket_ref"]))
+        logger.error(f"Outbox: '{op['operation']}' for {op['ticket_ref']} given up after {op['attempts']} attempt(s): {error_text}")
+        return True
+
+    def process_all_ready(self) -> int:
+        processed = 0
+        while self.process_next(): processed += 1
+        return processed
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jira_outbox GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    # --- ASYNC WORKERS ---
+    def _notify(self):
+        if self._loop and self._wakeup:
+            try: self._loop.call_soon_threadsafe(self._wakeup.set)
+            except RuntimeError: pass # Loop already closed during shutdown
+
+    async def start(self, workers: int = JIRA_OUTBOX_WORKERS):
+        if self._worker_tasks: return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        backlog = await run_blocking("outbox", self.stats) # Opens (and if needed creates) the database
+        self._worker_tasks = [asyncio.create_task(self._worker_loop(i)) for i in range(workers)]
+        logger.info(f"Jira outbox started with {workers} worker(s). Backlog: {backlog}")
+
+    async def _worker_loop(self, worker_index: int):
+        while not self._stopping:
+            try: processed = await run_blocking("jira", self.process_next)
+            except Exception as e:
+                logger.error(f"Outbox worker {worker_index} error: {e}", exc_info=True)
+                processed = False
+            if processed: continue
+            self._wakeup.clear()
+            try: await asyncio.wait_for(self._wakeup.wait(), timeout=JIRA_OUTBOX_POLL_SECONDS)
+            except asyncio.TimeoutError: pass
+
+    async def stop(self):
+        self._stopping = True
+        if self._wakeup: self._wakeup.set()
+        if self._worker_tasks:
+            await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        logger.info(f"Jira outbox stopped. Backlog: {self.stats()}")
@@ -0,0 +1,196 @@
+# llm_client.py
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Optional
+
+from chatbot_logging import logger
+
+# --- LLM CLIENT CONFIG ---
+# Every Gemini call goes through LLMClient: a per-stage deadline bounds the whole call (queueing for a permit,
+# retries and backoff included), transient errors (429/500/503, timeouts) are retried with full-jitter backoff,
+# a process-wide semaphore caps in-flight calls to protect the quota, and a circuit breaker fails fast while
+# Gemini keeps failing. Hedging (a second request when the first is slow) is opt-in per stage.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8")) # In-flight calls per worker process
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.4"))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "4"))
+LLM_HEDGE_STAGES = {stage.strip() for stage in os.getenv("LLM_HEDGE_STAGES", "").split(",") if stage.strip()} # e.g. "analysis,relevance"
+LLM_HEDGE_AFTER_SECONDS = float(os.getenv("LLM_HEDGE_AFTER_SECONDS", "1.5"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5")) # Consecutive failed calls before the breaker opens
+LLM_BREAKER_COOLDOWN_SECONDS = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+
+DEFAULT_STAGE_DEADLINES = {"analysis": 8.0, "relevance": 6.0, "single_call": 15.0, "assignment": 10.0, "generation": 25.0,
+                           "stream": 15.0, "default": 20.0} # Seconds; "stream" covers opening the stream only
+
+def _parse_stage_deadlines(value: str) -> dict:
+    """LLM_STAGE_DEADLINES="analysis=5,generation=20" -> {"analysis": 5.0, "generation": 20.0}"""
+    deadlines = {}
+    for item in value.split(","):
+        stage, _, seconds = item.partition("=")
+        if stage.strip() and seconds.strip(): deadlines[stage.strip()] = float(seconds)
+    return deadlines
+
+LLM_STAGE_DEADLINES = {**DEFAULT_STAGE_DEADLINES, **_parse_stage_deadlines(os.getenv("LLM_STAGE_DEADLINES", ""))}
+
+# google.api_core exception class names, matched by name so this module does not import the SDK.
+RETRYABLE_ERROR_NAMES = {"ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError", "DeadlineExceeded",
+                         "GatewayTimeout", "Aborted", "RetryError"}
+
+class LLMUnavailableError(Exception):
+    """Raised without calling Gemini while the circuit breaker is open."""
+
+class LLMDeadlineExceeded(TimeoutError):
+    """The stage's deadline passed before Gemini answered."""
+
+def is_retryable(error: Exception) -> bool:
+    if getattr(error, "retryable", None) is not None: return bool(error.retryable)
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)): return True
+    return type(error).__name__ in RETRYABLE_ERROR_NAMES
+
+class CircuitBreaker:
+    """closed -> open after `failure_threshold` consecutive failures -> half_open after the cooldown (one trial call)."""
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURES, cooldown_seconds: float = LLM_BREAKER_COOLDOWN_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed": return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.cooldown_seconds:
+                self.state, self._trial_in_flight = "half_open", False
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True; return True
+            return False
+
+    def release_trial(self):
+        """A call let through by allow() ended without an outcome (cancelled): the next call may be the trial."""
+        with self._lock: self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed": logger.info("LLM circuit breaker closed: Gemini is answering again.")
+            self.state, self._failures, self._trial_in_flight = "closed", 0, False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                if self.state != "open": logger.error(f"LLM circuit breaker open after {self._failures} consecutive failures; failing fast for {self.cooldown_seconds:.0f}s.")
+                self.state, self._opened_at, self._trial_in_flight = "open", time.monotonic(), False
+
+class LLMClient:
+    """Wraps a Gemini GenerativeModel (or any object with generate_content_async) with deadlines, retries,
+    optional hedging, a concurrency limit and a circuit breaker. Callers pass stage="analysis" etc."""
+
+    def __init__(self, model, max_concurrency: int = LLM_MAX_CONCURRENCY, stage_deadlines: Optional[dict] = None,
+                 max_retries: int = LLM_MAX_RETRIES, retry_base_seconds: float = LLM_RETRY_BASE_SECONDS,
+                 retry_max_seconds: float = LLM_RETRY_MAX_SECONDS, hedge_stages=None, hedge_after_seconds: float = LLM_HEDGE_AFTER_SECONDS,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.stage_deadlines = {**LLM_STAGE_DEADLINES, **(stage_deadlines or {})}
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.hedge_stages = set(LLM_HEDGE_STAGES if hedge_stages is None else hedge_stages)
+        self.hedge_after_seconds = hedge_after_seconds
+        self.breaker = breaker or CircuitBreaker()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._metrics = {"calls": 0, "succeeded": 0, "failed": 0, "retries": 0, "timeouts": 0, "hedges": 0, "hedge_wins": 0,
+                         "breaker_rejections": 0, "cancelled": 0, "max_in_flight": 0}
+
+    def __getattr__(self, name): # count_tokens, model_name, ... go to the wrapped model
+        return getattr(self.model, name)
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock: self._metrics[key] += amount
+
+    async def _call(self, prompt, stream: bool, kwargs: dict):
+        async with self._semaphore: # Held until the response (or, for streams, the stream) arrives
+            with self._lock:
+                self._in_flight += 1; self._metrics["max_in_flight"] = max(self._metrics["max_in_flight"], self._in_flight)
+            try:
+                if stream: return await self.model.generate_content_async(prompt, stream=True, **kwargs)
+                return await self.model.generate_content_async(prompt, **kwargs)
+            finally:
+                with self._lock: self._in_flight -= 1
+
+    async def _attempt(self, prompt, stream: bool, kwargs: dict, deadline: float, stage: str):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0: raise LLMDeadlineExceeded(f"'{stage}' deadline of {self.stage_deadlines.get(stage, self.stage_deadlines['default']):.1f}s exceeded")
+        try: return await asyncio.wait_for(self._call(prompt, stream, kwargs), timeout=remaining)
+        except asyncio.TimeoutError:
+            self._count("timeouts")
+            raise LLMDeadlineExceeded(f"'{stage}' deadline of {self.stage_deadlines.get(stage, self.stage_deadlines['default']):.1f}s exceeded") from None
+
+    async def _hedged_attempt(self, prompt, kwargs: dict, deadline: float, stage: str):
+        first = asyncio.create_task(self._attempt(prompt, False, kwargs, deadline, stage))
+        done, _ = await asyncio.wait({first}, timeout=max(0.0, min(self.hedge_after_seconds, deadline - time.monotonic())))
+        if done or self._semaphore.locked(): return await first # Answered in time, or no spare capacity to hedge with
+        self._count("hedges")
+        second = asyncio.create_task(self._attempt(prompt, False, kwargs, deadline, stage))
+        pending, errors = {first, second}, []
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second: self._count("hedge_wins")
+                        return task.result()
+                    errors.append(task.exception())
+            raise errors[0]
+        finally:
+            for task in (first, second):
+                if not task.done(): task.cancel()
+
+    async def generate_content_async(self, prompt, stream: bool = False, stage: str = "default", **kwargs):
+        self._count("calls")
+        if not self.breaker.allow():
+            self._count("breaker_rejections")
+            raise LLMUnavailableError("Gemini circuit breaker is open; skipping the call.")
+        deadline = time.monotonic() + self.stage_deadlines.get(stage, self.stage_deadlines["default"])
+        attempt, settled = 0, False
+        try:
+            while True:
+                try:
+                    if stage in self.hedge_stages and not stream: response = await self._hedged_attempt(prompt, kwargs, deadline, stage)
+                    else: response = await self._attempt(prompt, stream, kwargs, deadline, stage)
+                    self.breaker.record_success(); settled = True; self._count("succeeded")
+                    return response
+                except Exception as e:
+                    retryable = is_retryable(e)
+                    delay = random.uniform(0, min(self.retry_max_seconds, self.retry_base_seconds * 2 ** attempt)) # Full jitter
+                    if not retryable or attempt >= self.max_retries or time.monotonic() + delay >= deadline:
+                        # Non-retryable errors (blocked prompt, bad request) mean Gemini is reachable; they don't trip the breaker.
+                        if retryable: self.breaker.record_failure()
+                        else: self.breaker.record_success()
+                        settled = True; self._count("failed")
+                        logger.warning(f"LLM '{stage}' call failed after {attempt + 1} attempt(s): {type(e).__name__}: {e}")
+                        raise
+                    attempt += 1
+                    self._count("retries")
+                    logger.warning(f"LLM '{stage}' call attempt {attempt} failed ({type(e).__name__}: {e}); retrying in {delay:.2f}s.")
+                    await asyncio.sleep(delay)
+        finally:
+            # Cancelled (client gone, outer wait_for, losing hedge) or another BaseException: no outcome to record, but a
+            # half-open trial must give its slot back or the breaker would reject every call from now on.
+            if not settled: self.breaker.release_trial(); self._count("cancelled")
+
+    def stats(self) -> dict:
+        with self._lock: return {"breaker": self.breaker.state, "in_flight": self._in_flight, **self._metrics}
+
+def create_llm_client(model_factory, **client_kwargs) -> Optional[LLMClient]:
+    """Builds the model with `model_factory` (e.g. get_gemini_llm) and wraps it; None if the factory returns None."""
+    model = model_factory()
+    return LLMClient(model, **client_kwargs) if model is not None else None
@@ -1,26 +1,41 @@
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 
 from chatbot_utils import (
-    get_gemini_llm, get_embedding_model, get_it_retriever, get_hr_retriever,
-    perform_duckduckgo_search, INITIAL_ANALYSIS_PROMPT_TEMPLATE,
+    get_gemini_llm, perform_duckduckgo_search, INITIAL_ANALYSIS_PROMPT_TEMPLATE,
     RESPONSE_GENERATION_PROMPT_TEMPLATE, RELEVANCE_CHECK_PROMPT_TEMPLATE,
     clean_json_response, extract_and_prepare_links, logger,
     TICKET_ASSIGNMENT_PROMPT_TEMPLATE,
     HR_KEKA_LINKS, HR_FALLBACK_MESSAGE, HR_ERROR_FALLBACK_MESSAGE
 )
 from ticketing_utils import (
-    create_jira_ticket, add_jira_comment, transition_jira_ticket,
-    find_transition_id_by_name,
-    assign_jira_issue, set_jira_issue_priority,
     JIRA_TRANSITION_ID_IN_PROGRESS, JIRA_TRANSITION_ID_CLOSE,
-    JIRA_L1_ASSIGNEE_ACCOUNT_ID, JIRA_L2_ASSIGNEE_ACCOUNT_ID
+    JIRA_L1_ASSIGNEE_ACCOUNT_ID, JIRA_L2_ASSIGNEE_ACCOUNT_ID,
+    get_jira_latency_stats, close_jira_clients
 )
+from jira_outbox import (JiraOutbox, turn_idempotency_key, OP_CREATE_TICKET, OP_ADD_COMMENT, OP_TRANSITION, OP_ASSIGN,
+                         OP_SET_PRIORITY)
+from async_utils import run_blocking, shutdown_executors
+from rag_pipeline import (
+    PIPELINE_MODE, analyze_and_answer, get_pipeline_stats, retrieve_relevant_context, start_speculative_retrieval, web_search_context
+)
+from semantic_cache import SemanticAnswerCache
+from classification_cache import ClassificationCache
+from intent_router import IntentRouter
+from llm_client import LLMClient, create_llm_client
+from streaming_utils import sse_events_for_turn
+from session_store import create_session_store
+from session_state import ChatSession
+from app_resources import (
+    PRELOAD_SHARED_RESOURCES, WARMUP_IN_BACKGROUND, RESOURCE_READINESS,
+    load_shared_resources, get_shared_resource
+)
+import asyncio
 import os
 import random
 import uuid
@@ -34,6 +49,9 @@ logger.info(f"FORCE_RECREATE_INDEXES set to: {FORCE_RECREATE_INDEXES}")
 
 app = FastAPI(title="AI Support Assistant", version="2.1.4", root_path=ROOT_PATH_PREFIX) # Incremented version
 
+llm = None # Created per worker by _warm_up_resources()
+if PRELOAD_SHARED_RESOURCES: load_shared_resources(FORCE_RECREATE_INDEXES)
+
 EMPLOYEE_DATA_PATH = "data/employee_data.json"
 EMPLOYEES: Dict[int, str] = {}
 
@@ -68,19 +86,39 @@ def load_employee_data():
             logger.info(f"Loaded {len(EMPLOYEES)} embedded employee records.")
     except Exception as e: logger.error(f"Critical error loading employee data: {e}", exc_info=True)
 
+_warmup_task = None
+
+async def _warm_up_resources():
+    """Loads the LLM client first, then the shared model and indexes, off the event loop."""
+    global llm
+    logger.info("Initializing LLM and Embedding Model...")
+    llm = await asyncio.to_thread(RESOURCE_READINESS.track, "llm", create_llm_client, get_gemini_llm) # Per worker: gRPC channels must not be shared across fork()
+    await asyncio.to_thread(load_shared_resources, FORCE_RECREATE_INDEXES) # Already loaded in the master under gunicorn --preload
+    await asyncio.to_thread(INTENT_ROUTER.prepare)
+    logger.info(f"Warm-up finished: {RESOURCE_READINESS.snapshot()}")
+
 @app.on_event("startup")
 async def startup_event():
+    global _warmup_task
     load_employee_data()
-    logger.info("Initializing LLM and Embedding Model...")
-    global llm, embedding_model, it_retriever, hr_retriever
-    llm = get_gemini_llm()
-    embedding_model = get_embedding_model()
-    logger.info("Initializing IT Retriever...")
-    it_retriever = get_it_retriever(embedding_model, force_recreate=FORCE_RECREATE_INDEXES)
-    if not it_retriever: logger.critical("IT Retriever could not be initialized.")
-    logger.info("Initializing HR Retriever...")
-    hr_retriever = get_hr_retriever(embedding_model, force_recreate=FORCE_RECREATE_INDEXES)
-    if not hr_retriever: logger.critical("HR Retriever could not be initialized.")
+    await JIRA_OUTBOX.start()
+    if WARMUP_IN_BACKGROUND: _warmup_task = asyncio.create_task(_warm_up_resources())
+    else: await _warm_up_resources()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await JIRA_OUTBOX.stop()
+    logger.info(f"Session store: {SESSION_STORE.stats()}")
+    logger.info(f"RAG pipeline: {get_pipeline_stats()}")
+    logger.info(f"Semantic answer cache: {ANSWER_CACHE.stats()}")
+    logger.info(f"Classification cache: {CLASSIFICATION_CACHE.stats()}")
+    logger.info(f"Intent router: {INTENT_ROUTER.stats()}")
+    if isinstance(llm, LLMClient): logger.info(f"LLM client: {llm.stats()}")
+    SESSION_STORE.close()
+    CLASSIFICATION_CACHE.close()
+    logger.info(f"Jira client latency by endpoint: {get_jira_latency_stats()}")
+    close_jira_clients()
+    shutdown_executors()
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
@@ -93,7 +131,20 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
-ACTIVE_SESSIONS: Dict[str, Dict[str, Any]] = {}
+SESSION_STORE = create_session_store()
+ANSWER_CACHE = SemanticAnswerCache()
+CLASSIFICATION_CACHE = ClassificationCache()
+INTENT_ROUTER = IntentRouter()
+JIRA_OUTBOX = JiraOutbox()
+
+IN_PROGRESS_TRANSITION_NAMES = ["Start Work", "In Progress", "Work In Progress", "OPEN"]
+CLOSE_TRANSITION_NAMES = ["Done", "Resolve Issue", "Close Issue", "Resolve", "Closed", "RESOLVED"]
+
+# Lazy ticketing: the IT conversation is buffered in the session and a Jira ticket is only created, with the
+# whole transcript as its description, when the user escalates ("Not Helpful" or "Raise an IT ticket").
+# Queries the bot resolves never reach Jira.
+JIRA_LAZY_TICKET_CREATION = os.getenv("JIRA_LAZY_TICKET_CREATION", "false").lower() in ("1", "true", "yes")
+RAISE_IT_TICKET_OPTION = "Raise an IT ticket"
 
 class QueryRequest(BaseModel):
     user_query: str
@@ -104,18 +155,121 @@ class QueryRequest(BaseModel):
 async def index(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok", "components": RESOURCE_READINESS.snapshot()}
+
+@app.get("/readyz")
+async def readyz():
+    ready = RESOURCE_READINESS.all_ready()
+    return JSONResponse(status_code=200 if ready else 503, content={"ready": ready, "components": RESOURCE_READINESS.snapshot()})
+
 @app.post("/chat", response_model=Dict[str, Any])
 async def chat(data: QueryRequest):
+    return await _chat_turn(data)
+
+@app.post("/chat/stream")
+async def chat_stream(data: QueryRequest):
+    turn_result = await _chat_turn(data, stream=True)
+    return StreamingResponse(sse_events_for_turn(turn_result), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+async def _component_unavailable_payload(session_id, session_data, current_mode, ticket_key, component):
+    """Fast reply when a turn needs the LLM or a retriever that is still warming up or failed to load."""
+    error_response_options = [f"Rephrase my {current_mode} question", f"Switch to {'HR' if current_mode == 'IT' else 'IT'} Assistant", "No, Thank you."]
+    if RESOURCE_READINESS.is_warming_up(component):
+        logger.warning(f"SID: {session_id} | Component '{component}' is still warming up; sending degraded reply.")
+        response_text = f"I'm still starting up and can't answer {current_mode} questions just yet. Please try again in a minute."
+        if ticket_key: response_text += f" Your query for ticket {await JIRA_OUTBOX.display_key_async(ticket_key)} is logged."
+        session_data["last_bot_response_for_feedback"] = response_text
+        return {"response": response_text, "links": HR_KEKA_LINKS if current_mode == "HR" else [], "options": [f"Ask another {current_mode} question"] + error_response_options[1:], "session_id": session_id}
+    logger.error(f"SID: {session_id} | Component '{component}' is not available.")
+    if current_mode == "HR":
+        session_data["last_bot_response_for_feedback"] = HR_ERROR_FALLBACK_MESSAGE
+        return {"response": HR_ERROR_FALLBACK_MESSAGE, "links": HR_KEKA_LINKS, "options": error_response_options, "session_id": session_id}
+    response_text = f"I'm currently unable to search {current_mode} documents. Please try again later."
+    if ticket_key: response_text += f" Your query for ticket {await JIRA_OUTBOX.display_key_async(ticket_key)} is logged."
+    session_data["last_bot_response_for_feedback"] = response_text
+    return {"response": response_text, "links": [], "options": error_response_options, "session_id": session_id}
+
+def _outbox_key(session_id, session_data, operation, tag=""):
+    """Idempotency key for one of this turn's Jira side effects."""
+    return turn_idempotency_key(session_id, session_data.get("turn_index", 0), operation, tag)
+
+def _append_it_transcript(session_data, line):
+    if JIRA_LAZY_TICKET_CREATION and session_data.get("it_transcript") is not None: session_data["it_transcript"].append(line)
+
+async def _queue_it_ticket(session_id, session_data, query_to_process, initial_comment=None, transcript=None):
+    """Queues creation of an IT ticket and its move to In Progress; returns the outbox reference."""
+    ticket_summary = f"Chatbot IT ({session_data.get('employee_name', 'N/A')} - EmpID {session_data.get('employee_id', 'N/A')}): {query_to_process[:60]}..."
+    ticket_description = f"Employee: {session_data.get('employee_name', 'N/A')} (ID: {session_data.get('employee_id', 'N/A')})\nQuery (IT Mode): {query_to_process}"
+    if transcript: ticket_description += "\n\nConversation transcript:\n" + "\n".join(transcript)
+    ticket_key = await JIRA_OUTBOX.create_ticket_async(summary=ticket_summary, description_text=ticket_description, reporter_email=session_data.get("reporter_email"), idempotency_key=_outbox_key(session_id, session_data, OP_CREATE_TICKET))
+    session_data["jira_ticket_key"] = ticket_key
+    session_data["original_query_context_for_ticket"] = query_to_process
+    session_data["assigned_level"] = "L1 (initial)"
+    if initial_comment: await JIRA_OUTBOX.add_comment_async(ticket_key, initial_comment, is_public=False, idempotency_key=_outbox_key(session_id, session_data, OP_ADD_COMMENT, "opened"))
+    await JIRA_OUTBOX.transition_async(ticket_key, transition_id=JIRA_TRANSITION_ID_IN_PROGRESS, transition_names=IN_PROGRESS_TRANSITION_NAMES, idempotency_key=_outbox_key(session_id, session_data, OP_TRANSITION, "in-progress"))
+    return ticket_key
+
+async def _finalize_generated_response(session_id, session_data, current_mode, ticket_key, query_to_process, raw_llm_response_text,
+                                       answer_cache_lookup=None, simplified_query=None):
+    processed_text_for_display, extracted_links = await run_blocking("web", extract_and_prepare_links, raw_llm_response_text)
+    ANSWER_CACHE.store(answer_cache_lookup, simplified_query or query_to_process, processed_text_for_display, extracted_links) # No-op unless a docs-grounded miss
+    return await _answer_payload(session_id, session_data, current_mode, ticket_key, query_to_process, processed_text_for_display, extracted_links)
+
+async def _answer_payload(session_id, session_data, current_mode, ticket_key, query_to_process, processed_text_for_display, extracted_links):
+    session_data["last_bot_response_for_feedback"] = processed_text_for_display[:500]
+    feedback_options = ["👍 Helpful", "👎 Not Helpful"]
+    if current_mode == "IT" and ticket_key: await JIRA_OUTBOX.add_comment_async(ticket_key, f"Chatbot IT response for \"{query_to_process}\":\n{processed_text_for_display[:500]}...", is_public=False, idempotency_key=_outbox_key(session_id, session_data, OP_ADD_COMMENT, "answer"))
+    elif current_mode == "IT": _append_it_transcript(session_data, f"Bot: {processed_text_for_display[:500]}")
+    return {"response": processed_text_for_display, "links": extracted_links, "options": feedback_options, "session_id": session_id }
+
+async def _generation_error_payload(session_id, session_data, current_mode, ticket_key, query_to_process, e):
+    logger.error(f"SID: {session_id} | LLM response generation error for {current_mode} query '{query_to_process}': {e}. Ticket: {ticket_key or 'N/A'}", exc_info=True)
+    error_response_options_final = [f"Rephrase my {current_mode} question", f"Switch to {'HR' if current_mode == 'IT' else 'IT'} Assistant", "No, Thank you."]
+    if current_mode == "HR":
+        session_data["last_bot_response_for_feedback"] = HR_ERROR_FALLBACK_MESSAGE
+        return {"response": HR_ERROR_FALLBACK_MESSAGE, "links": HR_KEKA_LINKS, "options": error_response_options_final, "session_id": session_id}
+    else:
+        response_text = f"Sorry, I encountered an issue generating an IT response."
+        if ticket_key: response_text += f" Your IT query was logged (Ticket: {await JIRA_OUTBOX.display_key_async(ticket_key)}). Please try rephrasing."
+        elif session_data.get("it_transcript"): _append_it_transcript(session_data, f"Bot: {response_text}"); error_response_options_final.insert(1, RAISE_IT_TICKET_OPTION)
+        session_data["last_bot_response_for_feedback"] = response_text
+        return {"response": response_text, "links": [], "options": error_response_options_final, "session_id": session_id}
+
+async def _stream_generated_response(session_id, session_data, current_mode, ticket_key, query_to_process, final_prompt_for_llm,
+                                     answer_cache_lookup=None, simplified_query=None):
+    """Yields ("token", ...) events as Gemini produces text, then a single ("final", payload) event."""
+    streamed_chunks = []
+    try:
+        if not llm: raise Exception("LLM not initialized for response generation.")
+        response_stream = await llm.generate_content_async(final_prompt_for_llm, stream=True, stage="stream")
+        async for chunk in response_stream:
+            try: chunk_text = chunk.text
+            except ValueError: continue # Chunk without text parts (e.g. finish_reason only)
+            if chunk_text:
+                streamed_chunks.append(chunk_text)
+                yield "token", {"text": chunk_text}
+        final_payload = await _finalize_generated_response(session_id, session_data, current_mode, ticket_key, query_to_process, "".join(streamed_chunks),
+                                                           answer_cache_lookup, simplified_query)
+    except Exception as e:
+        final_payload = await _generation_error_payload(session_id, session_data, current_mode, ticket_key, query_to_process, e)
+    finally: await SESSION_STORE.save_async(session_id, session_data) # The turn's state changes made after _chat_turn returned, even if the client disconnected
+    yield "final", final_payload
+
+async def _chat_turn(data: QueryRequest, stream: bool = False):
     user_query_from_client = data.user_query
     session_id = data.session_id
     intent = data.intent
+    session_data = await SESSION_STORE.get_async(session_id) if session_id else None
 
     if intent == "user_said_no_thank_you":
-        if session_id and session_id in ACTIVE_SESSIONS:
-            session_data_ref = ACTIVE_SESSIONS[session_id]
-            session_data_ref["session_paused_after_farewell"] = True
-            session_data_ref["expecting_new_typed_query"] = False
-            logger.info(f"SID: {session_id} | Intent 'user_said_no_thank_you'. Session paused for {session_data_ref.get('employee_name')}.")
+        if session_data is not None:
+            session_data["session_paused_after_farewell"] = True
+            session_data["expecting_new_typed_query"] = False
+            await SESSION_STORE.save_async(session_id, session_data)
+            logger.info(f"SID: {session_id} | Intent 'user_said_no_thank_you'. Session paused for {session_data.get('employee_name')}.")
             return {
                 "response": "Alright! Have a great day. Feel free to reach out if you need anything else.",
                 "links": [], "options": [], "session_id": session_id,
@@ -126,29 +280,22 @@ async def chat(data: QueryRequest):
 
     if intent == "reset_session_for_new_employee":
         employee_name_for_log = "Unknown User"
-        if session_id and session_id in ACTIVE_SESSIONS:
-            employee_name_for_log = ACTIVE_SESSIONS[session_id].get('employee_name', 'Unknown User')
-            ACTIVE_SESSIONS.pop(session_id)
+        if session_data is not None:
+            employee_name_for_log = session_data.get('employee_name', 'Unknown User')
+            await SESSION_STORE.delete_async(session_id)
         logger.info(f"SID: {session_id if session_id else 'N/A'} | Intent 'reset_session_for_new_employee'. Session fully cleared for {employee_name_for_log}.")
         return {
             "response": "Session has been reset. Please provide your Employee ID to start a new conversation.",
             "links": [], "options": [], "session_id": None, "next_action": "expect_employee_id"
         }
 
-    if not session_id or session_id not in ACTIVE_SESSIONS:
+    if session_data is None:
         new_session_id = str(uuid.uuid4())
         log_message = f"New session started: {new_session_id}, awaiting employee ID."
-        if session_id and session_id not in ACTIVE_SESSIONS:
+        if session_id:
             log_message = f"Session {session_id} (from client) not found or reset, re-initialized as {new_session_id}. Awaiting employee ID."
         session_id = new_session_id
-        ACTIVE_SESSIONS[session_id] = {
-            "awaiting_employee_id": True, "employee_id": None, "employee_name": None,
-            "mode": None, "assistant_name": "AI Assistant",
-            "original_query_context": None, "last_bot_response_for_feedback": None,
-            "mismatched_query_info": None, "first_interaction_after_id": True,
-            "expecting_new_typed_query": False, "just_stayed_in_mode": False,
-            "session_paused_after_farewell": False
-        }
+        await SESSION_STORE.save_async(session_id, ChatSession(awaiting_employee_id=True, first_interaction_after_id=True))
         logger.info(log_message)
         return {
             "session_id": session_id,
@@ -156,16 +303,19 @@ async def chat(data: QueryRequest):
             "links": [], "options": [], "next_action": "expect_employee_id"
         }
 
-    session_data = ACTIVE_SESSIONS[session_id]
+    session_data["turn_index"] = session_data.get("turn_index", 0) + 1 # Scopes this turn's outbox idempotency keys
+    try: return await _session_turn(session_id, session_data, user_query_from_client, intent, stream)
+    finally: await SESSION_STORE.save_async(session_id, session_data) # Single write-back per turn; streamed turns save again when done
+
+async def _session_turn(session_id: str, session_data: ChatSession, user_query_from_client: str, intent: Optional[str], stream: bool):
     response_payload: Dict[str, Any] = {"session_id": session_id, "links": [], "options": []}
     logger.info(f"SID: {session_id} | Paused: {session_data.get('session_paused_after_farewell')} | AwaitingID: {session_data.get('awaiting_employee_id')} | EmpID: {session_data.get('employee_id')} | EmpName: {session_data.get('employee_name')} | Mode: {session_data.get('mode')} | ClientQ: '{user_query_from_client}' | Intent: {intent}")
 
     if session_data.get("session_paused_after_farewell"):
         session_data["session_paused_after_farewell"] = False
-        analysis_prompt_for_greeting = INITIAL_ANALYSIS_PROMPT_TEMPLATE.format(user_query=user_query_from_client, assistant_mode=session_data.get("mode", "General").upper())
         try:
-            analysis_response = llm.generate_content(analysis_prompt_for_greeting)
-            parsed_analysis = clean_json_response(analysis_response.text)
+            parsed_analysis = (await INTENT_ROUTER.classify(user_query_from_client, session_data.get("mode", "General"), session_id)
+                               or await CLASSIFICATION_CACHE.classify(llm, user_query_from_client, session_data.get("mode", "General"), session_id))
             if parsed_analysis and parsed_analysis.get("best_source") == "Greeting":
                 logger.info(f"SID: {session_id} | User greeted after pause. Prompting for department or continue.")
                 first_name = session_data.get("employee_name", "User").split()[0]
@@ -220,7 +370,7 @@ async def chat(data: QueryRequest):
 
         session_data.update({"mode": new_mode, "assistant_name": f"{new_mode} Assistant", "first_interaction_after_id": False, "mismatched_query_info": None, "original_query_context": None, "expecting_new_typed_query": False, "just_stayed_in_mode": False})
         if new_mode == "IT" and intent != "continue_with_current_mode":
-            session_data.update({"jira_ticket_key": None, "assigned_level": None, "pending_email_for_ticket_update": None, "original_query_context_for_ticket": None})
+            session_data.update({"jira_ticket_key": None, "assigned_level": None, "pending_email_for_ticket_update": None, "original_query_context_for_ticket": None, "it_transcript": None})
         logger.info(f"SID: {session_id} | Intent '{intent}': Mode set/switched/continued to {new_mode} for {session_data.get('employee_name')}.")
         other_mode_text = "HR" if new_mode == "IT" else "IT"
         response_payload["response"] = f"You’re now connected with the {session_data['assistant_name']}. How can I help you today?"
@@ -259,7 +409,7 @@ async def chat(data: QueryRequest):
                         "session_id": session_id}
             
             session_data.pop("pending_email_for_ticket_update", None) # Clear the pending flag
-            add_jira_comment(ticket_key_for_email, f"Chatbot (IT): User contact email: {user_email}", is_public=False)
+            await JIRA_OUTBOX.add_comment_async(ticket_key_for_email, f"Chatbot (IT): User contact email: {user_email}", is_public=False, idempotency_key=_outbox_key(session_id, session_data, OP_ADD_COMMENT, "email"))
             session_data["reporter_email"] = user_email # Store email for future use in this session
             retrieved_assigned_level = session_data.get("assigned_level", "support")
             
@@ -270,7 +420,7 @@ async def chat(data: QueryRequest):
                                  "just_stayed_in_mode": False})
             
             options_after_email = [f"Ask another {current_mode} question", f"Switch to HR Assistant", "No, Thank you."]
-            response_text = f"Thanks! IT Ticket **{ticket_key_for_email}** is now being handled by our {retrieved_assigned_level} staff. We’ll contact you at **{user_email}** if needed. How else can I help?"
+            response_text = f"Thanks! IT Ticket **{await JIRA_OUTBOX.display_key_async(ticket_key_for_email)}** is now being handled by our {retrieved_assigned_level} staff. We’ll contact you at **{user_email}** if needed. How else can I help?"
             session_data["last_bot_response_for_feedback"] = response_text
             return {"response":response_text, "links": [], "options": options_after_email, "session_id": session_id}
         else:
@@ -294,21 +444,22 @@ async def chat(data: QueryRequest):
         options = ["Yes, I need assistance with something else", "No, Thank you."]
 
         if current_mode == "IT" and ticket_key:
-            add_jira_comment(ticket_key, f"Chatbot (IT): User indicated helpful. Query context: \"{query_context_for_feedback}\". Closing.", is_public=False)
-            close_transition_id = JIRA_TRANSITION_ID_CLOSE or find_transition_id_by_name(ticket_key, ["Done", "Resolve Issue", "Close Issue", "Resolve", "Closed", "RESOLVED"])
-            if close_transition_id:
-                transition_result = transition_jira_ticket(ticket_key, close_transition_id)
-                response_text_line1 = f"Glad I could help with the IT issue! Ticket {ticket_key} is now " + ("closed." if transition_result.get("success") else "marked for closing.")
-            else: response_text_line1 = f"Glad I could help with the IT issue! (Close transition not found for ticket {ticket_key})."
+            await JIRA_OUTBOX.add_comment_async(ticket_key, f"Chatbot (IT): User indicated helpful. Query context: \"{query_context_for_feedback}\". Closing.", is_public=False, idempotency_key=_outbox_key(session_id, session_data, OP_ADD_COMMENT, "helpful"))
+            await JIRA_OUTBOX.transition_async(ticket_key, transition_id=JIRA_TRANSITION_ID_CLOSE, transition_names=CLOSE_TRANSITION_NAMES, idempotency_key=_outbox_key(session_id, session_data, OP_TRANSITION, "close"))
+            response_text_line1 = f"Glad I could help with the IT issue! Ticket {await JIRA_OUTBOX.display_key_async(ticket_key)} is now marked for closing."
             session_data.pop("jira_ticket_key", None); session_data.pop("assigned_level", None); session_data.pop("pending_email_for_ticket_update", None)
             session_data.pop("original_query_context_for_ticket", None)
+        elif current_mode == "IT" and session_data.get("it_transcript"): # Lazy mode: resolved by the bot, nothing to send to Jira
+            response_text_line1 = "Glad I could help with the IT issue!"
+            session_data.pop("it_transcript", None); session_data.pop("original_query_context_for_ticket", None)
         elif current_mode == "HR": response_text_line1 = "I'm glad I could help with your HR question!"
         full_response_text = f"{response_text_line1}\n\n{response_text_line2}"
         session_data.update({"original_query_context": None, "last_bot_response_for_feedback": full_response_text, "expecting_new_typed_query": False, "just_stayed_in_mode": False})
         return {"response": full_response_text, "links": [], "options": options, "session_id": session_id }
 
-    if intent == "user_feedback_not_helpful":
-        logger.info(f"SID: {session_id} | Intent 'user_feedback_not_helpful' for query context: '{query_context_for_feedback}' by {session_data.get('employee_name')}")
+    if intent == "user_feedback_not_helpful" or intent == "escalate_to_it_ticket":
+        if intent == "user_feedback_not_helpful" and session_data.get("original_query_context"): await ANSWER_CACHE.invalidate(session_data["original_query_context"], current_mode)
+        logger.info(f"SID: {session_id} | Intent '{intent}' for query context: '{query_context_for_feedback}' by {session_data.get('employee_name')}")
         session_data["expecting_new_typed_query"] = False
 
         if current_mode == "HR":
@@ -324,38 +475,47 @@ async def chat(data: QueryRequest):
             options_after_not_helpful.insert(1, f"Switch to {'HR' if current_mode == 'IT' else 'IT'} Assistant")
         session_data["just_stayed_in_mode"] = False
 
+        if current_mode == "IT" and not ticket_key and session_data.get("it_transcript"):
+            feedback_line = "User: marked the answer as not helpful." if intent == "user_feedback_not_helpful" else "User: asked to raise an IT ticket."
+            transcript = session_data.pop("it_transcript") + [feedback_line]
+            try: ticket_key = await _queue_it_ticket(session_id, session_data, session_data.get("original_query_context_for_ticket") or query_context_for_feedback, transcript=transcript)
+            except Exception as e: logger.error(f"SID: {session_id} | Failed to queue escalation ticket for '{query_context_for_feedback}': {e}", exc_info=True)
+        elif current_mode == "IT" and ticket_key:
+            await JIRA_OUTBOX.add_comment_async(ticket_key, f"Chatbot (IT): User NOT helped. Query context: \"{query_context_for_feedback}\". Bot's last response: \"{last_bot_response_text[:200]}...\". Initiating LLM assignment.", is_public=True, idempotency_key=_outbox_key(session_id, session_data, OP_ADD_COMMENT, "not-helped"))
+
         if current_mode == "IT" and ticket_key:
-            add_jira_comment(ticket_key, f"Chatbot (IT): User NOT helped. Query context: \"{query_context_for_feedback}\". Bot's last response: \"{last_bot_response_text[:200]}...\". Initiating LLM assignment.", is_public=True)
             assignment_prompt_text = TICKET_ASSIGNMENT_PROMPT_TEMPLATE.format(user_query=query_context_for_feedback, chatbot_response=last_bot_response_text, user_feedback="User found the chatbot's IT response not helpful.")
             assigned_to_level_str, llm_priority_name_for_response = "L1 (default on error)", "Medium"
             try: 
-                assignment_llm_response = llm.generate_content(assignment_prompt_text)
+                if not llm: raise Exception("LLM not initialized for ticket assignment.")
+                assignment_llm_response = await llm.generate_content_async(assignment_prompt_text, stage="assignment")
                 assignment_details = clean_json_response(assignment_llm_response.text)
                 if assignment_details: 
                     llm_level, llm_priority_name = assignment_details.get("assignment_level", "L1").upper(), assignment_details.get("priority", "Medium").capitalize()
                     assigned_to_level_str, llm_priority_name_for_response = llm_level, llm_priority_name
-                    add_jira_comment(ticket_key, f"LLM Routing Suggestion (IT):\nLevel: {llm_level}\nPriority: {llm_priority_name}\nCategory: {assignment_details.get('suggested_category', 'N/A')}\nReason: {assignment_details.get('reasoning', 'N/A')}", is_public=False)
+                    await JIRA_OUTBOX.add_comment_async(ticket_key, f"LLM Routing Suggestion (IT):\nLevel: {llm_level}\nPriority: {llm_priority_name}\nCategory: {assignment_details.get('suggested_category', 'N/A')}\nReason: {assignment_details.get('reasoning', 'N/A')}", is_public=False, idempotency_key=_outbox_key(session_id, session_data, OP_ADD_COMMENT, "routing"))
                     assignee_id_to_set = None 
                     if llm_level == "L1" and JIRA_L1_ASSIGNEE_ACCOUNT_ID: assignee_id_to_set = JIRA_L1_ASSIGNEE_ACCOUNT_ID
                     elif llm_level == "L2" and JIRA_L2_ASSIGNEE_ACCOUNT_ID: assignee_id_to_set = JIRA_L2_ASSIGNEE_ACCOUNT_ID
                     elif JIRA_L1_ASSIGNEE_ACCOUNT_ID: assignee_id_to_set = JIRA_L1_ASSIGNEE_ACCOUNT_ID; assigned_to_level_str = "L1 (defaulted)"
-                    if assignee_id_to_set: assign_jira_issue(ticket_key, assignee_id_to_set)
+                    if assignee_id_to_set: await JIRA_OUTBOX.assign_async(ticket_key, assignee_id_to_set, idempotency_key=_outbox_key(session_id, session_data, OP_ASSIGN, "routing"))
                     else: assigned_to_level_str = "Unassigned (by bot)"
                     priority_map = {"High": "1", "Highest": "1", "Medium": "2", "Low": "3", "Lowest": "4"}
-                    set_jira_issue_priority(ticket_key, priority_map.get(llm_priority_name, "2"))
+                    await JIRA_OUTBOX.set_priority_async(ticket_key, priority_map.get(llm_priority_name, "2"), idempotency_key=_outbox_key(session_id, session_data, OP_SET_PRIORITY, "routing"))
                 else: 
-                    if JIRA_L1_ASSIGNEE_ACCOUNT_ID: assign_jira_issue(ticket_key, JIRA_L1_ASSIGNEE_ACCOUNT_ID)
-                    set_jira_issue_priority(ticket_key, "2") 
+                    if JIRA_L1_ASSIGNEE_ACCOUNT_ID: await JIRA_OUTBOX.assign_async(ticket_key, JIRA_L1_ASSIGNEE_ACCOUNT_ID, idempotency_key=_outbox_key(session_id, session_data, OP_ASSIGN, "routing"))
+                    await JIRA_OUTBOX.set_priority_async(ticket_key, "2", idempotency_key=_outbox_key(session_id, session_data, OP_SET_PRIORITY, "routing")) 
             except Exception as e: logger.error(f"SID: {session_id} | Error LLM ticket assignment for {ticket_key}: {e}", exc_info=True)
 
             session_data["assigned_level"] = assigned_to_level_str
+            display_ticket_key = await JIRA_OUTBOX.wait_for_ticket_key(ticket_key)
             if not session_data.get("reporter_email"):
                 session_data["pending_email_for_ticket_update"] = ticket_key # Set flag before asking for email
-                temp_response_payload = {"response": f"Thanks for the IT feedback. Your ticket **{ticket_key}** has been escalated to our {assigned_to_level_str} support team with *{llm_priority_name_for_response}* urgency. Please share your email so we can follow up with you.",
+                temp_response_payload = {"response": f"Thanks for the IT feedback. Your ticket **{display_ticket_key}** has been escalated to our {assigned_to_level_str} support team with *{llm_priority_name_for_response}* urgency. Please share your email so we can follow up with you.",
                                    "links": [], "options": [], "next_action": "expect_email_for_ticket_update", "session_id": session_id}
             else:
                 session_data.update({"jira_ticket_key": None, "assigned_level": None, "original_query_context": None, "last_bot_response_for_feedback": None, "original_query_context_for_ticket": None})
-                temp_response_payload = {"response": f"I'm sorry the previous IT solution wasn't helpful. Your issue (Ticket: **{ticket_key}**) has been routed to our {assigned_to_level_str} team with *{llm_priority_name_for_response}* priority using your email {session_data.get('reporter_email')}. How else can I help?",
+                temp_response_payload = {"response": f"I'm sorry the previous IT solution wasn't helpful. Your issue (Ticket: **{display_ticket_key}**) has been routed to our {assigned_to_level_str} team with *{llm_priority_name_for_response}* priority using your email {session_data.get('reporter_email')}. How else can I help?",
                                    "links": [], "options": options_after_not_helpful, "session_id": session_id}
             session_data["last_bot_response_for_feedback"] = temp_response_payload["response"]
             return temp_response_payload
@@ -364,13 +524,20 @@ async def chat(data: QueryRequest):
         session_data["last_bot_response_for_feedback"] = response_text
         return {"response": response_text, "links": [], "options": options_after_not_helpful, "session_id": session_id}
 
+    if not llm: return await _component_unavailable_payload(session_id, session_data, current_mode, ticket_key, "llm")
+
     # --- Main Query Processing Logic ---
     # (This section remains largely the same, but the email intent is handled above now)
     # ...
     query_to_process = user_query_from_client
     simplified_query_to_process = user_query_from_client
     source_classification = "Internal_Docs"
+    retriever_component = "it_retriever" if current_mode == "IT" else "hr_retriever"
+    single_call_result = None # Set when PIPELINE_MODE="single_call" produced usable structured output
+    speculative_retrieval = None # Raw-query retrieval started alongside the analysis call
     was_expecting_new_typed_query = session_data.pop("expecting_new_typed_query", False)
+    answer_cache_lookup = await ANSWER_CACHE.lookup(query_to_process, current_mode) if not intent else None
+    cached_answer = answer_cache_lookup.entry if answer_cache_lookup else None
 
     if intent == "stay_in_current_mode":
         mismatched_info = session_data.get("mismatched_query_info")
@@ -383,44 +550,51 @@ async def chat(data: QueryRequest):
     elif not intent: 
         if session_data.get("just_stayed_in_mode"): 
             session_data["just_stayed_in_mode"] = False
-        if was_expecting_new_typed_query:
+        if cached_answer: # A similar query was answered from the docs before; analysis and RAG are skipped
+            session_data["original_query_context"] = query_to_process
+            source_classification = "Internal_Docs"; simplified_query_to_process = cached_answer.simplified_query
+        elif was_expecting_new_typed_query:
             logger.info(f"SID: {session_id} | Processing as new typed query after prompt. Bypassing LLM analysis for: '{query_to_process}'")
             source_classification = "Internal_Docs"
             session_data["original_query_context"] = query_to_process
         else:
             session_data["original_query_context"] = query_to_process
-            analysis_prompt = INITIAL_ANALYSIS_PROMPT_TEMPLATE.format(user_query=query_to_process, assistant_mode=current_mode.upper())
-            try: 
-                analysis_response = llm.generate_content(analysis_prompt)
-                logger.debug(f"SID: {session_id} | RAW LLM Analysis Response Text: {analysis_response.text}")
-                parsed_analysis = clean_json_response(analysis_response.text)
-                if parsed_analysis:
-                    logger.info(f"SID: {session_id} | Parsed LLM Analysis: {parsed_analysis}")
-                    source_classification = parsed_analysis.get("best_source", "Internal_Docs")
-                    simplified_query_to_process = parsed_analysis.get("simplified_query_for_search", query_to_process)
-                else:
-                    logger.warning(f"SID: {session_id} | Failed to parse JSON from analysis for '{query_to_process}'. Raw: {analysis_response.text}. Defaulting.")
-            except Exception as e: 
-                logger.error(f"SID: {session_id} | Analysis step failed for query '{query_to_process}': {e}", exc_info=True)
-                error_response_text = HR_ERROR_FALLBACK_MESSAGE if current_mode == "HR" else f"Sorry, I had trouble understanding that {current_mode} query. Could you rephrase?"
-                error_options = [f"Rephrase my {current_mode} question", f"Switch to {'HR' if current_mode == 'IT' else 'IT'} Assistant", "No, Thank you."]
-                session_data["last_bot_response_for_feedback"] = error_response_text
-                return {"response": error_response_text, "links": HR_KEKA_LINKS if current_mode == "HR" else [], "options": error_options, "session_id": session_id}
+            routed_analysis = await INTENT_ROUTER.classify(query_to_process, current_mode, session_id)
+            if not routed_analysis and PIPELINE_MODE == "single_call":
+                single_call_result = await analyze_and_answer(llm, get_shared_resource(retriever_component), query_to_process, current_mode, session_id)
+            if routed_analysis: # Greeting/OutOfScope/TopicMismatch settled locally
+                source_classification = routed_analysis["best_source"]; simplified_query_to_process = routed_analysis["simplified_query_for_search"]
+            elif single_call_result:
+                source_classification = single_call_result["best_source"]; simplified_query_to_process = single_call_result["simplified_query"]
+                if source_classification == "Internal_Docs" and not single_call_result["context_relevant"] and current_mode == "IT": source_classification = "Web_Search_IT"
+            else:
+                speculative_retrieval = start_speculative_retrieval(get_shared_resource(retriever_component), query_to_process, current_mode) # Overlaps the analysis call
+                try: 
+                    parsed_analysis = await CLASSIFICATION_CACHE.classify(llm, query_to_process, current_mode, session_id)
+                    if parsed_analysis:
+                        logger.info(f"SID: {session_id} | Parsed LLM Analysis: {parsed_analysis}")
+                        source_classification = parsed_analysis.get("best_source", "Internal_Docs")
+                        simplified_query_to_process = parsed_analysis.get("simplified_query_for_search", query_to_process)
+                    else:
+                        logger.warning(f"SID: {session_id} | Failed to parse JSON from analysis for '{query_to_process}'. Defaulting.")
+                except Exception as e: 
+                    logger.error(f"SID: {session_id} | Analysis step failed for query '{query_to_process}': {e}", exc_info=True)
+                    error_response_text = HR_ERROR_FALLBACK_MESSAGE if current_mode == "HR" else f"Sorry, I had trouble understanding that {current_mode} query. Could you rephrase?"
+                    error_options = [f"Rephrase my {current_mode} question", f"Switch to {'HR' if current_mode == 'IT' else 'IT'} Assistant", "No, Thank you."]
+                    session_data["last_bot_response_for_feedback"] = error_response_text
+                    return {"response": error_response_text, "links": HR_KEKA_LINKS if current_mode == "HR" else [], "options": error_options, "session_id": session_id}
 
     elif intent and not was_expecting_new_typed_query : 
         session_data["just_stayed_in_mode"] = False 
         session_data["original_query_context"] = query_to_process
-        analysis_prompt = INITIAL_ANALYSIS_PROMPT_TEMPLATE.format(user_query=query_to_process, assistant_mode=current_mode.upper())
         try:
-            analysis_response = llm.generate_content(analysis_prompt)
-            logger.debug(f"SID: {session_id} | RAW LLM Analysis (for button text) Response Text: {analysis_response.text}")
-            parsed_analysis = clean_json_response(analysis_response.text)
+            parsed_analysis = await CLASSIFICATION_CACHE.classify(llm, query_to_process, current_mode, session_id)
             if parsed_analysis:
                 logger.info(f"SID: {session_id} | Parsed LLM Analysis (for button text): {parsed_analysis}")
                 source_classification = parsed_analysis.get("best_source", "Internal_Docs")
                 simplified_query_to_process = parsed_analysis.get("simplified_query_for_search", query_to_process)
             else:
-                logger.warning(f"SID: {session_id} | Failed to parse JSON (for button text) from analysis for '{query_to_process}'. Raw: {analysis_response.text}. Defaulting.")
+                logger.warning(f"SID: {session_id} | Failed to parse JSON (for button text) from analysis for '{query_to_process}'. Defaulting.")
         except Exception as e:
             logger.error(f"SID: {session_id} | Analysis step failed for button text query '{query_to_process}': {e}", exc_info=True)
             source_classification = "Internal_Docs"
@@ -453,7 +627,13 @@ async def chat(data: QueryRequest):
         session_data["last_bot_response_for_feedback"] = response_text
         return {"response": response_text, "links": [], "options": options_mismatch, "session_id": session_id}
 
-    if current_mode == "IT" and source_classification in ["Internal_Docs", "Web_Search_IT"]:
+    if current_mode == "IT" and source_classification in ["Internal_Docs", "Web_Search_IT"] and JIRA_LAZY_TICKET_CREATION:
+        if session_data.get("it_transcript") and session_data.get("original_query_context_for_ticket") == query_to_process:
+            session_data["it_transcript"].append(f"User (follow-up): {query_to_process}")
+        else:
+            session_data.pop("jira_ticket_key", None); ticket_key = None
+            session_data.update({"original_query_context_for_ticket": query_to_process, "it_transcript": [f"User: {query_to_process}"]})
+    elif current_mode == "IT" and source_classification in ["Internal_Docs", "Web_Search_IT"]:
         if not ticket_key or session_data.get("original_query_context_for_ticket") != query_to_process:
             if ticket_key:
                 logger.info(f"SID: {session_id} | New IT query '{query_to_process}', different from previous ticket {ticket_key}'s query ('{session_data.get('original_query_context_for_ticket')}'). Will create a new ticket.")
@@ -461,54 +641,32 @@ async def chat(data: QueryRequest):
                 session_data.pop("original_query_context_for_ticket", None)
             if not ticket_key:
                 logger.info(f"SID: {session_id} | New IT query for ticket: '{query_to_process}'. Creating Jira ticket.")
-                ticket_summary = f"Chatbot IT ({session_data.get('employee_name', 'N/A')} - EmpID {session_data.get('employee_id', 'N/A')}): {query_to_process[:60]}..."
-                ticket_description = f"Employee: {session_data.get('employee_name', 'N/A')} (ID: {session_data.get('employee_id', 'N/A')})\nQuery (IT Mode): {query_to_process}"
-                ticket_result = create_jira_ticket(summary=ticket_summary, description_text=ticket_description, reporter_email=session_data.get("reporter_email"))
-                if ticket_result.get("success"):
-                    ticket_key = ticket_result["ticket_key"]; session_data["jira_ticket_key"] = ticket_key
-                    session_data["original_query_context_for_ticket"] = query_to_process
-                    session_data["assigned_level"] = "L1 (initial)"
-                    add_jira_comment(ticket_key, f"Chatbot (IT): Ticket for query: \"{query_to_process}\". Bot attempting to resolve.", is_public=False)
-                    in_progress_id = JIRA_TRANSITION_ID_IN_PROGRESS or find_transition_id_by_name(ticket_key, ["Start Work", "In Progress", "Work In Progress", "OPEN"])
-                    if in_progress_id: transition_jira_ticket(ticket_key, in_progress_id)
-                else: logger.error(f"SID: {session_id} | Failed to create IT Jira ticket for '{query_to_process}': {ticket_result.get('error')}")
+                try: ticket_key = await _queue_it_ticket(session_id, session_data, query_to_process, initial_comment=f"Chatbot (IT): Ticket for query: \"{query_to_process}\". Bot attempting to resolve.")
+                except Exception as e: logger.error(f"SID: {session_id} | Failed to queue IT Jira ticket for '{query_to_process}': {e}", exc_info=True)
         elif ticket_key:
-             add_jira_comment(ticket_key, f"Chatbot (IT): User follow-up on same issue ({ticket_key}): \"{query_to_process}\"", is_public=False)
+             await JIRA_OUTBOX.add_comment_async(ticket_key, f"Chatbot (IT): User follow-up on same issue: \"{query_to_process}\"", is_public=False, idempotency_key=_outbox_key(session_id, session_data, OP_ADD_COMMENT, "follow-up"))
 
-    context = ""; retrieved_docs_source_type = f"{current_mode} Internal Docs"
-    active_retriever = it_retriever if current_mode == "IT" else hr_retriever
-    if not active_retriever: 
-        logger.error(f"SID: {session_id} | {current_mode} retriever is not available.")
-        error_response_options = [f"Rephrase my {current_mode} question", f"Switch to {'HR' if current_mode == 'IT' else 'IT'} Assistant", "No, Thank you."]
-        if current_mode == "HR":
-            session_data["last_bot_response_for_feedback"] = HR_ERROR_FALLBACK_MESSAGE
-            return {"response": HR_ERROR_FALLBACK_MESSAGE, "links": HR_KEKA_LINKS, "options": error_response_options, "session_id": session_id}
-        else:
-            response_text = f"I'm currently unable to search {current_mode} documents. Please try again later."
-            if ticket_key: response_text += f" Your query for ticket {ticket_key} is logged."
-            session_data["last_bot_response_for_feedback"] = response_text
-            return {"response": response_text, "links": [], "options": error_response_options, "session_id": session_id}
+    if cached_answer: return await _answer_payload(session_id, session_data, current_mode, ticket_key, query_to_process, cached_answer.response, cached_answer.links)
+    if single_call_result and single_call_result["answer"]: # Classification, relevance and answer already came from one call
+        return await _finalize_generated_response(session_id, session_data, current_mode, ticket_key, query_to_process, single_call_result["answer"],
+                                                  answer_cache_lookup, simplified_query_to_process)
 
-    if source_classification == "Internal_Docs": 
+    context = ""; retrieved_docs_source_type = f"{current_mode} Internal Docs"; speculative_web_search = None
+    active_retriever = get_shared_resource(retriever_component)
+    if not active_retriever: return await _component_unavailable_payload(session_id, session_data, current_mode, ticket_key, retriever_component)
+
+    if source_classification == "Internal_Docs" and not single_call_result: # A single-call "NO" verdict already ruled the docs out
         try:
-            docs = active_retriever.get_relevant_documents(simplified_query_to_process)
-            if docs:
-                context_from_docs = "\n\n---\n\n".join([f"Source: {d.metadata.get('source', 'Document')}\n{d.page_content}" for d in docs])
-                relevance_prompt_text = RELEVANCE_CHECK_PROMPT_TEMPLATE.format(user_query=query_to_process, simplified_query=simplified_query_to_process, retrieved_context=context_from_docs[:3000])
-                if not llm: raise Exception("LLM not initialized for relevance check.")
-                rel_check_response = llm.generate_content(relevance_prompt_text)
-                if "NO" in rel_check_response.text.strip().upper():
-                    context = "";
-                    if current_mode == "IT": source_classification = "Web_Search_IT"
-                else: context = context_from_docs
-            elif current_mode == "IT": source_classification = "Web_Search_IT"
+            context, speculative_web_search = await retrieve_relevant_context(llm, active_retriever, query_to_process, simplified_query_to_process, current_mode,
+                                                                              session_id, speculative_retrieval, perform_duckduckgo_search if current_mode == "IT" else None)
+            if not context and current_mode == "IT": source_classification = "Web_Search_IT"
         except Exception as e:
             logger.error(f"SID: {session_id} | Retriever/relevance error for {current_mode} query '{simplified_query_to_process}': {e}", exc_info=True)
             if current_mode == "IT": source_classification = "Web_Search_IT"
 
     if not context and current_mode == "IT" and source_classification == "Web_Search_IT": 
         logger.info(f"SID: {session_id} | Performing web search for IT query: {simplified_query_to_process}")
-        context = perform_duckduckgo_search(simplified_query_to_process)
+        context = await web_search_context(perform_duckduckgo_search, simplified_query_to_process, speculative_web_search)
         retrieved_docs_source_type = "Web Search Results"
         if "did not yield specific results" in context or "failed" in context: context = ""
     
@@ -524,32 +682,25 @@ async def chat(data: QueryRequest):
             return {"response": HR_FALLBACK_MESSAGE, "links": HR_KEKA_LINKS, "options": hr_no_context_options, "session_id": session_id}
         elif current_mode == "IT":
             response_text = "I couldn't find specific information for your IT query in my documents or via web search right now."
-            if ticket_key: response_text += f" Your IT query has been logged (Ticket: {ticket_key}). An agent may review it if the issue persists."
+            if ticket_key: response_text += f" Your IT query has been logged (Ticket: {await JIRA_OUTBOX.display_key_async(ticket_key)}). An agent may review it if the issue persists."
+            elif session_data.get("it_transcript"):
+                response_text += " You can try rephrasing, or raise an IT ticket and our support team will follow up."
+                _append_it_transcript(session_data, f"Bot: {response_text}"); no_context_options_after_rag_final.insert(1, RAISE_IT_TICKET_OPTION)
             else: response_text += " You can try rephrasing or asking a different IT question."
             session_data["last_bot_response_for_feedback"] = response_text
             return {"response": response_text, "links": [], "options": no_context_options_after_rag_final, "session_id": session_id}
 
     final_prompt_for_llm = RESPONSE_GENERATION_PROMPT_TEMPLATE.format(user_query=query_to_process, source_type_used=retrieved_docs_source_type, context=context)
+    if retrieved_docs_source_type != f"{current_mode} Internal Docs": answer_cache_lookup = None # Only docs-grounded answers are cached
+    if stream: return _stream_generated_response(session_id, session_data, current_mode, ticket_key, query_to_process, final_prompt_for_llm,
+                                                 answer_cache_lookup, simplified_query_to_process)
     try:
         if not llm: raise Exception("LLM not initialized for response generation.")
-        final_response_content = llm.generate_content(final_prompt_for_llm)
-        raw_llm_response_text = final_response_content.text
-        processed_text_for_display, extracted_links = extract_and_prepare_links(raw_llm_response_text)
-        session_data["last_bot_response_for_feedback"] = processed_text_for_display[:500]
-        feedback_options = ["👍 Helpful", "👎 Not Helpful"]
-        if current_mode == "IT" and ticket_key: add_jira_comment(ticket_key, f"Chatbot IT response for \"{query_to_process}\":\n{processed_text_for_display[:500]}...", is_public=False)
-        return {"response": processed_text_for_display, "links": extracted_links, "options": feedback_options, "session_id": session_id }
+        final_response_content = await llm.generate_content_async(final_prompt_for_llm, stage="generation")
+        return await _finalize_generated_response(session_id, session_data, current_mode, ticket_key, query_to_process, final_response_content.text,
+                                                  answer_cache_lookup, simplified_query_to_process)
     except Exception as e: 
-        logger.error(f"SID: {session_id} | LLM response generation error for {current_mode} query '{query_to_process}': {e}. Ticket: {ticket_key or 'N/A'}", exc_info=True)
-        error_response_options_final = [f"Rephrase my {current_mode} question", f"Switch to {'HR' if current_mode == 'IT' else 'IT'} Assistant", "No, Thank you."]
-        if current_mode == "HR":
-            session_data["last_bot_response_for_feedback"] = HR_ERROR_FALLBACK_MESSAGE
-            return {"response": HR_ERROR_FALLBACK_MESSAGE, "links": HR_KEKA_LINKS, "options": error_response_options_final, "session_id": session_id}
-        else:
-            response_text = f"Sorry, I encountered an issue generating an IT response."
-            if ticket_key: response_text += f" Your IT query was logged (Ticket: {ticket_key}). Please try rephrasing."
-            session_data["last_bot_response_for_feedback"] = response_text
-            return {"response": response_text, "links": [], "options": error_response_options_final, "session_id": session_id}
+        return await _generation_error_payload(session_id, session_data, current_mode, ticket_key, query_to_process, e)
 
     logger.error(f"SID: {session_id} | Fallback: No specific response path taken for query: '{query_to_process}'")
     fallback_options = [f"Ask another {current_mode} question", f"Switch to {'HR' if current_mode == 'IT' else 'IT'} Assistant", "No, Thank you."]
@@ -0,0 +1,259 @@
+# rag_pipeline.py
+import asyncio
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from chatbot_logging import logger
+from chatbot_llm import clean_json_response
+from chatbot_prompts import ANALYZE_AND_ANSWER_PROMPT_TEMPLATE, RELEVANCE_CHECK_PROMPT_TEMPLATE
+from context_packing import (
+    CONTEXT_TOKENS_GENERATION, CONTEXT_TOKENS_RELEVANCE, CONTEXT_TOKENS_SINGLE_CALL,
+    build_context, format_docs_context, get_packing_stats, query_terms
+)
+from async_utils import run_blocking
+
+# --- PIPELINE MODE ---
+# "multi_call": analysis, relevance check and answer generation are three sequential Gemini calls (default).
+# "single_call": retrieve on the raw query first, then one Gemini call returns classification, relevance verdict
+# and answer as JSON. Turns whose structured output is unusable fall back to the multi-call path.
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "multi_call").lower()
+SINGLE_CALL_CONTEXT_CHARS = int(os.getenv("SINGLE_CALL_CONTEXT_CHARS", "6000")) # Only with CONTEXT_PACKING=false
+
+# --- SCORED RETRIEVAL ---
+# Internal-docs retrieval keeps every candidate within RETRIEVAL_SCORE_MARGIN of the best hit (dynamic k), and the
+# best hit's cosine similarity gates relevance against per-index thresholds fitted by testing/calibrate_relevance.py:
+# >= accept is relevant, < reject is not, and only the band in between asks Gemini (RELEVANCE_CHECK_PROMPT_TEMPLATE).
+# An index without calibrated thresholds is always "uncertain", i.e. every turn still gets the LLM check.
+RELEVANCE_THRESHOLDS_PATH = os.getenv("RELEVANCE_THRESHOLDS_PATH", "data/relevance_thresholds.json")
+RELEVANCE_LLM_CHECK = os.getenv("RELEVANCE_LLM_CHECK", "True").lower() == "true" # False: uncertain results count as relevant
+RETRIEVAL_MAX_K = int(os.getenv("RETRIEVAL_MAX_K", "8"))
+RETRIEVAL_MIN_K = int(os.getenv("RETRIEVAL_MIN_K", "2"))
+RETRIEVAL_SCORE_MARGIN = float(os.getenv("RETRIEVAL_SCORE_MARGIN", "0.08"))
+
+# --- SPECULATIVE RETRIEVAL ---
+# Multi-call turns start retrieval on the raw query while the analysis call is in flight. The result is reused when
+# the simplified query adds (almost) nothing the raw query didn't contain, otherwise the simplified query is re-run.
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "True").lower() == "true"
+SPECULATIVE_MIN_COVERAGE = float(os.getenv("SPECULATIVE_MIN_COVERAGE", "0.8")) # Share of simplified-query terms found in the raw query
+
+# --- SPECULATIVE WEB SEARCH (IT mode) ---
+# When the internal hit is weak (uncertain band, below its midpoint) the DuckDuckGo search starts alongside the LLM
+# relevance check instead of after it, and is cancelled if the docs turn out relevant. It is only worth the extra
+# search when the serial fallback (moving averages of relevance check + web search) would exceed the latency budget.
+# Indexes without calibrated thresholds never speculate: with no score limits there is no way to call a hit weak.
+SPECULATIVE_WEB_SEARCH = os.getenv("SPECULATIVE_WEB_SEARCH", "False").lower() == "true"
+SPECULATIVE_WEB_LATENCY_BUDGET_MS = float(os.getenv("SPECULATIVE_WEB_LATENCY_BUDGET_MS", "1500"))
+
+VALID_SOURCES = {"Internal_Docs", "Web_Search_IT", "Greeting", "TopicMismatch", "OutOfScope"}
+
+_stats_lock = threading.Lock()
+_pipeline_stats = {"single_call_turns": 0, "single_call_answered": 0, "single_call_not_relevant": 0, "fallbacks": 0,
+                   "gate_relevant": 0, "gate_not_relevant": 0, "gate_uncertain": 0, "relevance_llm_checks": 0,
+                   "speculative_started": 0, "speculative_used": 0, "speculative_requeried": 0,
+                   "web_speculated": 0, "web_speculation_used": 0, "web_speculation_cancelled": 0}
+_latency_ewma_ms = {"relevance_check": 800.0, "web_search": 1500.0} # Seeds until real calls have been timed
+
+def _count(key: str):
+    with _stats_lock: _pipeline_stats[key] += 1
+
+def _record_latency(key: str, started: float, weight: float = 0.2):
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    with _stats_lock: _latency_ewma_ms[key] += weight * (elapsed_ms - _latency_ewma_ms[key])
+
+def get_pipeline_stats() -> dict:
+    with _stats_lock:
+        # Started but neither used nor re-queried: the turn never reached internal-docs retrieval (greeting, web search...)
+        unused = _pipeline_stats["speculative_started"] - _pipeline_stats["speculative_used"] - _pipeline_stats["speculative_requeried"]
+        return {"mode": PIPELINE_MODE, **_pipeline_stats, "speculative_unused": unused, **get_packing_stats(),
+                **{f"{key}_ewma_ms": round(value) for key, value in _latency_ewma_ms.items()}}
+
+def load_relevance_thresholds(path: str = RELEVANCE_THRESHOLDS_PATH) -> dict:
+    """{"IT": {"accept": float, "reject": float, ...}, "HR": {...}} as written by testing/calibrate_relevance.py."""
+    if not path or not os.path.exists(path): return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f: thresholds = json.load(f)
+        logger.info(f"Relevance thresholds loaded from {path}: " + ", ".join(f"{mode} accept>={t['accept']:.3f} reject<{t['reject']:.3f}" for mode, t in thresholds.items()))
+        return thresholds
+    except Exception as e:
+        logger.error(f"Could not load relevance thresholds from {path}: {e}. Every retrieval will get the LLM relevance check.", exc_info=True)
+        return {}
+
+RELEVANCE_THRESHOLDS = load_relevance_thresholds()
+
+def distance_to_similarity(distance: float, index) -> float:
+    """FAISS score -> cosine similarity. Inner-product indexes (metric 0) already return it; the default flat L2
+    index returns the squared distance between unit vectors (sentence-transformer embeddings are normalized)."""
+    return float(distance) if getattr(index, "metric_type", 1) == 0 else 1.0 - float(distance) / 2.0
+
+@dataclass(slots=True)
+class ScoredRetrieval:
+    docs: list
+    scores: list = field(default_factory=list) # Cosine similarity per doc, best first; empty for retrievers without a vectorstore
+    verdict: str = "uncertain" # "relevant", "not_relevant" or "uncertain"
+
+    @property
+    def top_score(self) -> Optional[float]: return self.scores[0] if self.scores else None
+
+def gate_verdict(top_score: Optional[float], mode: str, thresholds: Optional[dict] = None) -> str:
+    limits = (RELEVANCE_THRESHOLDS if thresholds is None else thresholds).get(mode)
+    if top_score is None or not limits: return "uncertain"
+    if top_score >= limits["accept"]: return "relevant"
+    if top_score < limits["reject"]: return "not_relevant"
+    return "uncertain"
+
+def scored_search(retriever, query: str, mode: str) -> ScoredRetrieval:
+    """Blocking: similarity search with scores and dynamic k; falls back to plain retrieval (verdict "uncertain")."""
+    vector_store = getattr(retriever, "vectorstore", None)
+    if vector_store is None or not hasattr(vector_store, "similarity_search_with_score"):
+        return ScoredRetrieval(docs=retriever.get_relevant_documents(query))
+    candidates = max(RETRIEVAL_MAX_K, getattr(retriever, "search_kwargs", {}).get("k", 0))
+    hits = [(doc, distance_to_similarity(distance, vector_store.index)) for doc, distance in vector_store.similarity_search_with_score(query, k=candidates)]
+    hits.sort(key=lambda hit: -hit[1])
+    if not hits: return ScoredRetrieval(docs=[], verdict="not_relevant")
+    floor = hits[0][1] - RETRIEVAL_SCORE_MARGIN
+    kept = [hit for position, hit in enumerate(hits) if position < RETRIEVAL_MIN_K or hit[1] >= floor]
+    return ScoredRetrieval(docs=[doc for doc, _ in kept], scores=[score for _, score in kept], verdict=gate_verdict(hits[0][1], mode))
+
+def query_coverage(raw_query: str, simplified_query: str) -> float:
+    """Share of the simplified query's content terms that already appear in the raw query."""
+    simplified_terms = query_terms(simplified_query)
+    if not simplified_terms: return 1.0
+    return len(simplified_terms & query_terms(raw_query)) / len(simplified_terms)
+
+def _retrieve_quietly(task: asyncio.Task):
+    if not task.cancelled(): task.exception() # Marks a failed speculation as handled; the turn re-queries instead
+
+def start_speculative_retrieval(retriever, raw_query: str, current_mode: str) -> Optional[asyncio.Task]:
+    """Starts scored retrieval on the raw query in the background; pass the task to retrieve_relevant_context."""
+    if not SPECULATIVE_RETRIEVAL or retriever is None or not raw_query or not raw_query.strip(): return None
+    task = asyncio.create_task(run_blocking("retrieval", scored_search, retriever, raw_query.strip(), current_mode))
+    task.add_done_callback(_retrieve_quietly)
+    _count("speculative_started")
+    return task
+
+async def _speculative_result(speculative: Optional[asyncio.Task], user_query: str, simplified_query: str, session_id: str) -> Optional[ScoredRetrieval]:
+    if speculative is None: return None
+    coverage = query_coverage(user_query, simplified_query)
+    if coverage >= SPECULATIVE_MIN_COVERAGE:
+        try:
+            retrieval = await speculative
+            _count("speculative_used")
+            logger.debug(f"SID: {session_id} | Reusing speculative retrieval for '{simplified_query}' (coverage {coverage:.2f}).")
+            return retrieval
+        except Exception as e: logger.warning(f"SID: {session_id} | Speculative retrieval failed: {e}. Re-querying.")
+    else: speculative.cancel()
+    _count("speculative_requeried")
+    logger.debug(f"SID: {session_id} | Simplified query '{simplified_query}' differs from '{user_query}' (coverage {coverage:.2f}); re-querying.")
+    return None
+
+def _web_speculation_worthwhile(retrieval: ScoredRetrieval, current_mode: str) -> bool:
+    limits = RELEVANCE_THRESHOLDS.get(current_mode)
+    if not limits or retrieval.top_score is None: return False # Uncalibrated: no evidence the match is weak
+    if retrieval.top_score >= (limits["accept"] + limits["reject"]) / 2: return False # Leaning relevant
+    with _stats_lock: serial_ms = _latency_ewma_ms["relevance_check"] + _latency_ewma_ms["web_search"]
+    return serial_ms > SPECULATIVE_WEB_LATENCY_BUDGET_MS
+
+async def _timed_web_search(web_search, query: str) -> str:
+    started = time.perf_counter()
+    try: return await run_blocking("web", web_search, query)
+    finally: _record_latency("web_search", started)
+
+def _cancel_web_speculation(task: Optional[asyncio.Task]):
+    if task is None: return
+    task.cancel() # The search thread finishes in the "web" pool; its result is dropped
+    _count("web_speculation_cancelled")
+
+async def web_search_context(web_search, query: str, speculative: Optional[asyncio.Task] = None) -> str:
+    """Web search results for the query, taken from the speculative search when retrieve_relevant_context started one."""
+    if speculative is not None:
+        try:
+            context = await speculative
+            _count("web_speculation_used")
+            return context
+        except Exception as e: logger.warning(f"Speculative web search failed for '{query}': {e}. Searching again.")
+    return await _timed_web_search(web_search, query)
+
+async def retrieve_relevant_context(llm, retriever, user_query: str, simplified_query: str, current_mode: str, session_id: str,
+                                    speculative: Optional[asyncio.Task] = None, web_search=None):
+    """Returns (internal-docs context or "" when nothing relevant was found, speculative web search task or None).
+
+    Gemini is only asked in the uncertain band. `speculative` is a start_speculative_retrieval() task for the raw query,
+    reused when the simplified query is close to it. With `web_search` (IT mode) and SPECULATIVE_WEB_SEARCH, a weak
+    uncertain hit starts the web search alongside the relevance check; hand the returned task to web_search_context().
+    """
+    retrieval = await _speculative_result(speculative, user_query, simplified_query, session_id)
+    if retrieval is None: retrieval = await run_blocking("retrieval", scored_search, retriever, simplified_query, current_mode)
+    if not retrieval.docs: return "", None
+    _count(f"gate_{retrieval.verdict}")
+    top_score = f"{retrieval.top_score:.3f}" if retrieval.top_score is not None else "n/a"
+    logger.info(f"SID: {session_id} | Retrieval for '{simplified_query}': {len(retrieval.docs)} docs, top score {top_score}, verdict {retrieval.verdict}")
+    if retrieval.verdict == "not_relevant": return "", None
+    queries = (user_query, simplified_query)
+    context_from_docs = build_context(retrieval.docs, queries, CONTEXT_TOKENS_GENERATION)
+    if retrieval.verdict == "relevant" or not RELEVANCE_LLM_CHECK: return context_from_docs, None
+    if not llm: raise Exception("LLM not initialized for relevance check.")
+    web_task = None
+    if web_search and SPECULATIVE_WEB_SEARCH and _web_speculation_worthwhile(retrieval, current_mode):
+        web_task = asyncio.create_task(_timed_web_search(web_search, simplified_query))
+        web_task.add_done_callback(_retrieve_quietly)
+        _count("web_speculated")
+        logger.info(f"SID: {session_id} | Weak internal match for '{simplified_query}'; web search started alongside the relevance check.")
+    _count("relevance_llm_checks")
+    relevance_prompt_text = RELEVANCE_CHECK_PROMPT_TEMPLATE.format(user_query=user_query, simplified_query=simplified_query, retrieved_context=build_context(retrieval.docs, queries, CONTEXT_TOKENS_RELEVANCE, 3000))
+    started = time.perf_counter()
+    try: rel_check_response = await llm.generate_content_async(relevance_prompt_text, stage="relevance")
+    except Exception:
+        _cancel_web_speculation(web_task); raise
+    finally: _record_latency("relevance_check", started)
+    if "NO" in rel_check_response.text.strip().upper(): return "", web_task
+    _cancel_web_speculation(web_task)
+    return context_from_docs, None
+
+def parse_analyze_and_answer(response_text: str, current_mode: str) -> Optional[dict]:
+    """Validates the single-call JSON. Returns None when the multi-call path should take over."""
+    parsed = clean_json_response(response_text)
+    if not isinstance(parsed, dict): return None
+    best_source = parsed.get("best_source")
+    if best_source not in VALID_SOURCES or (best_source == "Web_Search_IT" and current_mode != "IT"): return None
+    simplified_query = parsed.get("simplified_query_for_search")
+    if not isinstance(simplified_query, str) or not simplified_query.strip(): return None
+    result = {"best_source": best_source, "simplified_query": simplified_query.strip(), "context_relevant": False, "answer": None}
+    if best_source != "Internal_Docs": return result
+    relevant = str(parsed.get("context_relevant", "")).strip().upper()
+    if relevant not in ("YES", "NO"): return None
+    answer = parsed.get("answer")
+    if relevant == "YES":
+        if not isinstance(answer, str) or not answer.strip(): return None
+        result.update({"context_relevant": True, "answer": answer.strip()})
+    return result
+
+async def analyze_and_answer(llm, retriever, user_query: str, current_mode: str, session_id: str) -> Optional[dict]:
+    """Single-call turn: retrieval on the raw query, then one structured Gemini call.
+
+    Returns {"best_source", "simplified_query", "context_relevant", "answer"}; "answer" is only set for an
+    Internal_Docs query whose retrieved context was judged relevant. Returns None (caller runs the multi-call
+    path) when the retriever is unavailable, a call fails, or the model's JSON is unusable.
+    """
+    if not llm or not retriever: return None
+    _count("single_call_turns")
+    try:
+        docs = (await run_blocking("retrieval", scored_search, retriever, user_query, current_mode)).docs
+        retrieved_context = build_context(docs, (user_query,), CONTEXT_TOKENS_SINGLE_CALL, SINGLE_CALL_CONTEXT_CHARS) if docs else "(no documents found)"
+        prompt = ANALYZE_AND_ANSWER_PROMPT_TEMPLATE.format(user_query=user_query, assistant_mode=current_mode.upper(), retrieved_context=retrieved_context)
+        response = await llm.generate_content_async(prompt, stage="single_call", generation_config={"response_mime_type": "application/json"}) # Gemini JSON mode
+        result = parse_analyze_and_answer(response.text, current_mode)
+    except Exception as e:
+        logger.warning(f"SID: {session_id} | Single-call analyze+answer failed for '{user_query}': {e}. Falling back to multi-call.", exc_info=True)
+        result = None
+    if result is None:
+        _count("fallbacks")
+        logger.info(f"SID: {session_id} | Single-call output unusable for '{user_query}'; falling back to multi-call pipeline.")
+        return None
+    if result["answer"]: _count("single_call_answered")
+    elif result["best_source"] == "Internal_Docs": _count("single_call_not_relevant")
+    logger.info(f"SID: {session_id} | Single-call result: source={result['best_source']}, relevant={result['context_relevant']}, simplified='{result['simplified_query']}'")
+    return result
@@ -0,0 +1,158 @@
+# semantic_cache.py
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import numpy as np
+
+from chatbot_logging import logger
+from async_utils import run_blocking
+from app_resources import get_shared_resource
+
+# --- SEMANTIC ANSWER CACHE CONFIG ---
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "False").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92")) # Cosine similarity between raw queries
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2000")) # Per mode, LRU-evicted
+SEMANTIC_CACHE_TTL_SECONDS = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", str(24 * 3600)))
+
+def index_version(retriever) -> Optional[str]:
+    """Identifies the FAISS index behind a retriever; changes when the index is reloaded, rebuilt or grown."""
+    vector_store = getattr(retriever, "vectorstore", None)
+    if vector_store is None: return None
+    return f"{id(vector_store)}:{getattr(getattr(vector_store, 'index', None), 'ntotal', 0)}"
+
+@dataclass(slots=True)
+class CachedAnswer:
+    entry_id: str
+    query: str
+    simplified_query: str
+    response: str
+    links: List[dict]
+    expires_at: float
+
+@dataclass(slots=True)
+class CacheLookup:
+    mode: str
+    query: str
+    vector: np.ndarray
+    index_version: Optional[str]
+    entry: Optional[CachedAnswer] = None
+    similarity: float = 0.0
+
+@dataclass(slots=True)
+class _ModeEntries:
+    index_version: Optional[str] = None
+    entries: "OrderedDict[str, CachedAnswer]" = field(default_factory=OrderedDict)
+    vectors: dict = field(default_factory=dict) # entry_id -> normalized query vector
+    matrix: Optional[np.ndarray] = None # Stacked vectors in `entries` order; rebuilt lazily after changes
+    matrix_ids: List[str] = field(default_factory=list)
+
+class SemanticAnswerCache:
+    """Generated answers per assistant mode, looked up by cosine similarity of the query embedding.
+
+    Only answers grounded in the internal FAISS documents are stored. A mode's entries are dropped
+    as soon as its index version changes, and "Not Helpful" feedback removes every entry similar
+    to the rejected query.
+    """
+
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD, max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = SEMANTIC_CACHE_TTL_SECONDS, enabled: bool = SEMANTIC_CACHE_ENABLED):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._modes = {}
+        self._lock = threading.Lock()
+        self._metrics = {"hits": 0, "misses": 0, "stores": 0, "evicted_lru": 0, "expired": 0,
+                         "invalidated_index_version": 0, "invalidated_not_helpful": 0}
+
+    async def _embed(self, query: str) -> Optional[np.ndarray]:
+        embedding_model = get_shared_resource("embedding_model")
+        if embedding_model is None: return None
+        vector = np.asarray(await run_blocking("retrieval", embedding_model.embed_query, query), dtype="float32")
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def _mode_entries_locked(self, mode: str, version: Optional[str]) -> _ModeEntries:
+        bucket = self._modes.get(mode)
+        if bucket is None: bucket = self._modes[mode] = _ModeEntries(index_version=version)
+        elif bucket.index_version != version:
+            if bucket.entries: logger.info(f"Semantic cache: {mode} index version changed, dropping {len(bucket.entries)} cached answers.")
+            self._metrics["invalidated_index_version"] += len(bucket.entries)
+            bucket = self._modes[mode] = _ModeEntries(index_version=version)
+        return bucket
+
+    def _remove_locked(self, bucket: _ModeEntries, entry_id: str):
+        bucket.entries.pop(entry_id, None); bucket.vectors.pop(entry_id, None); bucket.matrix = None
+
+    def _best_match_locked(self, bucket: _ModeEntries, vector: np.ndarray):
+        if not bucket.entries: return None, 0.0
+        if bucket.matrix is None:
+            bucket.matrix_ids = list(bucket.entries)
+            bucket.matrix = np.stack([bucket.vectors[entry_id] for entry_id in bucket.matrix_ids])
+        similarities = bucket.matrix @ vector
+        best = int(np.argmax(similarities))
+        return bucket.matrix_ids[best], float(similarities[best])
+
+    async def lookup(self, query: str, mode: str) -> Optional[CacheLookup]:
+        """Returns a CacheLookup (with .entry set on a hit), or None when the cache is disabled or not ready."""
+        if not self.enabled or not query or not query.strip(): return None
+        retriever = get_shared_resource("it_retriever" if mode == "IT" else "hr_retriever")
+        if retriever is None: return None
+        try: vector = await self._embed(query.strip())
+        except Exception as e:
+            logger.warning(f"Semantic cache lookup skipped, embedding failed: {e}"); return None
+        if vector is None: return None
+        result = CacheLookup(mode=mode, query=query, vector=vector, index_version=index_version(retriever))
+        with self._lock:
+            bucket = self._mode_entries_locked(mode, result.index_version)
+            entry_id, similarity = self._best_match_locked(bucket, vector)
+            entry = bucket.entries.get(entry_id) if entry_id else None
+            if entry and entry.expires_at <= time.monotonic():
+                self._remove_locked(bucket, entry_id); self._metrics["expired"] += 1; entry = None
+            if entry and similarity >= self.threshold:
+                bucket.entries.move_to_end(entry_id)
+                result.entry, result.similarity = entry, similarity
+                self._metrics["hits"] += 1
+            else: self._metrics["misses"] += 1
+        if result.entry: logger.info(f"Semantic cache hit ({mode}, similarity {result.similarity:.3f}): '{query}' ~ '{result.entry.query}'")
+        return result
+
+    def store(self, lookup: Optional[CacheLookup], simplified_query: str, response: str, links: List[dict]):
+        """Caches an answer for the query of a previous miss."""
+        if lookup is None or lookup.entry is not None or not response: return
+        entry = CachedAnswer(entry_id=uuid.uuid4().hex, query=lookup.query, simplified_query=simplified_query, response=response,
+                             links=links, expires_at=time.monotonic() + self.ttl_seconds)
+        with self._lock:
+            bucket = self._mode_entries_locked(lookup.mode, lookup.index_version)
+            bucket.entries[entry.entry_id] = entry; bucket.vectors[entry.entry_id] = lookup.vector; bucket.matrix = None
+            self._metrics["stores"] += 1
+            while len(bucket.entries) > self.max_entries:
+                oldest_id = next(iter(bucket.entries))
+                self._remove_locked(bucket, oldest_id); self._metrics["evicted_lru"] += 1
+
+    async def invalidate(self, query: str, mode: str) -> int:
+        """Drops every cached answer whose query is similar to `query` (used on "Not Helpful" feedback)."""
+        if not self.enabled or not query or not self._modes.get(mode): return 0
+        try: vector = await self._embed(query.strip())
+        except Exception as e:
+            logger.warning(f"Semantic cache invalidation skipped, embedding failed: {e}"); return 0
+        if vector is None: return 0
+        with self._lock:
+            bucket = self._modes.get(mode)
+            if bucket is None or not bucket.entries: return 0
+            doomed = [entry_id for entry_id in list(bucket.entries) if float(bucket.vectors[entry_id] @ vector) >= self.threshold]
+            for entry_id in doomed: self._remove_locked(bucket, entry_id)
+            self._metrics["invalidated_not_helpful"] += len(doomed)
+        if doomed: logger.info(f"Semantic cache: dropped {len(doomed)} {mode} answer(s) similar to '{query}' after negative feedback.")
+        return len(doomed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._metrics["hits"] + self._metrics["misses"]
+            return {"enabled": self.enabled, "entries": {mode: len(bucket.entries) for mode, bucket in self._modes.items()},
+                    "hit_rate": round(self._metrics["hits"] / lookups, 3) if lookups else 0.0, **self._metrics}
@@ -0,0 +1,86 @@
+# session_state.py
+import json
+from operator import attrgetter
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, List, Optional
+
+SESSION_FORMAT_VERSION = 1
+
+@dataclass(slots=True)
+class ChatSession:
+    """Per-session conversation state for main.py and main2.py.
+
+    Slotted, so each session is one fixed-size object instead of a dict with ~15 string keys.
+    It keeps the mapping-style access (get/[]/update/pop) the chat handlers already use, and
+    serializes to a compact JSON array in field order for persistent session stores.
+    """
+    awaiting_employee_id: bool = False
+    employee_id: Optional[int] = None
+    employee_name: Optional[str] = None
+    mode: Optional[str] = None
+    assistant_name: str = "AI Assistant"
+    original_query_context: Optional[str] = None
+    last_bot_response_for_feedback: Optional[str] = None
+    mismatched_query_info: Optional[Dict[str, str]] = None
+    first_interaction_after_id: bool = False
+    expecting_new_typed_query: bool = False
+    just_stayed_in_mode: bool = False
+    session_paused_after_farewell: bool = False
+    jira_ticket_key: Optional[str] = None
+    assigned_level: Optional[str] = None
+    pending_email_for_ticket_update: Optional[str] = None
+    original_query_context_for_ticket: Optional[str] = None
+    reporter_email: Optional[str] = None
+    it_transcript: Optional[List[str]] = None
+    extra: Optional[Dict[str, Any]] = None # Keys not modelled above; None until one is set
+
+    # --- Mapping-style access used by the chat handlers ---
+    def get(self, key: str, default=None):
+        """Like dict.get, except that unset (None) fields also return the default."""
+        if key in _FIELD_NAMES: value = getattr(self, key)
+        else: value = self.extra.get(key) if self.extra else None
+        return default if value is None else value
+
+    def __getitem__(self, key: str):
+        if key in _FIELD_NAMES: return getattr(self, key)
+        if self.extra and key in self.extra: return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value):
+        if key in _FIELD_NAMES: setattr(self, key, value)
+        else:
+            if self.extra is None: self.extra = {}
+            self.extra[key] = value
+
+    def update(self, values: Dict[str, Any]):
+        for key, value in values.items(): self[key] = value
+
+    def pop(self, key: str, *default):
+        """Returns the current value and resets the field to its default; like get(), unset (None) fields return the default."""
+        if key in _FIELD_NAMES:
+            value = getattr(self, key)
+            setattr(self, key, _FIELD_DEFAULTS[key])
+        elif self.extra and key in self.extra: value = self.extra.pop(key)
+        elif default: return default[0]
+        else: raise KeyError(key)
+        return default[0] if value is None and default else value
+
+    # --- Serialization ---
+    def to_json(self) -> str:
+        return _encode_json([SESSION_FORMAT_VERSION, *_get_all_fields(self)])
+
+    @classmethod
+    def from_json(cls, data: str) -> "ChatSession":
+        version, *values = json.loads(data)
+        if version != SESSION_FORMAT_VERSION: raise ValueError(f"Unsupported session format version {version}.")
+        return cls(*values)
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = {name: getattr(self, name) for name in _FIELD_NAMES if name != "extra"}
+        if self.extra: result.update(self.extra)
+        return result
+
+_FIELD_NAMES = tuple(f.name for f in fields(ChatSession))
+_FIELD_DEFAULTS = {f.name: f.default for f in fields(ChatSession)}
+_get_all_fields = attrgetter(*_FIELD_NAMES)
+_encode_json = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False).encode
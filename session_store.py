@@ -0,0 +1,170 @@
+# session_store.py
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from async_utils import run_blocking
+from session_state import ChatSession
+
+try:
+    from chatbot_logging import logger
+except ImportError:
+    import logging
+    logger = logging.getLogger(__name__)
+    if not logger.handlers:
+        logger.addHandler(logging.StreamHandler())
+        logger.setLevel(logging.INFO)
+        logger.warning("session_store.py: Using fallback logger.")
+
+# --- SESSION STORE CONFIG ---
+SESSION_STORE_BACKEND = os.getenv("SESSION_STORE", "memory").lower() # "memory" or "sqlite"
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", str(8 * 3600))) # Idle time before a session expires
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000")) # In-memory LRU bound
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "data/sessions.db")
+
+class SessionStore:
+    """Interface for chat session storage.
+
+    Handlers load a ChatSession once per turn with get(), mutate it, and write it back with save();
+    the TTL is sliding, so every save extends it.
+    """
+
+    def get(self, session_id: str) -> Optional[ChatSession]: raise NotImplementedError
+    def save(self, session_id: str, session_data: ChatSession): raise NotImplementedError
+    def delete(self, session_id: str): raise NotImplementedError
+    def stats(self) -> dict: raise NotImplementedError
+    def close(self): pass
+
+    # Async handlers use these. Stores that touch disk run on the "sessions" executor, so a contended
+    # database (sqlite3 waits up to 30s for a lock) stalls one request instead of the whole event loop.
+    async def get_async(self, session_id: str) -> Optional[ChatSession]: return await run_blocking("sessions", self.get, session_id)
+    async def save_async(self, session_id: str, session_data: ChatSession): await run_blocking("sessions", self.save, session_id, session_data)
+    async def delete_async(self, session_id: str): await run_blocking("sessions", self.delete, session_id)
+
+    def __contains__(self, session_id) -> bool:
+        return bool(session_id) and self.get(session_id) is not None
+
+class InMemorySessionStore(SessionStore):
+    """Per-process LRU with idle TTL. Oldest sessions are evicted once max_sessions is reached."""
+
+    def __init__(self, max_sessions: int = SESSION_MAX_SESSIONS, ttl_seconds: float = SESSION_TTL_SECONDS):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions = OrderedDict() # session_id -> (expires_at, session_data)
+        self._lock = threading.Lock()
+        self._metrics = {"hits": 0, "misses": 0, "saves": 0, "evicted_lru": 0, "expired": 0, "deleted": 0}
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                self._metrics["misses"] += 1; return None
+            if entry[0] <= time.monotonic():
+                del self._sessions[session_id]
+                self._metrics["expired"] += 1; self._metrics["misses"] += 1
+                return None
+            self._sessions.move_to_end(session_id)
+            self._metrics["hits"] += 1
+            return entry[1]
+
+    def save(self, session_id: str, session_data: ChatSession):
+        with self._lock:
+            self._sessions[session_id] = (time.monotonic() + self.ttl_seconds, session_data)
+            self._sessions.move_to_end(session_id)
+            self._metrics["saves"] += 1
+            self._evict_locked()
+
+    def _evict_locked(self):
+        now = time.monotonic()
+        # Oldest entries sit at the front, so expired sessions are dropped first and cheaply.
+        while self._sessions:
+            oldest_id, (expires_at, _) = next(iter(self._sessions.items()))
+            if expires_at <= now:
+                self._sessions.popitem(last=False); self._metrics["expired"] += 1
+            elif len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False); self._metrics["evicted_lru"] += 1
+            else: break
+
+    def delete(self, session_id: str):
+        with self._lock:
+            if self._sessions.pop(session_id, None) is not None: self._metrics["deleted"] += 1
+
+    # In-process dict operations: no thread hop needed.
+    async def get_async(self, session_id: str) -> Optional[ChatSession]: return self.get(session_id)
+    async def save_async(self, session_id: str, session_data: ChatSession): self.save(session_id, session_data)
+    async def delete_async(self, session_id: str): self.delete(session_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"backend": "memory", "sessions": len(self._sessions), "max_sessions": self.max_sessions, **self._metrics}
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions persisted in SQLite (WAL), shared by every worker process pointing at the same file.
+
+    Survives restarts and lets any uvicorn worker serve any session_id. Expired rows are purged
+    in batches every `purge_every` saves.
+    """
+
+    def __init__(self, db_path: str = SESSION_DB_PATH, ttl_seconds: float = SESSION_TTL_SECONDS, purge_every: int = 1000):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.purge_every = purge_every
+        db_dir = os.path.dirname(db_path)
+        if db_dir: os.makedirs(db_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db, self._db_pid = None, None
+        self._conn.execute("CREATE TABLE IF NOT EXISTS chat_sessions (session_id TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_sessions_expires ON chat_sessions(expires_at)")
+        self._saves_since_purge = 0
+        self._metrics = {"hits": 0, "misses": 0, "saves": 0, "expired": 0, "deleted": 0}
+        logger.info(f"SQLite session store ready at {db_path}.")
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # Opened per process: the store may be created before gunicorn forks its workers.
+        if self._db_pid != os.getpid():
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db_pid = os.getpid()
+        return self._db
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM chat_sessions WHERE session_id = ? AND expires_at > ?", (session_id, time.time())).fetchone()
+            self._metrics["hits" if row else "misses"] += 1
+        return ChatSession.from_json(row[0]) if row else None
+
+    def save(self, session_id: str, session_data: ChatSession):
+        data_json = session_data.to_json()
+        with self._lock:
+            self._conn.execute("INSERT INTO chat_sessions (session_id, data, expires_at) VALUES (?, ?, ?) "
+                               "ON CONFLICT(session_id) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at",
+                               (session_id, data_json, time.time() + self.ttl_seconds))
+            self._metrics["saves"] += 1
+            self._saves_since_purge += 1
+            if self._saves_since_purge >= self.purge_every:
+                self._saves_since_purge = 0
+                self._metrics["expired"] += self._conn.execute("DELETE FROM chat_sessions WHERE expires_at <= ?", (time.time(),)).rowcount
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._metrics["deleted"] += self._conn.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,)).rowcount
+
+    def stats(self) -> dict:
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM chat_sessions WHERE expires_at > ?", (time.time(),)).fetchone()[0]
+            return {"backend": "sqlite", "sessions": count, **self._metrics}
+
+    def close(self):
+        with self._lock:
+            if self._db is not None and self._db_pid == os.getpid(): self._db.close()
+            self._db, self._db_pid = None, None
+
+def create_session_store(backend: str = SESSION_STORE_BACKEND) -> SessionStore:
+    if backend == "sqlite": return SQLiteSessionStore()
+    if backend != "memory": logger.warning(f"Unknown SESSION_STORE '{backend}', using in-memory sessions.")
+    return InMemorySessionStore()
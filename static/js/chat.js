@@ -138,6 +138,68 @@ document.addEventListener('DOMContentLoaded', () => {
                  chatMessages.appendChild(messageWrapper);
             }
             chatMessages.scrollTop = chatMessages.scrollHeight;
+            return messageWrapper;
+        }
+
+        // Renders tokens into a temporary bot bubble while /chat/stream is generating.
+        // The bubble is replaced by the final message (processed text, links, options) once the stream ends.
+        function startStreamingBotMessage(time) {
+            const messageWrapper = addMessageToChat('', false, time);
+            const messageTextDiv = messageWrapper.querySelector('.message-bubble-content');
+            let streamedText = '';
+            return {
+                append(text) {
+                    streamedText += text;
+                    if (markedInstance) {
+                        messageTextDiv.innerHTML = markedInstance.parse(streamedText);
+                    } else {
+                        messageTextDiv.innerHTML = streamedText.replace(/\n/g, '<br>');
+                    }
+                    chatMessages.scrollTop = chatMessages.scrollHeight;
+                },
+                remove() { messageWrapper.remove(); }
+            };
+        }
+
+        // POSTs to /chat/stream and parses the server-sent events. Calls onToken for every "token" event
+        // and resolves with { ok, data } where data is the "final" event payload (same shape as /chat).
+        async function fetchChatStream(payload, onToken) {
+            const res = await fetch("/chat/stream", { method: "POST", headers: { "Content-Type": "application/json" }, body: JSON.stringify(payload) });
+            const contentType = res.headers.get('Content-Type') || '';
+            if (!res.ok || !res.body || !contentType.includes('text/event-stream')) {
+                const data = await res.json().catch(() => ({ response: `Error processing server response. (Status: ${res.status})` }));
+                return { ok: false, data: data };
+            }
+
+            const reader = res.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let finalData = null;
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    const rawEvent = buffer.slice(0, boundary);
+                    buffer = buffer.slice(boundary + 2);
+                    let eventName = 'message';
+                    const dataLines = [];
+                    rawEvent.split('\n').forEach(line => {
+                        if (line.startsWith('event:')) eventName = line.slice(6).trim();
+                        else if (line.startsWith('data:')) dataLines.push(line.slice(5).replace(/^ /, ''));
+                    });
+                    if (dataLines.length === 0) continue;
+                    const eventData = JSON.parse(dataLines.join('\n'));
+                    if (eventName === 'token') onToken(eventData.text || '');
+                    else if (eventName === 'final') finalData = eventData;
+                }
+            }
+            if (!finalData) {
+                console.error("Stream from /chat/stream ended without a final event.");
+                return { ok: false, data: { response: "The response was interrupted. Please try again." } };
+            }
+            return { ok: true, data: finalData };
         }
 
         async function initialBotFlow() {
@@ -220,21 +282,18 @@ document.addEventListener('DOMContentLoaded', () => {
 
             console.log("Sending payload to /chat:", JSON.stringify(payload));
             try {
-                const res = await fetch("/chat", { method: "POST", headers: { "Content-Type": "application/json" }, body: JSON.stringify(payload) });
+                let streamingMessage = null;
+                const streamResult = await fetchChatStream(payload, (tokenText) => {
+                    if (!streamingMessage) {
+                        streamingMessage = startStreamingBotMessage(new Date().toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' }));
+                    }
+                    streamingMessage.append(tokenText);
+                });
                 const botResponseTime = new Date().toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' });
+                if (streamingMessage) streamingMessage.remove();
+                const data = streamResult.data;
 
-                let data;
-                try {
-                    data = await res.json();
-                } catch (e) {
-                    hideTypingIndicator();
-                    const rawErrorText = await res.text().catch(() => "Unknown server error response.");
-                    console.error("Failed to parse JSON from server response. Status:", res.status, "Raw:", rawErrorText);
-                    addMessageToChat(`Error processing server response. (Status: ${res.status})`, false, botResponseTime);
-                    return;
-                }
-
-                if (!res.ok) {
+                if (!streamResult.ok) {
                     hideTypingIndicator();
                     addMessageToChat(data.response || "Sorry, an unexpected error occurred.", false, botResponseTime, data.links || [], data.options || []);
                     return;
@@ -359,6 +418,9 @@ document.addEventListener('DOMContentLoaded', () => {
                     } else if (actionText === "👎 Not Helpful") {
                         intentForBackend = "user_feedback_not_helpful";
                         queryForBackend = actionText;
+                    } else if (actionText === "Raise an IT ticket") {
+                        intentForBackend = "escalate_to_it_ticket";
+                        queryForBackend = actionText;
                     } else { // Any other button text is treated as a direct query
                         intentForBackend = null;
                         queryForBackend = actionText;
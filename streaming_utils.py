@@ -0,0 +1,19 @@
+# streaming_utils.py
+import json
+
+def format_sse_event(event: str, data) -> str:
+    # json.dumps never emits raw newlines, so each payload fits on a single "data:" line.
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def sse_events_for_turn(turn_result):
+    """Turns a chat turn result into SSE frames.
+
+    A plain dict (greetings, feedback, fallbacks...) becomes a single "final" event. A streaming
+    turn is an async generator of (event, data) pairs: "token" events while the answer is being
+    generated, then one "final" event carrying the processed text, links and options.
+    """
+    if isinstance(turn_result, dict):
+        yield format_sse_event("final", turn_result)
+        return
+    async for event, data in turn_result:
+        yield format_sse_event(event, data)
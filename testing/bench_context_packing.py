@@ -0,0 +1,69 @@
+# bench_context_packing.py
+# Before/after prompt-context tokens for the replay queries: the previous plain join of retrieved chunks
+# (relevance check cut at 3000 chars, generation untruncated, single call cut at 6000 chars) against
+# context_packing.pack_context at each stage's token budget.
+#   python testing/bench_context_packing.py              # FAISS retrievers (needs the embedding model)
+#   python testing/bench_context_packing.py --keyword    # Offline: rank the loaded chunks by query-term overlap
+#   python testing/bench_context_packing.py --keyword --show "printer is not printing"
+import argparse
+import os
+import statistics
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.chdir(REPO_ROOT) # Document and index paths are relative to the repo root
+
+class KeywordRetriever:
+    """Ranks chunks by shared query terms; a stand-in for FAISS when the embedding model can't be loaded."""
+
+    def __init__(self, docs, k):
+        from context_packing import query_terms
+        self.query_terms, self.k = query_terms, k
+        self.docs = [(doc, query_terms(doc.page_content)) for doc in docs]
+
+    def get_relevant_documents(self, query):
+        terms = self.query_terms(query)
+        ranked = sorted(self.docs, key=lambda item: -len(terms & item[1]))
+        return [doc for doc, _ in ranked[:self.k]]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keyword", action="store_true", help="Use the offline keyword ranker over the source documents.")
+    parser.add_argument("--show", help="Print the old and packed generation context for this query.")
+    args = parser.parse_args()
+
+    from context_packing import (CONTEXT_TOKENS_GENERATION, CONTEXT_TOKENS_RELEVANCE, CONTEXT_TOKENS_SINGLE_CALL,
+                                 estimate_tokens, format_docs_context, pack_context)
+    from replay_pipeline_modes import DEFAULT_REPLAY
+    if args.keyword:
+        from chatbot_documents import load_it_documents, load_hr_documents_from_folder
+        retrievers = {"IT": KeywordRetriever(load_it_documents(), 5), "HR": KeywordRetriever(load_hr_documents_from_folder(), 3)}
+    else:
+        from app_resources import load_shared_resources
+        resources = load_shared_resources()
+        retrievers = {"IT": resources["it_retriever"], "HR": resources["hr_retriever"]}
+
+    queries = [item for item in DEFAULT_REPLAY if item["mode"] in retrievers]
+    if args.show: queries = [{"mode": "IT", "query": args.show}]
+    stages = [("relevance", CONTEXT_TOKENS_RELEVANCE, 3000), ("generation", CONTEXT_TOKENS_GENERATION, 0), ("single_call", CONTEXT_TOKENS_SINGLE_CALL, 6000)]
+    totals = {stage: [0, 0] for stage, _, _ in stages}
+    print(f"{'query':<46} " + " ".join(f"{stage + ' old/new':>20}" for stage, _, _ in stages))
+    for item in queries:
+        docs = retrievers[item["mode"]].get_relevant_documents(item["query"])
+        old_context = format_docs_context(docs)
+        cells = []
+        for stage, budget, char_limit in stages:
+            old_tokens = estimate_tokens(old_context[:char_limit] if char_limit else old_context)
+            new_tokens = estimate_tokens(pack_context(docs, (item["query"],), budget)) if docs else 0
+            totals[stage][0] += old_tokens; totals[stage][1] += new_tokens
+            cells.append(f"{old_tokens:>9}/{new_tokens:<10}")
+        print(f"{item['query'][:46]:<46} " + " ".join(cells))
+        if args.show:
+            print(f"\n--- old generation context ---\n{old_context}\n\n--- packed generation context ---\n{pack_context(docs, (item['query'],), CONTEXT_TOKENS_GENERATION)}")
+    print(f"{'total':<46} " + " ".join(f"{old:>9}/{new:<10}" for old, new in totals.values()))
+    print("saved: " + ", ".join(f"{stage} {1 - new / old:.0%}" for stage, (old, new) in totals.items() if old))
+
+if __name__ == "__main__":
+    main()
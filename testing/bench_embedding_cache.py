@@ -0,0 +1,75 @@
+# bench_embedding_cache.py
+# Embedding work of FAISS builds with the persistent embedding cache (embedding_cache.CachedEmbeddings) on a
+# scratch cache: a cold build of both indexes, the same build again from scratch (what a lost manifest, a
+# chunking-unchanged migration or FAISS_INCREMENTAL=false used to cost in full), and -- with the real model --
+# encode throughput for a few batch sizes.
+#   python testing/bench_embedding_cache.py                                          # Real embedding model
+#   python testing/bench_embedding_cache.py --hash-embeddings --sim-ms-per-chunk 4   # Offline, simulated encode cost
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.chdir(REPO_ROOT) # Source document paths are relative to the repo root
+
+from bench_incremental_index import HashEmbeddings
+
+class SlowHashEmbeddings(HashEmbeddings):
+    """HashEmbeddings that sleeps per text, standing in for the sentence-transformer's encode cost."""
+
+    def __init__(self, ms_per_chunk):
+        self.ms_per_chunk = ms_per_chunk
+
+    def embed_documents(self, texts):
+        time.sleep(len(texts) * self.ms_per_chunk / 1000)
+        return super().embed_documents(texts)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hash-embeddings", action="store_true", help="Use offline hashed vectors instead of the embedding model.")
+    parser.add_argument("--sim-ms-per-chunk", type=float, default=4.0, help="Simulated encode cost with --hash-embeddings.")
+    parser.add_argument("--batch-sizes", type=int, nargs="*", default=[8, 32, 128], help="Encode batch sizes to time (real model only).")
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="bench_embed_")
+    os.environ["EMBEDDING_CACHE_DIR"] = os.path.join(scratch, "embedding_cache") # Read at import time
+    os.environ["PARSED_CACHE_DIR"] = os.path.join(scratch, "parsed_cache")
+    from chatbot_documents import list_it_source_files, list_hr_source_files, iter_it_source_file, iter_hr_document_file
+    from index_manifest import sync_faiss_index
+    embedding_model = SlowHashEmbeddings(args.sim_ms_per_chunk) if args.hash_embeddings else __import__("chatbot_llm").get_embedding_model()
+    corpora = [("IT", list_it_source_files(), iter_it_source_file), ("HR", list_hr_source_files(), iter_hr_document_file)]
+
+    def build(label, run):
+        totals = {"seconds": 0.0, "chunks_embedded": 0, "chunks_encoded": 0, "embedding_cache_hits": 0}
+        for mode, sources, loader in corpora:
+            _, stats = sync_faiss_index(os.path.join(scratch, f"{run}_{mode}"), sources, loader, embedding_model)
+            for key in totals: totals[key] += stats.get(key, 0)
+        print(f"{label:<36} {totals['seconds']:>8.2f} {totals['chunks_embedded']:>7} {totals['chunks_encoded']:>8} {totals['embedding_cache_hits']:>6}")
+        return totals
+
+    print(f"{'build':<36} {'seconds':>8} {'chunks':>7} {'encoded':>8} {'hits':>6}")
+    build("warm-up (parses into the text cache)", "parse") # Keeps parsing out of the two timed builds below
+    shutil.rmtree(os.environ["EMBEDDING_CACHE_DIR"])
+    cold = build("cold embedding cache", "cold")
+    warm = build("rebuild from scratch, cache warm", "warm")
+    print(f"Rebuild from scratch: {warm['seconds']:.2f}s vs {cold['seconds']:.2f}s cold "
+          f"({warm['chunks_encoded']} of {warm['chunks_embedded']} chunks encoded).")
+
+    if not args.hash_embeddings and args.batch_sizes:
+        from chatbot_documents import load_it_documents
+        texts = [doc.page_content for doc in load_it_documents()][:512]
+        for batch_size in args.batch_sizes:
+            embedding_model.encode_kwargs = {**embedding_model.encode_kwargs, "batch_size": batch_size}
+            started = time.perf_counter()
+            embedding_model.embed_documents(texts)
+            elapsed = time.perf_counter() - started
+            print(f"batch size {batch_size:>4}: {len(texts) / elapsed:>7.1f} chunks/s")
+    shutil.rmtree(scratch)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# bench_import_time.py
+# Cold import cost of the repo's modules, measured with `python -X importtime` in a fresh interpreter per run.
+# Light modules (logging, Jira, sessions, executors) must not pull in the ML/web stack; the script exits with
+# status 1 if one of them imports a heavy package or goes over its --budget, so it can gate CI.
+# Usage: python testing/bench_import_time.py [--modules chatbot_utils,ticketing_utils] [--repeat 3] [--budget chatbot_utils=300]
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LIGHT_MODULES = ["chatbot_logging", "chatbot_prompts", "chatbot_utils", "ticketing_utils", "jira_client", "jira_outbox",
+                 "session_store", "session_state", "async_utils", "streaming_utils"]
+HEAVY_PACKAGES = ["google.generativeai", "langchain_community", "langchain", "unstructured", "pandas", "duckduckgo_search",
+                  "bs4", "sentence_transformers", "torch", "transformers", "faiss"]
+
+def import_profile(module, workdir):
+    """Returns (total µs for `module`, {direct dependency: cumulative µs}, set of every module it imported)."""
+    env = {**os.environ, "PYTHONPATH": REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", "")}
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=workdir, env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0: raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    entries = [] # (depth, name, cumulative µs) in output order: children are printed before their parent
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2: continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        if not cumulative_us.strip().isdigit(): continue # Header line
+        entries.append((len(name) - len(name.lstrip()), name.strip(), int(cumulative_us)))
+    index = max(i for i, (_, name, _) in enumerate(entries) if name == module)
+    depth, _, total_us = entries[index]
+    direct, imported = {}, set()
+    for child_depth, name, cumulative_us in reversed(entries[:index]):
+        if child_depth <= depth: break
+        imported.add(name)
+        if child_depth == depth + 2: direct[name] = cumulative_us
+    return total_us, direct, imported
+
+def parse_budgets(values):
+    budgets = {}
+    for value in values:
+        module, _, ms = value.partition("=")
+        budgets[module.strip()] = float(ms)
+    return budgets
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modules", default=",".join(LIGHT_MODULES))
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per module; the fastest run is reported.")
+    parser.add_argument("--budget", action="append", default=[], help="module=ms; fail if the import takes longer.")
+    parser.add_argument("--top", type=int, default=3, help="Heaviest dependencies to list per module.")
+    args = parser.parse_args()
+    modules = [m.strip() for m in args.modules.split(",") if m.strip()]
+    budgets = parse_budgets(args.budget)
+
+    failures = []
+    workdir = tempfile.mkdtemp(prefix="bench_import_") # Keeps logs/ and other side effects out of the repo
+    print(f"{'module':<20} {'import ms':>10}  heaviest dependencies")
+    for module in modules:
+        total_us, direct, imported = min((import_profile(module, workdir) for _ in range(args.repeat)), key=lambda run: run[0])
+        heaviest = ", ".join(f"{name} {us / 1000:.0f}ms" for name, us in sorted(direct.items(), key=lambda item: -item[1])[:args.top])
+        print(f"{module:<20} {total_us / 1000:>10.1f}  {heaviest}")
+        if module in LIGHT_MODULES:
+            heavy = [pkg for pkg in HEAVY_PACKAGES if pkg in imported]
+            if heavy: failures.append(f"{module} imports heavy packages: {', '.join(heavy)}")
+        if module in budgets and total_us / 1000 > budgets[module]:
+            failures.append(f"{module} took {total_us / 1000:.1f}ms (budget {budgets[module]:.0f}ms)")
+
+    for failure in failures: print(f"REGRESSION: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
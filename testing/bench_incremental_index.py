@@ -0,0 +1,76 @@
+# bench_incremental_index.py
+# Rebuild cost of the manifest-driven FAISS sync (index_manifest.sync_faiss_index) on a scratch copy of the IT and
+# HR sources: a full build, a no-op rebuild, one HR policy changed, one added, one removed, and a rebuild from
+# scratch served by the parsed-text and embedding caches. Each step reports files parsed, chunks embedded and wall time.
+#   python testing/bench_incremental_index.py                     # Real embedding model
+#   python testing/bench_incremental_index.py --hash-embeddings   # Offline: hashed bag-of-words vectors
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+os.chdir(REPO_ROOT) # Source document paths are relative to the repo root
+
+from langchain_core.embeddings import Embeddings
+
+class HashEmbeddings(Embeddings):
+    """Deterministic 384-d bag-of-words vectors; a stand-in when the sentence-transformer can't be downloaded."""
+    model_name = "hash-384"
+
+    def _vector(self, text):
+        import numpy as np
+        vector = np.zeros(384, dtype="float32")
+        for word in text.lower().split(): vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % 384] += 1.0
+        return (vector / max(float(np.linalg.norm(vector)), 1e-12)).tolist()
+
+    def embed_documents(self, texts): return [self._vector(text) for text in texts]
+    def embed_query(self, text): return self._vector(text)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hash-embeddings", action="store_true", help="Use offline hashed vectors instead of the embedding model.")
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="bench_index_")
+    os.environ["PARSED_CACHE_DIR"] = os.path.join(scratch, "parsed_cache") # Read at import time
+    os.environ["EMBEDDING_CACHE_DIR"] = os.path.join(scratch, "embedding_cache")
+    from chatbot_documents import list_it_source_files, list_hr_source_files, iter_it_source_file, iter_hr_document_file
+    import index_manifest
+    embedding_model = HashEmbeddings() if args.hash_embeddings else __import__("chatbot_llm").get_embedding_model()
+
+    hr_dir = os.path.join(scratch, "hr_documents")
+    shutil.copytree("data/hr_documents", hr_dir)
+    hr_files = sorted(os.listdir(hr_dir))
+    indexes = {"IT": (os.path.join(scratch, "it_index"), lambda: list_it_source_files(), iter_it_source_file),
+               "HR": (os.path.join(scratch, "hr_index"), lambda: list_hr_source_files(hr_dir), iter_hr_document_file)}
+
+    def step(label, modes=("IT", "HR")):
+        totals = {"seconds": 0.0, "files_parsed": 0, "chunks_embedded": 0, "chunks_deleted": 0, "vectors": 0}
+        for mode in modes:
+            index_path, sources, loader = indexes[mode]
+            _, stats = index_manifest.sync_faiss_index(index_path, sources(), loader, embedding_model)
+            for key in totals: totals[key] += stats.get(key, 0)
+        print(f"{label:<34} {totals['seconds']:>8.2f} {totals['files_parsed']:>7} {totals['chunks_embedded']:>9} {totals['chunks_deleted']:>8} {totals['vectors']:>8}")
+        return totals
+
+    print(f"{'step':<34} {'seconds':>8} {'parsed':>7} {'embedded':>9} {'deleted':>8} {'vectors':>8}")
+    full = step("full build (IT + HR)")
+    step("no-op rebuild")
+    with open(os.path.join(hr_dir, hr_files[0]), "ab") as f: f.write(b"\n% touched\n") # Changes the hash, not the text
+    one = step(f"changed: {hr_files[0][:24]}")
+    shutil.copy(os.path.join(hr_dir, hr_files[1]), os.path.join(hr_dir, "Copy of " + hr_files[1]))
+    step("added: one HR PDF")
+    os.remove(os.path.join(hr_dir, "Copy of " + hr_files[1]))
+    step("removed: one HR PDF")
+    for index_path, _, _ in indexes.values(): shutil.rmtree(index_path)
+    step("from scratch, caches warm")
+    print(f"One changed file cost {one['seconds'] / max(full['seconds'], 1e-9):.1%} of the full build "
+          f"({one['chunks_embedded']} of {full['chunks_embedded']} chunks re-embedded).")
+    shutil.rmtree(scratch)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# bench_ingest_memory.py
+# Peak resident memory of building a FAISS index from the IT SOPs copied 1x, 2x, 4x... into a scratch folder, for
+# the materializing build (every chunk loaded, then FAISS.from_documents, as FAISS_INCREMENTAL=false still does) and
+# the streaming build (index_manifest.sync_faiss_index: parse -> embed -> add in batches of INGEST_BATCH_CHUNKS).
+# Each build runs in a fresh process with in-process parsing (INGEST_WORKERS=1), so the builder's peak RSS includes
+# the parser, and with the embedding and parsed-text caches off, so every chunk is parsed and embedded.
+#   python testing/bench_ingest_memory.py [--scales 1 2 4] [--hash-embeddings]
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.chdir(REPO_ROOT) # Source document paths are relative to the repo root
+
+def build(mode, sources_dir, index_dir, hash_embeddings):
+    """One build in this process; returns its stats."""
+    from chatbot_documents import SOP_EXTENSIONS, _list_files, iter_it_sop_file
+    embedding_model = __import__("bench_incremental_index").HashEmbeddings() if hash_embeddings else __import__("chatbot_llm").get_embedding_model()
+    paths = _list_files(sources_dir, SOP_EXTENSIONS)
+    started = time.perf_counter()
+    if mode == "materialize":
+        from langchain_community.vectorstores import FAISS
+        from document_ingest import parse_files
+        docs = parse_files(iter_it_sop_file, paths)
+        FAISS.from_documents(docs, embedding_model).save_local(index_dir)
+        chunks = len(docs)
+    else:
+        from index_manifest import sync_faiss_index
+        chunks = sync_faiss_index(index_dir, paths, iter_it_sop_file, embedding_model)[1]["chunks_embedded"]
+    return {"chunks": chunks, "seconds": time.perf_counter() - started,
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024} # ru_maxrss is KiB on Linux
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 2, 4], help="Copies of data/sops in the corpus.")
+    parser.add_argument("--hash-embeddings", action="store_true", help="Use offline hashed vectors instead of the embedding model.")
+    parser.add_argument("--child", nargs=3, metavar=("MODE", "SOURCES", "INDEX"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(build(*args.child, args.hash_embeddings))); return
+
+    from chatbot_documents import SOP_EXTENSIONS, _list_files
+    scratch = tempfile.mkdtemp(prefix="bench_ingest_mem_")
+    env = {**os.environ, "INGEST_WORKERS": "1", "EMBEDDING_CACHE_ENABLED": "false", "PARSED_CACHE_DIR": os.path.join(scratch, "parsed_cache")}
+    print(f"{'copies':>6} {'MB':>6} {'mode':<12} {'chunks':>7} {'seconds':>8} {'peak RSS MB':>12}")
+    for scale in args.scales:
+        sources = os.path.join(scratch, f"sources_{scale}")
+        os.makedirs(sources)
+        for copy in range(scale):
+            for path in _list_files("data/sops/", SOP_EXTENSIONS): shutil.copy(path, os.path.join(sources, f"{copy}_{os.path.basename(path)}"))
+        corpus_mb = sum(os.path.getsize(os.path.join(sources, name)) for name in os.listdir(sources)) / 2**20
+        for mode in ("materialize", "stream"):
+            shutil.rmtree(env["PARSED_CACHE_DIR"], ignore_errors=True)
+            command = [sys.executable, os.path.abspath(__file__), "--child", mode, sources, os.path.join(scratch, f"index_{mode}_{scale}")]
+            output = subprocess.run(command + (["--hash-embeddings"] if args.hash_embeddings else []), env=env,
+                                    capture_output=True, text=True, check=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{scale:>6} {corpus_mb:>6.1f} {mode:<12} {result['chunks']:>7} {result['seconds']:>8.2f} {result['peak_rss_mb']:>12.1f}")
+    shutil.rmtree(scratch)
+
+if __name__ == "__main__":
+    main()
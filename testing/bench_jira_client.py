@@ -0,0 +1,56 @@
+# bench_jira_client.py
+# Compares one-connection-per-call requests (the old ticketing_utils behaviour) with the pooled
+# JiraClient against testing/fake_jira_server.py, then checks that a 429 with
+# Retry-After is absorbed by the client and shows the per-endpoint latency counters.
+# Usage: python testing/bench_jira_client.py [--calls 200] [--concurrency 8]
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fake_jira_server import start_fake_jira_server
+from jira_client import JiraClient, TokenBucket
+
+def create_payload(i):
+    return {"serviceDeskId": "2", "requestTypeId": "10", "requestFieldValues": {"summary": f"bench {i}", "description": "bench"}}
+
+def run_threads(func, calls, concurrency):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        statuses = list(pool.map(func, range(calls)))
+    return time.perf_counter() - start, statuses
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    server, state, base_url = start_fake_jira_server()
+    headers = {"Accept": "application/json", "Content-Type": "application/json"}
+    unlimited = lambda: TokenBucket(rate_per_second=0)
+
+    elapsed, statuses = run_threads(lambda i: requests.post(f"{base_url}/rest/servicedeskapi/request", auth=("bot", "x"), headers=headers, json=create_payload(i), timeout=10).status_code,
+                                    args.calls, args.concurrency)
+    print(f"per-call requests.post : {args.calls / elapsed:8.1f} req/s  ({statuses.count(201)}/{args.calls} ok)")
+
+    client = JiraClient(base_url, "bot", "x", pool_size=args.concurrency, rate_limiter=unlimited())
+    elapsed, statuses = run_threads(lambda i: client.post("/rest/servicedeskapi/request", "create_request", json=create_payload(i), timeout=10).status_code,
+                                    args.calls, args.concurrency)
+    print(f"pooled JiraClient      : {args.calls / elapsed:8.1f} req/s  ({statuses.count(201)}/{args.calls} ok)")
+
+    # Every 5th request gets 429 + Retry-After: 1; the client should retry and still return 201s.
+    state.rate_limit_every, state.request_count = 5, 0
+    limited = JiraClient(base_url, "bot", "x", rate_limiter=TokenBucket(rate_per_second=50, burst=5))
+    start = time.perf_counter()
+    statuses = [limited.post("/rest/servicedeskapi/request", "create_request", json=create_payload(i), timeout=10).status_code for i in range(12)]
+    print(f"429 handling           : {statuses.count(201)}/12 created in {time.perf_counter() - start:.1f}s")
+    print(f"latency stats          : {limited.stats.snapshot()}")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
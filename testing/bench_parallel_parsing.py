@@ -0,0 +1,95 @@
+# bench_parallel_parsing.py
+# Wall-clock time of parsing data/sops and data/hr_documents with document_ingest.parse_files at several worker
+# counts, checking that every run yields exactly the chunks (text, metadata, order) of the sequential parse.
+# Then checks isolation: a corrupt PDF, a parser that hangs and one that keeps producing chunks past its timeout
+# are skipped and the other files still come back, in order. (The timeout is per file, counted from when its worker
+# starts.) Last, checks that workers parse large files concurrently even while the builder is busy with another.
+#   python testing/bench_parallel_parsing.py [--workers 1 2 4] [--repeat 2]
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+os.chdir(REPO_ROOT) # Source document paths are relative to the repo root
+
+def fingerprint(chunks) -> str:
+    digest = hashlib.sha256()
+    for chunk in chunks: digest.update(repr((chunk.page_content, sorted(chunk.metadata.items()))).encode())
+    return digest.hexdigest()[:12]
+
+def hanging_loader(path):
+    """Stands in for a parser stuck on (or crawling through) a pathological file (module level so worker processes
+    can run it)."""
+    from chatbot_documents import iter_hr_document_file
+    if "stuck" in path: time.sleep(3600)
+    if "crawl" in path: return slow_loader(path, pages=1000, seconds_per_page=0.2)
+    return iter_hr_document_file(path)
+
+def slow_loader(path, pages=8, seconds_per_page=0.1):
+    """A file of `pages` 50 KB chunks that each take seconds_per_page to parse (sleeping, so it overlaps on 1 CPU)."""
+    from langchain_core.documents import Document
+    for page in range(pages):
+        time.sleep(seconds_per_page)
+        yield Document(page_content=f"{page} " + "x" * 50000, metadata={"source": path})
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--repeat", type=int, default=2)
+    args = parser.parse_args()
+
+    from chatbot_documents import SOP_EXTENSIONS, _list_files, list_hr_source_files, iter_it_sop_file, iter_hr_document_file
+    from document_ingest import iter_parsed_files, parse_files
+    corpora = [(iter_it_sop_file, _list_files("data/sops/", SOP_EXTENSIONS)), (iter_hr_document_file, list_hr_source_files())]
+    print(f"CPUs available: {len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()}; "
+          f"files: {sum(len(paths) for _, paths in corpora)}")
+    print(f"{'workers':>7} {'best s':>8} {'chunks':>7} {'fingerprint':>12} {'speedup':>8}")
+    baseline, failures = None, []
+    for workers in args.workers:
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            chunks = [chunk for loader, paths in corpora for chunk in parse_files(loader, paths, workers)]
+            timings.append(time.perf_counter() - started)
+        print_key = fingerprint(chunks)
+        if baseline is None: baseline = (min(timings), print_key)
+        elif print_key != baseline[1]: failures.append(f"{workers} workers: output differs from the first run")
+        print(f"{workers:>7} {min(timings):>8.2f} {len(chunks):>7} {print_key:>12} {baseline[0] / min(timings):>7.2f}x")
+
+    scratch = tempfile.mkdtemp(prefix="bench_parse_")
+    good = list_hr_source_files()
+    corrupt, stuck, crawl = (os.path.join(scratch, name) for name in ("corrupt.pdf", "stuck.pdf", "crawl.pdf"))
+    with open(corrupt, "wb") as f: f.write(b"%PDF-1.4 not really a pdf")
+    shutil.copy(good[0], stuck); shutil.copy(good[0], crawl)
+    paths = [good[0], corrupt, stuck, crawl, good[1]]
+    started = time.perf_counter()
+    results = []
+    for path, batches in iter_parsed_files(hanging_loader, paths, workers=2, timeout=3):
+        try: results.append((path, sum(len(batch) for batch in batches)))
+        except Exception as e: print(f"  {os.path.basename(path)}: {e}"); results.append((path, 0))
+    elapsed = time.perf_counter() - started
+    counts = [count for _, count in results]
+    if [path for path, _ in results] != paths: failures.append("isolation: results out of order")
+    if not (counts[0] and counts[4]) or any(counts[1:4]): failures.append(f"isolation: unexpected chunk counts {counts}")
+    print(f"isolation: chunk counts {counts} for [good, corrupt, stuck, crawling, good] in {elapsed:.1f}s (timeout 3s)")
+    shutil.rmtree(scratch)
+
+    # 4 files of 8 x 50 KB chunks at 0.1 s per chunk: 3.2 s one after another. Each file is far larger than a pipe
+    # buffer and the builder takes 0.1 s per batch, so workers that had to wait for it would serialize.
+    paths, started = [f"big_{i}" for i in range(4)], time.perf_counter()
+    for _, batches in iter_parsed_files(slow_loader, paths, workers=4, timeout=30, batch_size=1):
+        for _ in batches: time.sleep(0.1)
+    elapsed = time.perf_counter() - started
+    if elapsed > 0.75 * (4 * 8 * 0.1 + 4 * 8 * 0.1): failures.append(f"overlap: 4 workers took {elapsed:.1f}s")
+    print(f"overlap: 4 large files with 4 workers and a slow builder in {elapsed:.1f}s (6.4s if nothing overlaps)")
+    if failures:
+        print("FAIL"); [print(f"  - {f}") for f in failures]; sys.exit(1)
+    print("PASS")
+
+if __name__ == "__main__":
+    main()
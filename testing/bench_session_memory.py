@@ -0,0 +1,58 @@
+# bench_session_memory.py
+# Memory per session and (de)serialization cost: the old dict-per-session layout vs session_state.ChatSession.
+# Usage: python testing/bench_session_memory.py [--sessions 20000]
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from session_state import ChatSession
+
+def session_fields(i):
+    # A mid-conversation IT session as main2.py builds it.
+    return {"awaiting_employee_id": False, "employee_id": 100000 + i, "employee_name": f"Employee {i}", "mode": "IT",
+            "assistant_name": "IT Assistant", "original_query_context": f"vpn issue {i}", "last_bot_response_for_feedback": f"answer {i}",
+            "mismatched_query_info": None, "first_interaction_after_id": False, "expecting_new_typed_query": False,
+            "just_stayed_in_mode": False, "session_paused_after_farewell": False, "jira_ticket_key": f"CHAT-{i:010X}",
+            "assigned_level": "L1 (initial)", "pending_email_for_ticket_update": None,
+            "original_query_context_for_ticket": f"vpn issue {i}", "reporter_email": None}
+
+def measure_memory(build, count):
+    values = [session_fields(i) for i in range(count)] # Field values are shared by both layouts; only the container is measured
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    sessions = [build(v) for v in values]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return allocated / count, sessions
+
+def time_us(func, items):
+    start = time.perf_counter()
+    for item in items: func(item)
+    return (time.perf_counter() - start) * 1e6 / len(items)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=20000)
+    args = parser.parse_args()
+
+    dict_bytes, dict_sessions = measure_memory(dict, args.sessions)
+    slot_bytes, slot_sessions = measure_memory(lambda v: ChatSession(**v), args.sessions)
+    print(f"Memory per session  : dict {dict_bytes:7.0f} B | ChatSession {slot_bytes:7.0f} B ({(1 - slot_bytes / dict_bytes) * 100:.0f}% less)")
+
+    dict_blobs = [json.dumps(s) for s in dict_sessions]
+    slot_blobs = [s.to_json() for s in slot_sessions]
+    print(f"Serialized size     : dict JSON {sum(map(len, dict_blobs)) / len(dict_blobs):7.0f} B | ChatSession {sum(map(len, slot_blobs)) / len(slot_blobs):7.0f} B")
+    print(f"Serialize           : dict JSON {time_us(json.dumps, dict_sessions):7.2f} us | ChatSession {time_us(ChatSession.to_json, slot_sessions):7.2f} us")
+    print(f"Deserialize         : dict JSON {time_us(json.loads, dict_blobs):7.2f} us | ChatSession {time_us(ChatSession.from_json, slot_blobs):7.2f} us")
+
+    round_trip = ChatSession.from_json(slot_sessions[0].to_json())
+    assert round_trip == slot_sessions[0] and round_trip.to_dict() == {**dict_sessions[0], "it_transcript": None}, "round trip mismatch"
+    print("Round trip          : OK")
+
+if __name__ == "__main__":
+    main()
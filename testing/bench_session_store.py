@@ -0,0 +1,89 @@
+# bench_session_store.py
+# Measures session lookup/update cost for the session_store backends with 100k sessions, and shows
+# LRU eviction when the in-memory store is bounded below the working set. Then checks that save_async on the
+# SQLite store keeps the event loop responsive while another connection holds the database write lock.
+# Usage: python testing/bench_session_store.py [--sessions 100000] [--ops 50000]
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from session_store import InMemorySessionStore, SQLiteSessionStore
+from session_state import ChatSession
+
+def sample_session(i):
+    return ChatSession(employee_id=100000 + i, employee_name=f"Employee {i}", mode="IT", assistant_name="IT Assistant",
+                       original_query_context="How do I connect to the VPN from home?",
+                       last_bot_response_for_feedback="To connect to the VPN, open the client and sign in with your domain account. " * 4,
+                       jira_ticket_key=f"CHAT-{i:010X}", assigned_level="L1 (initial)",
+                       original_query_context_for_ticket="How do I connect to the VPN from home?")
+
+def timed_us(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return (time.perf_counter() - start) * 1e6
+
+def bench(store, label, session_ids, ops):
+    populate_start = time.perf_counter()
+    for i, session_id in enumerate(session_ids): store.save(session_id, sample_session(i))
+    populate_s = time.perf_counter() - populate_start
+    picks = [random.choice(session_ids) for _ in range(ops)]
+    get_us = [timed_us(store.get, session_id) for session_id in picks]
+    # A chat turn: load, mutate, write back.
+    turn_us = []
+    for session_id in picks:
+        start = time.perf_counter()
+        session_data = store.get(session_id)
+        if session_data is not None:
+            session_data["expecting_new_typed_query"] = not session_data["expecting_new_typed_query"]
+            store.save(session_id, session_data)
+        turn_us.append((time.perf_counter() - start) * 1e6)
+    p95 = lambda values: statistics.quantiles(values, n=20)[-1]
+    print(f"{label:<28} populate {len(session_ids) / populate_s:>9.0f} saves/s | get p50 {statistics.median(get_us):6.1f}us p95 {p95(get_us):6.1f}us "
+          f"| get+save p50 {statistics.median(turn_us):6.1f}us p95 {p95(turn_us):6.1f}us")
+    print(f"{'':<28} {store.stats()}")
+
+def loop_stall_while_locked(db_path, hold_seconds=1.0):
+    """Largest event-loop gap (ms) while save_async waits on a write lock held by another connection."""
+    store, blocker = SQLiteSessionStore(db_path=db_path), sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+    async def run():
+        blocker.execute("BEGIN IMMEDIATE")
+        threading.Timer(hold_seconds, blocker.execute, ("COMMIT",)).start() # Off the loop, so a blocking save still ends
+        save, gaps, last = asyncio.create_task(store.save_async("locked", sample_session(0))), [], time.perf_counter()
+        while not save.done():
+            await asyncio.sleep(0.01)
+            now = time.perf_counter(); gaps.append(now - last); last = now
+        await save
+        return max(gaps) * 1000
+    try: return asyncio.run(run())
+    finally: blocker.close(); store.close()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=100000)
+    parser.add_argument("--ops", type=int, default=50000)
+    args = parser.parse_args()
+    random.seed(7)
+    session_ids = [str(uuid.uuid4()) for _ in range(args.sessions)]
+
+    bench(InMemorySessionStore(max_sessions=args.sessions), "memory (unbounded working set)", session_ids, args.ops)
+    bench(InMemorySessionStore(max_sessions=args.sessions // 2), "memory (LRU at 50%)", session_ids, args.ops)
+    db_path = os.path.join(tempfile.mkdtemp(prefix="sessions_"), "sessions.db")
+    sqlite_store = SQLiteSessionStore(db_path=db_path)
+    bench(sqlite_store, "sqlite (WAL)", session_ids, args.ops)
+    sqlite_store.close()
+    print(f"SQLite file size: {os.path.getsize(db_path) / 1e6:.1f} MB")
+    stall_ms = loop_stall_while_locked(db_path)
+    print(f"Event loop stall during a 1s lock wait: {stall_ms:.0f} ms ({'PASS' if stall_ms < 200 else 'FAIL'})")
+    if stall_ms >= 200: sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# calibrate_relevance.py
+# Fits the per-index relevance thresholds used by rag_pipeline.retrieve_relevant_context from labelled queries and
+# writes them to RELEVANCE_THRESHOLDS_PATH (data/relevance_thresholds.json). For each index the best-hit cosine
+# similarity of every query is computed, then:
+#   accept = lowest score whose "score >= accept" set reaches --precision (those turns skip the LLM as relevant)
+#   reject = highest score that drops at most --miss-rate of the relevant queries (those turns skip it as not relevant)
+# Scores between reject and accept keep the Gemini relevance check.
+#
+# Labelled input: JSON list of {"mode": "IT"|"HR", "query": "...", "relevant": true|false}. Without --labelled, IT
+# positives are the questions in data/faqs/faq_data.xlsx and negatives are the intent router's HR and out-of-scope
+# examples (FAQ questions sit in the index verbatim, so prefer real labelled user queries when you have them).
+#   python testing/calibrate_relevance.py --labelled labelled_queries.json
+#   python testing/calibrate_relevance.py --dry-run
+import argparse
+import json
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+os.chdir(REPO_ROOT) # Index and FAQ paths are relative to the repo root
+
+def default_labelled(faq_path):
+    import pandas as pd
+    from intent_router import DEFAULT_INTENT_EXAMPLES
+    rows = [{"mode": "IT", "query": str(q), "relevant": True} for q in pd.read_excel(faq_path)["Question"].dropna()]
+    rows += [{"mode": "IT", "query": q, "relevant": False} for q in DEFAULT_INTENT_EXAMPLES["HR"] + DEFAULT_INTENT_EXAMPLES["OutOfScope"]]
+    return rows
+
+def fit_thresholds(positives, negatives, precision, miss_rate):
+    """Returns (accept, reject) over the observed scores; reject never exceeds accept."""
+    candidates = sorted(set(positives + negatives))
+    accept = max(candidates) + 1e-6 # Nothing is auto-accepted unless some cut-off reaches the target precision
+    for cut in candidates:
+        above_pos = sum(score >= cut for score in positives); above_neg = sum(score >= cut for score in negatives)
+        if above_pos and above_pos / (above_pos + above_neg) >= precision: accept = cut; break
+    reject = min(candidates)
+    for cut in candidates:
+        if sum(score < cut for score in positives) / len(positives) <= miss_rate: reject = cut
+        else: break
+    return accept, min(reject, accept)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--labelled", help="JSON list of {mode, query, relevant}.")
+    parser.add_argument("--faq-path", default="data/faqs/faq_data.xlsx")
+    parser.add_argument("--precision", type=float, default=0.95, help="Target precision of auto-accepted retrievals.")
+    parser.add_argument("--miss-rate", type=float, default=0.05, help="Max share of relevant queries auto-rejected.")
+    parser.add_argument("--output", default=None, help="Defaults to RELEVANCE_THRESHOLDS_PATH.")
+    parser.add_argument("--dry-run", action="store_true", help="Print the fit without writing it.")
+    args = parser.parse_args()
+
+    from app_resources import load_shared_resources
+    from rag_pipeline import RELEVANCE_THRESHOLDS_PATH, RETRIEVAL_MAX_K, scored_search
+    if args.labelled:
+        with open(args.labelled, "r", encoding="utf-8") as f: rows = json.load(f)
+    else: rows = default_labelled(args.faq_path)
+    resources = load_shared_resources()
+    retrievers = {"IT": resources.get("it_retriever"), "HR": resources.get("hr_retriever")}
+
+    thresholds = {}
+    print(f"{'index':<6} {'pos':>5} {'neg':>5} {'pos mean':>9} {'neg mean':>9} {'accept':>7} {'reject':>7} {'auto':>6}")
+    for mode, retriever in retrievers.items():
+        mode_rows = [row for row in rows if row["mode"].upper() == mode]
+        if not mode_rows: continue
+        if retriever is None: print(f"{mode:<6} skipped: retriever unavailable"); continue
+        scored = [(row["relevant"], scored_search(retriever, row["query"], mode).top_score) for row in mode_rows]
+        positives = [score for relevant, score in scored if relevant and score is not None]
+        negatives = [score for relevant, score in scored if not relevant and score is not None]
+        if not positives or not negatives: print(f"{mode:<6} skipped: needs both relevant and irrelevant examples"); continue
+        accept, reject = fit_thresholds(positives, negatives, args.precision, args.miss_rate)
+        auto = sum(score >= accept or score < reject for score in positives + negatives) / (len(positives) + len(negatives))
+        print(f"{mode:<6} {len(positives):>5} {len(negatives):>5} {sum(positives) / len(positives):>9.3f} {sum(negatives) / len(negatives):>9.3f} "
+              f"{accept:>7.3f} {reject:>7.3f} {auto:>6.0%}")
+        thresholds[mode] = {"accept": round(accept, 4), "reject": round(reject, 4), "positives": len(positives), "negatives": len(negatives),
+                            "precision_target": args.precision, "miss_rate_target": args.miss_rate, "candidates_k": RETRIEVAL_MAX_K,
+                            "index_vectors": getattr(retriever.vectorstore.index, "ntotal", None), "fitted_at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+    output = args.output or RELEVANCE_THRESHOLDS_PATH
+    if args.dry_run or not thresholds: return
+    fitted = {}
+    if os.path.exists(output): # Keep the thresholds of indexes that were not re-fitted this run
+        with open(output, "r", encoding="utf-8") as f: fitted = json.load(f)
+    fitted.update(thresholds)
+    with open(output, "w", encoding="utf-8") as f: json.dump(fitted, f, indent=2)
+    print(f"Wrote {output}; restart the app to use it.")
+
+if __name__ == "__main__":
+    main()
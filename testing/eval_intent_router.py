@@ -0,0 +1,90 @@
+# eval_intent_router.py
+# Offline accuracy/latency check for intent_router.IntentRouter on a labelled set, using the real embedding
+# model (and, with --with-indexes, the IT/HR FAISS indexes from data/). Each row's expected value is the
+# source the LLM should pick; in-domain rows expect "escalate". Use it to pick INTENT_ROUTER_MIN_CONFIDENCE:
+#   python testing/eval_intent_router.py --with-indexes --sweep 0.6,0.7,0.8,0.85,0.9,0.95
+#   python testing/eval_intent_router.py --labelled my_queries.json   # [{"mode": "IT", "query": "...", "expected": "Greeting"}]
+import argparse
+import json
+import os
+import statistics
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+DEFAULT_LABELLED = [
+    {"mode": "IT", "query": "hi", "expected": "Greeting"},
+    {"mode": "IT", "query": "hello there", "expected": "Greeting"},
+    {"mode": "HR", "query": "good morning", "expected": "Greeting"},
+    {"mode": "HR", "query": "thanks a lot", "expected": "Greeting"},
+    {"mode": "IT", "query": "how are you?", "expected": "Greeting"},
+    {"mode": "IT", "query": "what is the dress code policy", "expected": "TopicMismatch"},
+    {"mode": "IT", "query": "how many sick leaves do I have", "expected": "TopicMismatch"},
+    {"mode": "IT", "query": "where is my payslip for last month", "expected": "TopicMismatch"},
+    {"mode": "HR", "query": "my vpn keeps disconnecting", "expected": "TopicMismatch"},
+    {"mode": "HR", "query": "the printer on floor 3 is jammed", "expected": "TopicMismatch"},
+    {"mode": "HR", "query": "reset my laptop password", "expected": "TopicMismatch"},
+    {"mode": "IT", "query": "what's the weather in Pune today", "expected": "OutOfScope"},
+    {"mode": "HR", "query": "who won yesterday's football match", "expected": "OutOfScope"},
+    {"mode": "IT", "query": "give me a pasta recipe", "expected": "OutOfScope"},
+    {"mode": "IT", "query": "how do I connect to the VPN from home", "expected": "escalate"},
+    {"mode": "IT", "query": "hi, my outlook is not syncing emails", "expected": "escalate"},
+    {"mode": "IT", "query": "excel crashes when opening large files", "expected": "escalate"},
+    {"mode": "HR", "query": "how many casual leaves do I get per year", "expected": "escalate"},
+    {"mode": "HR", "query": "what is the employee referral bonus", "expected": "escalate"},
+    {"mode": "HR", "query": "can I carry forward unused leave", "expected": "escalate"},
+]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--labelled", help="JSON list of {mode, query, expected}; defaults to a built-in set.")
+    parser.add_argument("--with-indexes", action="store_true", help="Also load the IT/HR FAISS indexes for the TopicMismatch index check.")
+    parser.add_argument("--sweep", default="", help="Comma-separated INTENT_ROUTER_MIN_CONFIDENCE values to compare.")
+    parser.add_argument("--verbose", action="store_true", help="Print every decision.")
+    args = parser.parse_args()
+    rows = DEFAULT_LABELLED
+    if args.labelled:
+        with open(args.labelled, "r", encoding="utf-8") as f: rows = json.load(f)
+
+    import app_resources
+    from intent_router import IntentRouter, INTENT_ROUTER_MIN_CONFIDENCE
+    if args.with_indexes: app_resources.load_shared_resources()
+    else:
+        from chatbot_llm import get_embedding_model
+        app_resources._resources["embedding_model"] = get_embedding_model()
+
+    router = IntentRouter(enabled=True)
+    router.prepare()
+    router.route("warm-up query", "IT") # First encode pays one-off model initialisation
+    decisions = [(row, router.route(row["query"], row["mode"])) for row in rows]
+    latencies = sorted(decision.elapsed_ms for _, decision in decisions)
+    print(f"{len(rows)} queries | route latency p50 {statistics.median(latencies):.1f} ms, max {latencies[-1]:.1f} ms")
+
+    vectors = [query_vector(router, row["query"]) for row in rows]
+    thresholds = [float(t) for t in args.sweep.split(",") if t.strip()] or [INTENT_ROUTER_MIN_CONFIDENCE]
+    print(f"{'min_conf':>8} {'routed':>7} {'correct':>8} {'wrong':>6} {'missed':>7}")
+    for threshold in thresholds:
+        router.min_confidence = threshold
+        routed = correct = wrong = missed = 0
+        for (row, decision), vector in zip(decisions, vectors):
+            vector_decision = router.decide(row["query"], row["mode"], vector, router._prototypes[1], decision.index_scores)
+            outcome = vector_decision.best_source or "escalate"
+            if outcome != "escalate":
+                routed += 1
+                if outcome == row["expected"]: correct += 1
+                else: wrong += 1 # A wrong local decision is the costly error: the LLM never sees the turn
+            elif row["expected"] != "escalate": missed += 1 # Safe, just a Gemini call the router could have saved
+            if args.verbose and threshold == thresholds[0]:
+                print(f"  [{row['mode']}] {row['query']!r}: {outcome} (expected {row['expected']}, {vector_decision.label} "
+                      f"{vector_decision.confidence:.2f}{', ' + vector_decision.reason if vector_decision.reason else ''})")
+        print(f"{threshold:>8.2f} {routed:>7} {correct:>8} {wrong:>6} {missed:>7}")
+
+def query_vector(router, query):
+    """Normalized query embedding, so each threshold re-decides a row without re-embedding it."""
+    import numpy as np
+    vector = np.asarray(router._prototypes[0].embed_query(query.strip()), dtype="float32")
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+if __name__ == "__main__":
+    main()
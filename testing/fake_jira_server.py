@@ -0,0 +1,166 @@
+# fake_jira_server.py
+# Minimal in-memory stand-in for the Jira Service Management endpoints used by ticketing_utils.py.
+# Supports injected latency, transient 503s and 429s with Retry-After, creates and comments whose response is lost
+# (the write happened but the client sees a 504), paged comment listing, JQL `text ~ "\"phrase\""` searches, and records every request so scripts can
+# check ordering. Point the app at it with:
+#   JIRA_BASE_URL=http://127.0.0.1:8765 JIRA_API_USER_EMAIL=bot@example.com JIRA_API_TOKEN=x \
+#   JIRA_SERVICE_DESK_ID=2 JIRA_REQUEST_TYPE_ID=10 uvicorn main2:app
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TRANSITIONS_BY_STATUS = {
+    "Open": [{"id": "11", "name": "Start Work", "to": {"name": "In Progress"}}, {"id": "31", "name": "Done", "to": {"name": "Done"}}],
+    "In Progress": [{"id": "21", "name": "Stop Work", "to": {"name": "Open"}}, {"id": "31", "name": "Done", "to": {"name": "Done"}}],
+    "Done": [{"id": "41", "name": "Reopen", "to": {"name": "Open"}}],
+}
+
+class FakeJiraState:
+    def __init__(self, latency_seconds=0.0, fail_rate=0.0, rate_limit_every=0, lose_create_every=0, lose_comment_every=0, project_key="FAKE", seed=None):
+        self.latency_seconds = latency_seconds
+        self.fail_rate = fail_rate
+        self.rate_limit_every = rate_limit_every
+        self.lose_create_every = lose_create_every
+        self.lose_comment_every = lose_comment_every
+        self.project_key = project_key
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.issues = {}
+        self.requests = [] # (method, path, status)
+        self.request_count = 0
+        self.create_count = 0
+        self.comment_count = 0
+
+    def next_issue_key(self):
+        return f"{self.project_key}-{len(self.issues) + 1}"
+
+def make_handler(state: FakeJiraState):
+    class FakeJiraHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True # Headers and body are written separately; avoid 40ms delayed-ACK stalls on keep-alive
+
+        def log_message(self, format, *args): pass
+
+        def _send(self, status, body=None, headers=None):
+            payload = b"" if body is None else json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in (headers or {}).items(): self.send_header(name, value)
+            self.end_headers()
+            if payload: self.wfile.write(payload)
+            with state.lock: state.requests.append((self.command, self.path, status))
+
+        def _read_json(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length) or b"{}") if length else {}
+
+        def _injected_failure(self):
+            with state.lock:
+                state.request_count += 1
+                count = state.request_count
+            if state.latency_seconds: time.sleep(state.latency_seconds)
+            if state.rate_limit_every and count % state.rate_limit_every == 0:
+                self._send(429, {"errorMessages": ["Rate limited"]}, {"Retry-After": "1"}); return True
+            if state.fail_rate and state.random.random() < state.fail_rate:
+                self._send(503, {"errorMessages": ["Injected failure"]}); return True
+            return False
+
+        def do_GET(self):
+            if self.path == "/_fake/requests":
+                with state.lock: self._send(200, {"requests": state.requests, "issues": state.issues}); return
+            body = self._read_json()
+            if self._injected_failure(): return
+            url = urlsplit(self.path)
+            if url.path == "/rest/api/3/search/jql":
+                phrase = re.fullmatch(r'text ~ "\\"(.*)\\""', parse_qs(url.query).get("jql", [""])[0])
+                if not phrase: self._send(400, {"errorMessages": ["Unsupported JQL"]}); return
+                with state.lock:
+                    keys = [key for key, issue in state.issues.items()
+                            if any(phrase.group(1) in (text or "") for text in [issue["summary"], issue["description"], *issue["comments"]])]
+                self._send(200, {"issues": [{"id": str(10000 + int(key.rsplit("-", 1)[1])), "key": key} for key in keys]}); return
+            match = re.fullmatch(r"/rest/servicedeskapi/request/([^/]+)/comment", url.path)
+            if match and match.group(1) in state.issues:
+                query = parse_qs(url.query)
+                start, limit = int(query.get("start", ["0"])[0]), int(query.get("limit", ["50"])[0])
+                with state.lock: comments = list(state.issues[match.group(1)]["comments"])
+                page = [{"id": str(start + i + 1), "body": body} for i, body in enumerate(comments[start:start + limit])]
+                self._send(200, {"start": start, "limit": limit, "size": len(page), "isLastPage": start + limit >= len(comments), "values": page}); return
+            match = re.fullmatch(r"/rest/api/3/issue/([^/]+)/transitions", self.path)
+            if match and match.group(1) in state.issues:
+                status = state.issues[match.group(1)]["status"]
+                self._send(200, {"transitions": TRANSITIONS_BY_STATUS.get(status, [])}); return
+            self._send(404, {"errorMessages": [f"Not found: {self.path}"]})
+
+        def do_POST(self):
+            body = self._read_json()
+            if self._injected_failure(): return
+            if self.path == "/rest/servicedeskapi/request":
+                with state.lock:
+                    issue_key = state.next_issue_key()
+                    fields = body.get("requestFieldValues", {})
+                    state.issues[issue_key] = {"summary": fields.get("summary"), "description": fields.get("description"), "status": "Open",
+                                               "comments": [], "assignee": None, "priority": None}
+                    state.create_count += 1
+                    lost = state.lose_create_every and state.create_count % state.lose_create_every == 0
+                if lost: self._send(504, {"errorMessages": ["Gateway timeout (issue was created)"]}); return
+                self._send(201, {"issueKey": issue_key, "issueId": str(10000 + len(state.issues)), "currentStatus": {"status": "Open"}}); return
+            match = re.fullmatch(r"/rest/servicedeskapi/request/([^/]+)/comment", self.path)
+            if match and match.group(1) in state.issues:
+                with state.lock:
+                    state.issues[match.group(1)]["comments"].append(body.get("body"))
+                    state.comment_count += 1
+                    lost = state.lose_comment_every and state.comment_count % state.lose_comment_every == 0
+                if lost: self._send(504, {"errorMessages": ["Gateway timeout (comment was added)"]}); return
+                self._send(201, {"id": str(len(state.issues[match.group(1)]["comments"])), "body": body.get("body")}); return
+            match = re.fullmatch(r"/rest/api/3/issue/([^/]+)/transitions", self.path)
+            if match and match.group(1) in state.issues:
+                issue = state.issues[match.group(1)]
+                transition_id = str(body.get("transition", {}).get("id"))
+                transition = next((t for t in TRANSITIONS_BY_STATUS.get(issue["status"], []) if t["id"] == transition_id), None)
+                if not transition: self._send(400, {"errorMessages": [f"Transition {transition_id} not valid from {issue['status']}"]}); return
+                with state.lock: issue["status"] = transition["to"]["name"]
+                self._send(204); return
+            self._send(404, {"errorMessages": [f"Not found: {self.path}"]})
+
+        def do_PUT(self):
+            body = self._read_json()
+            if self._injected_failure(): return
+            match = re.fullmatch(r"/rest/api/3/issue/([^/]+)(/assignee)?", self.path)
+            if match and match.group(1) in state.issues:
+                with state.lock:
+                    if match.group(2): state.issues[match.group(1)]["assignee"] = body.get("accountId")
+                    else: state.issues[match.group(1)]["priority"] = body.get("fields", {}).get("priority", {}).get("id")
+                self._send(204); return
+            self._send(404, {"errorMessages": [f"Not found: {self.path}"]})
+
+    return FakeJiraHandler
+
+def start_fake_jira_server(port=0, **state_kwargs):
+    """Starts the fake server on a background thread. Returns (server, state, base_url)."""
+    state = FakeJiraState(**state_kwargs)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state, f"http://127.0.0.1:{server.server_address[1]}"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local fake Jira Service Management server.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds of latency added to every request.")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Probability of an injected 503.")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Answer every Nth request with 429 + Retry-After.")
+    parser.add_argument("--lose-create-every", type=int, default=0, help="Create every Nth issue but answer 504.")
+    parser.add_argument("--lose-comment-every", type=int, default=0, help="Add every Nth comment but answer 504.")
+    args = parser.parse_args()
+    server, state, base_url = start_fake_jira_server(args.port, latency_seconds=args.latency, fail_rate=args.fail_rate, rate_limit_every=args.rate_limit_every,
+                                                     lose_create_every=args.lose_create_every, lose_comment_every=args.lose_comment_every)
+    print(f"Fake Jira listening on {base_url} (Ctrl+C to stop)")
+    try:
+        while True: time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,74 @@
+# fake_llm_backend.py
+# In-process stand-in for a Gemini GenerativeModel (generate_content_async, streaming included) for exercising
+# llm_client.LLMClient. Supports base latency with jitter, a share of slow "tail" calls, random or scripted
+# failures with google.api_core-style exception names, and records peak concurrency.
+import asyncio
+import random
+import threading
+import time
+
+class ResourceExhausted(Exception):
+    """Same class name as google.api_core.exceptions.ResourceExhausted (HTTP 429)."""
+
+class ServiceUnavailable(Exception):
+    """Same class name as google.api_core.exceptions.ServiceUnavailable (HTTP 503)."""
+
+class InvalidArgument(Exception):
+    """Same class name as google.api_core.exceptions.InvalidArgument (HTTP 400, not retryable)."""
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+async def _fake_stream(text, chunk_delay):
+    for word in text.split(" "):
+        await asyncio.sleep(chunk_delay)
+        yield FakeResponse(word + " ")
+
+class FakeLLMBackend:
+    def __init__(self, latency_seconds=0.05, jitter_seconds=0.0, slow_rate=0.0, slow_seconds=2.0, fail_rate=0.0,
+                 failures=None, reply="Fake answer.", seed=None):
+        self.latency_seconds = latency_seconds
+        self.jitter_seconds = jitter_seconds
+        self.slow_rate = slow_rate
+        self.slow_seconds = slow_seconds
+        self.fail_rate = fail_rate
+        self.failures = list(failures or []) # Exceptions raised by the next calls, in order (None = succeed)
+        self.reply = reply
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.cancelled = 0
+
+    async def generate_content_async(self, prompt, stream=False, **kwargs):
+        with self.lock:
+            self.calls += 1
+            self.in_flight += 1; self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            scripted = self.failures.pop(0) if self.failures else None
+            slow = self.random.random() < self.slow_rate
+            fail = self.random.random() < self.fail_rate
+            latency = (self.slow_seconds if slow else self.latency_seconds) + self.random.uniform(0, self.jitter_seconds)
+        try:
+            await asyncio.sleep(latency)
+            if scripted is not None: raise scripted
+            if fail: raise ServiceUnavailable("injected 503")
+            if stream: return _fake_stream(self.reply, 0.001)
+            return FakeResponse(self.reply)
+        except asyncio.CancelledError:
+            with self.lock: self.cancelled += 1
+            raise
+        finally:
+            with self.lock: self.in_flight -= 1
+
+def latency_percentiles(samples) -> dict:
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    return {"p50_ms": round(pick(0.50), 1), "p95_ms": round(pick(0.95), 1), "p99_ms": round(pick(0.99), 1), "max_ms": round(ordered[-1] * 1000, 1)}
+
+async def timed_call(client, stage="analysis", **kwargs):
+    started = time.perf_counter()
+    try: await client.generate_content_async("prompt", stage=stage, **kwargs); error = None
+    except Exception as e: error = e
+    return time.perf_counter() - started, error
@@ -0,0 +1,108 @@
+# index_versions_check.py
+# Drives index_versions.build_index_version (what build_indexes.py runs) on a scratch copy of data/hr_documents,
+# with offline hashed embeddings, and checks that:
+#   - a build publishes a read-only version whose manifest records model, chunking, file hashes and build stats,
+#   - an unchanged rebuild publishes nothing; a change publishes a new version and leaves the old one untouched,
+#   - the serving path (chatbot_vectorstore.get_index_vector_store) loads CURRENT, never builds a missing index,
+#     and refuses a version built with another embedding model,
+#   - CURRENT swaps are atomic for readers, rollback works, old versions are pruned, concurrent builds are refused.
+# Usage: python testing/index_versions_check.py
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.chdir(REPO_ROOT) # Source document paths are relative to the repo root
+
+def tree_digest(path):
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(path)):
+        with open(os.path.join(path, name), "rb") as f: digest.update(name.encode() + f.read())
+    return digest.hexdigest()
+
+def main():
+    scratch = tempfile.mkdtemp(prefix="index_versions_")
+    os.environ["EMBEDDING_CACHE_DIR"] = os.path.join(scratch, "embedding_cache") # Read at import time
+    os.environ["PARSED_CACHE_DIR"] = os.path.join(scratch, "parsed_cache")
+    from bench_incremental_index import HashEmbeddings
+    import chatbot_vectorstore
+    from chatbot_documents import list_hr_source_files, iter_hr_document_file
+    from index_manifest import load_manifest
+    from index_versions import (IndexBuildError, _build_lock, activate_version, build_index_version, current_version,
+                                current_version_path, list_versions, prune_versions, versions_root)
+    failures, model = [], HashEmbeddings()
+    sources = os.path.join(scratch, "hr_documents")
+    shutil.copytree("data/hr_documents", sources)
+    index_path = os.path.join(scratch, "vector_store_hr", "faiss_hr_documents_index")
+    build = lambda **kwargs: build_index_version(index_path, list_hr_source_files(sources), iter_hr_document_file, model, **kwargs)
+
+    first = build()
+    v1 = first["version"]
+    manifest = load_manifest(current_version_path(index_path))
+    if not first["published"] or current_version(index_path) != v1: failures.append(f"first build: not published/current ({first})")
+    if set(manifest.get("settings", {})) != {"format", "embedding_model", "chunk_size", "chunk_overlap"} or len(manifest["files"]) != 3 \
+            or manifest.get("build_stats", {}).get("chunks_embedded") != manifest.get("vectors"):
+        failures.append(f"first build: incomplete manifest {sorted(manifest)}")
+    if any(os.access(os.path.join(versions_root(index_path), v1, name), os.W_OK) and os.geteuid() != 0 for name in os.listdir(os.path.join(versions_root(index_path), v1))):
+        failures.append("first build: published files are writable")
+    v1_digest = tree_digest(os.path.join(versions_root(index_path), v1))
+    print(f"build 1: {v1} ({first['vectors']} vectors, {first['seconds']}s)")
+
+    again = build()
+    if again["published"] or again["version"] != v1 or again["files_parsed"] or list_versions(index_path) != [v1]:
+        failures.append(f"unchanged rebuild published or parsed something ({again})")
+    print(f"unchanged rebuild: {again['version']} published={again['published']} ({again['seconds']}s)")
+
+    removed = sorted(os.listdir(sources))[0]
+    shutil.move(os.path.join(sources, removed), os.path.join(scratch, removed))
+    second = build()
+    v2 = second["version"]
+    if not second["published"] or v2 == v1 or current_version(index_path) != v2 or second["chunks_embedded"] or second["vectors"] >= first["vectors"]:
+        failures.append(f"build after removing a file: unexpected result ({second})")
+    if load_manifest(current_version_path(index_path)).get("based_on") != v1: failures.append("build 2: based_on is not build 1")
+    if tree_digest(os.path.join(versions_root(index_path), v1)) != v1_digest: failures.append("build 2 modified version 1")
+    print(f"build 2 (removed {removed}): {v2} ({second['vectors']} vectors, {second['chunks_embedded']} chunks embedded)")
+
+    chatbot_vectorstore.INDEX_SPECS["hr"] = ("faiss_hr_documents_index", os.path.join(scratch, "vector_store_hr"), None, None, None)
+    chatbot_vectorstore.INDEX_SPECS["it"] = ("faiss_it_combined_index", os.path.join(scratch, "vector_store_it"), None, None, None)
+    served = chatbot_vectorstore.get_index_vector_store("hr", model)
+    if served is None or served.index.ntotal != second["vectors"]: failures.append("serving path did not load CURRENT")
+    if chatbot_vectorstore.get_index_vector_store("it", model) is not None or os.path.exists(os.path.join(scratch, "vector_store_it")):
+        failures.append("serving path built (or created) a missing index")
+    other_model = type("OtherHashEmbeddings", (HashEmbeddings,), {"model_name": "other-384"})()
+    if chatbot_vectorstore.get_index_vector_store("hr", other_model) is not None: failures.append("serving path loaded a version built with another model")
+
+    seen, stop = set(), threading.Event()
+    def reader():
+        while not stop.is_set(): seen.add(current_version(index_path))
+    thread = threading.Thread(target=reader); thread.start()
+    for i in range(300): activate_version(index_path, v1 if i % 2 else v2)
+    stop.set(); thread.join()
+    if not seen <= {v1, v2}: failures.append(f"readers saw {seen - {v1, v2}} during CURRENT swaps")
+    activate_version(index_path, v1)
+    if chatbot_vectorstore.get_index_vector_store("hr", model).index.ntotal != first["vectors"]: failures.append("rollback to version 1 not served")
+    print(f"rollback: CURRENT -> {current_version(index_path)}; readers saw only {sorted(seen)} across 300 swaps")
+
+    try:
+        with _build_lock(versions_root(index_path)): build(); failures.append("a second concurrent build was not refused")
+    except IndexBuildError as e: print(f"concurrent build refused: {e}")
+
+    shutil.move(os.path.join(scratch, removed), os.path.join(sources, removed))
+    activate_version(index_path, v2)
+    third = build(force=True)
+    pruned = prune_versions(index_path, keep=1)
+    if list_versions(index_path) != [third["version"]] or current_version(index_path) != third["version"] or third["chunks_encoded"]:
+        failures.append(f"forced build / prune: versions {list_versions(index_path)}, pruned {pruned}")
+    print(f"forced build: {third['version']} ({third['chunks_encoded']} chunks encoded); pruned {pruned}")
+    shutil.rmtree(scratch, onerror=lambda func, path, _: (os.chmod(path, 0o600), func(path)))
+    if failures:
+        print("FAIL"); [print(f"  - {f}") for f in failures]; sys.exit(1)
+    print("PASS")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# llm_client_check.py
+# Drives llm_client.LLMClient against testing/fake_llm_backend.py and checks that:
+#   - 429/503 errors are retried and the call succeeds; non-retryable errors are raised at once,
+#   - a stage deadline bounds the whole call (retries included) and slow calls fail fast,
+#   - hedging cuts the latency tail when a share of calls is slow, and cancels the losing request,
+#   - the circuit breaker opens after repeated failures, fails fast, closes after a successful trial, and a
+#     cancelled half-open trial does not leave it rejecting every call,
+#   - the semaphore caps in-flight calls, and streams release their permit once the stream is open.
+# Usage: python testing/llm_client_check.py [--calls 200] [--slow-rate 0.05]
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fake_llm_backend import FakeLLMBackend, InvalidArgument, ResourceExhausted, ServiceUnavailable, latency_percentiles, timed_call
+from llm_client import CircuitBreaker, LLMClient, LLMDeadlineExceeded, LLMUnavailableError
+
+async def check_retries(failures):
+    backend = FakeLLMBackend(latency_seconds=0.01, failures=[ResourceExhausted("429 quota"), ServiceUnavailable("503")])
+    client = LLMClient(backend, max_retries=2, retry_base_seconds=0.02)
+    elapsed, error = await timed_call(client)
+    if error or backend.calls != 3: failures.append(f"retries: expected success on the 3rd call, got {error!r} after {backend.calls} call(s)")
+    retried = client.stats()
+    backend = FakeLLMBackend(latency_seconds=0.01, failures=[InvalidArgument("bad prompt")])
+    client = LLMClient(backend, max_retries=2, retry_base_seconds=0.02)
+    _, error = await timed_call(client)
+    if not isinstance(error, InvalidArgument) or backend.calls != 1: failures.append(f"retries: non-retryable error retried ({backend.calls} calls)")
+    print(f"retries: 429+503 recovered in {elapsed * 1000:.0f} ms; {retried}")
+
+async def check_deadline(failures):
+    backend = FakeLLMBackend(latency_seconds=2.0)
+    client = LLMClient(backend, stage_deadlines={"analysis": 0.3}, max_retries=2, retry_base_seconds=0.02)
+    elapsed, error = await timed_call(client)
+    if not isinstance(error, LLMDeadlineExceeded) or elapsed > 0.45: failures.append(f"deadline: expected LLMDeadlineExceeded in ~0.3s, got {error!r} in {elapsed:.2f}s")
+    print(f"deadline: 2s call cut at {elapsed * 1000:.0f} ms ({type(error).__name__})")
+
+async def check_hedging(failures, calls, slow_rate):
+    results = {}
+    for label, stages in (("no hedge", set()), ("hedged", {"analysis"})):
+        backend = FakeLLMBackend(latency_seconds=0.05, jitter_seconds=0.02, slow_rate=slow_rate, slow_seconds=1.0, seed=11)
+        client = LLMClient(backend, max_concurrency=64, hedge_stages=stages, hedge_after_seconds=0.15, stage_deadlines={"analysis": 5})
+        samples = []
+        for batch in range(0, calls, 20):
+            for elapsed, error in await asyncio.gather(*(timed_call(client) for _ in range(min(20, calls - batch)))):
+                if error: failures.append(f"hedging ({label}): {error!r}")
+                samples.append(elapsed)
+        await asyncio.sleep(0.05) # Let cancelled losers unwind
+        results[label] = latency_percentiles(samples)
+        print(f"{label:>8}: {results[label]} backend calls={backend.calls} cancelled={backend.cancelled} {client.stats()}")
+    if results["hedged"]["p99_ms"] >= results["no hedge"]["p99_ms"] * 0.5: failures.append("hedging: p99 not cut by at least half")
+
+async def check_breaker(failures):
+    backend = FakeLLMBackend(latency_seconds=0.01, fail_rate=1.0)
+    client = LLMClient(backend, max_retries=0, breaker=CircuitBreaker(failure_threshold=3, cooldown_seconds=0.3))
+    for _ in range(3): await timed_call(client)
+    calls_before = backend.calls
+    elapsed, error = await timed_call(client)
+    if not isinstance(error, LLMUnavailableError) or backend.calls != calls_before: failures.append(f"breaker: expected fast rejection, got {error!r}")
+    backend.fail_rate = 0.0
+    await asyncio.sleep(0.35)
+    _, error = await timed_call(client)
+    if error or client.breaker.state != "closed": failures.append(f"breaker: half-open trial did not close it ({error!r}, {client.breaker.state})")
+    # A half-open trial that is cancelled (client disconnect, outer timeout) must not wedge the breaker.
+    backend.fail_rate = 1.0
+    for _ in range(3): await timed_call(client)
+    await asyncio.sleep(0.35)
+    backend.fail_rate, backend.latency_seconds = 0.0, 1.0
+    trial = asyncio.create_task(client.generate_content_async("prompt", stage="analysis"))
+    await asyncio.sleep(0.05); trial.cancel()
+    await asyncio.gather(trial, return_exceptions=True)
+    backend.latency_seconds = 0.01
+    _, error = await timed_call(client)
+    if error or client.breaker.state != "closed": failures.append(f"breaker: cancelled half-open trial left it stuck ({error!r}, {client.breaker.state})")
+    print(f"breaker: rejected in {elapsed * 1000:.2f} ms while open, closed after cooldown; {client.stats()}")
+
+async def check_concurrency(failures):
+    backend = FakeLLMBackend(latency_seconds=0.05)
+    client = LLMClient(backend, max_concurrency=4, stage_deadlines={"analysis": 5, "stream": 5})
+    await asyncio.gather(*(timed_call(client) for _ in range(30)))
+    if backend.max_in_flight > 4: failures.append(f"concurrency: {backend.max_in_flight} calls in flight with a limit of 4")
+    streams = [await client.generate_content_async("prompt", stream=True, stage="stream") for _ in range(6)] # More open streams than permits
+    text = "".join([chunk.text async for chunk in streams[0]])
+    if client.stats()["in_flight"] or not text.strip(): failures.append("concurrency: open streams still hold permits")
+    print(f"concurrency: peak {backend.max_in_flight} in flight for 30 calls (limit 4); 6 streams opened")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    args = parser.parse_args()
+
+    async def run():
+        failures = []
+        await check_retries(failures)
+        await check_deadline(failures)
+        await check_hedging(failures, args.calls, args.slow_rate)
+        await check_breaker(failures)
+        await check_concurrency(failures)
+        return failures
+
+    started = time.perf_counter()
+    failures = asyncio.run(run())
+    print(f"Finished in {time.perf_counter() - started:.1f}s")
+    if failures:
+        print("FAIL"); [print(f"  - {f}") for f in failures]; sys.exit(1)
+    print("PASS")
+
+if __name__ == "__main__":
+    main()
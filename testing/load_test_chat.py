@@ -0,0 +1,80 @@
+# load_test_chat.py
+# Fires concurrent chat sessions at a running server and reports throughput per concurrency level.
+# With a non-blocking /chat, req/s should climb with concurrency until the LLM/Jira backends saturate;
+# with a blocked event loop it stays flat at roughly 1 / (average turn latency).
+#
+# Usage (server started separately, e.g. `uvicorn main2:app --port 8000`):
+#   python testing/load_test_chat.py --url http://127.0.0.1:8000 --levels 1,2,4,8,16 --turns 3
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+SAMPLE_QUERIES = [
+    "How do I connect to the VPN?",
+    "My laptop battery drains quickly",
+    "How do I reset my password?",
+    "Printer is not printing",
+    "How to update the BIOS on my laptop?",
+]
+
+def post_chat(http, base_url, payload, latencies):
+    start = time.perf_counter()
+    response = http.post(f"{base_url}/chat", json=payload, timeout=120)
+    latencies.append(time.perf_counter() - start)
+    response.raise_for_status()
+    return response.json()
+
+def run_session(base_url, app_variant, employee_id, turns, session_index, latencies):
+    http = requests.Session()
+    if app_variant == "main2":
+        data = post_chat(http, base_url, {"user_query": "", "session_id": None, "intent": None}, latencies)
+        session_id = data.get("session_id")
+        data = post_chat(http, base_url, {"user_query": str(employee_id), "session_id": session_id, "intent": None}, latencies)
+    else:
+        session_id = None
+    data = post_chat(http, base_url, {"user_query": "IT Related", "session_id": session_id, "intent": "select_mode_it"}, latencies)
+    session_id = data.get("session_id", session_id)
+    for turn in range(turns):
+        query = SAMPLE_QUERIES[(session_index + turn) % len(SAMPLE_QUERIES)]
+        post_chat(http, base_url, {"user_query": query, "session_id": session_id, "intent": None}, latencies)
+
+def run_level(base_url, app_variant, employee_id, concurrency, turns):
+    latencies = []
+    errors = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(run_session, base_url, app_variant, employee_id, turns, i, latencies) for i in range(concurrency)]
+        for future in futures:
+            try: future.result()
+            except Exception as e: errors += 1; print(f"  session failed: {e}")
+    wall_time = time.perf_counter() - start
+    return {"concurrency": concurrency, "requests": len(latencies), "errors": errors, "wall_s": wall_time,
+            "req_per_s": len(latencies) / wall_time if wall_time else 0.0,
+            "p50_s": statistics.median(latencies) if latencies else 0.0,
+            "p95_s": statistics.quantiles(latencies, n=20)[-1] if len(latencies) >= 2 else (latencies[0] if latencies else 0.0)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent /chat load test.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--app", choices=["main", "main2"], default="main2", help="Which app's conversation flow to drive.")
+    parser.add_argument("--employee-id", default="101528")
+    parser.add_argument("--levels", default="1,2,4,8,16", help="Comma separated concurrency levels.")
+    parser.add_argument("--turns", type=int, default=3, help="IT queries per session.")
+    args = parser.parse_args()
+
+    results = []
+    for level in [int(x) for x in args.levels.split(",") if x.strip()]:
+        print(f"Running concurrency={level} ...")
+        results.append(run_level(args.url.rstrip("/"), args.app, args.employee_id, level, args.turns))
+
+    baseline = results[0]["req_per_s"] if results and results[0]["req_per_s"] else None
+    print(f"\n{'conc':>5} {'reqs':>6} {'errs':>5} {'wall_s':>8} {'req/s':>8} {'p50_s':>7} {'p95_s':>7} {'scaling':>8}")
+    for r in results:
+        scaling = f"{r['req_per_s'] / baseline:.2f}x" if baseline else "n/a"
+        print(f"{r['concurrency']:>5} {r['requests']:>6} {r['errors']:>5} {r['wall_s']:>8.2f} {r['req_per_s']:>8.2f} {r['p50_s']:>7.2f} {r['p95_s']:>7.2f} {scaling:>8}")
+
+if __name__ == "__main__":
+    main()
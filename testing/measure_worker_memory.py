@@ -0,0 +1,90 @@
+# measure_worker_memory.py
+# Starts gunicorn with 1..N workers, with and without preload, and reports total RSS and PSS
+# (proportional set size: shared pages are split between the processes sharing them) for the master
+# plus all workers. With preload + mmap'd FAISS, PSS should grow by a small constant per worker;
+# without it, each worker adds a full embedding model + index copy.
+# Linux only (reads /proc). Usage, from the repo root:
+#   python testing/measure_worker_memory.py --app main2:app --levels 1,2,4
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0)); return s.getsockname()[1]
+
+def child_pids(parent_pid):
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit(): continue
+        try:
+            with open(f"/proc/{entry}/stat") as f: fields = f.read().rsplit(")", 1)[1].split()
+        except OSError: continue
+        if int(fields[1]) == parent_pid: children.append(int(entry))
+    return children
+
+def memory_kb(pid):
+    values = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if parts[0] in ("Rss:", "Pss:"): values[parts[0][:-1]] = int(parts[1])
+    except OSError: pass
+    return values.get("Rss", 0), values.get("Pss", 0)
+
+def wait_until_ready(port, master_pid, workers, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if len(child_pids(master_pid)) >= workers:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=5): return True
+            except urllib.error.HTTPError: return True # Any HTTP response means a worker is serving
+            except Exception: pass
+        time.sleep(1)
+    return False
+
+def measure(app, workers, preload, timeout, settle):
+    port = free_port()
+    env = {**os.environ, "WEB_CONCURRENCY": str(workers), "GUNICORN_BIND": f"127.0.0.1:{port}",
+           "GUNICORN_PRELOAD": str(preload), "PRELOAD_SHARED_RESOURCES": str(preload), "FAISS_MMAP": str(preload)}
+    proc = subprocess.Popen([sys.executable, "-m", "gunicorn", app, "-c", "gunicorn.conf.py"], cwd=REPO_ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_until_ready(port, proc.pid, workers, timeout): return None
+        time.sleep(settle) # Let per-worker startup (LLM client, executors, outbox) finish
+        pids = [proc.pid] + child_pids(proc.pid)
+        totals = [memory_kb(pid) for pid in pids]
+        return {"processes": len(pids), "rss_mb": sum(r for r, _ in totals) / 1024, "pss_mb": sum(p for _, p in totals) / 1024}
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try: proc.wait(timeout=30)
+        except subprocess.TimeoutExpired: proc.kill()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--app", default="main2:app")
+    parser.add_argument("--levels", default="1,2,4")
+    parser.add_argument("--timeout", type=float, default=300, help="Seconds to wait for workers to come up.")
+    parser.add_argument("--settle", type=float, default=5)
+    args = parser.parse_args()
+    levels = [int(x) for x in args.levels.split(",") if x.strip()]
+
+    print(f"{'mode':<10} {'workers':>7} {'procs':>6} {'RSS MB':>9} {'PSS MB':>9} {'PSS/worker':>11}")
+    for preload in (False, True):
+        mode = "preload" if preload else "per-worker"
+        for workers in levels:
+            result = measure(args.app, workers, preload, args.timeout, args.settle)
+            if not result: print(f"{mode:<10} {workers:>7}  failed to start within {args.timeout:.0f}s"); continue
+            print(f"{mode:<10} {workers:>7} {result['processes']:>6} {result['rss_mb']:>9.1f} {result['pss_mb']:>9.1f} {result['pss_mb'] / workers:>11.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# outbox_fake_jira_check.py
+# Drives jira_outbox.JiraOutbox against testing/fake_jira_server.py and checks that:
+#   - every queued side effect reaches Jira despite injected 503s/429s,
+#   - operations for one ticket are applied in the order they were queued,
+#   - a create or comment whose response was lost (applied in Jira, client saw a 504) is not applied twice on retry,
+#   - re-enqueueing with the same idempotency key does not duplicate work, while identical operations without
+#     a key (the same comment sent twice) are both applied; a create repeated with its key returns the first reference.
+# Usage: python testing/outbox_fake_jira_check.py [--tickets 20] [--fail-rate 0.2]
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fake_jira_server import start_fake_jira_server
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickets", type=int, default=20)
+    parser.add_argument("--fail-rate", type=float, default=0.2)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--lose-create-every", type=int, default=3, help="Every Nth create reaches Jira but its response is lost.")
+    parser.add_argument("--lose-comment-every", type=int, default=4, help="Every Nth comment reaches Jira but its response is lost.")
+    args = parser.parse_args()
+
+    server, state, base_url = start_fake_jira_server(latency_seconds=args.latency, fail_rate=args.fail_rate, rate_limit_every=25,
+                                                     lose_create_every=args.lose_create_every,
+                                                     lose_comment_every=args.lose_comment_every, seed=7)
+    # ticketing_utils reads its configuration at import time.
+    os.environ.update({"JIRA_BASE_URL": base_url, "JIRA_API_USER_EMAIL": "bot@example.com", "JIRA_API_TOKEN": "fake",
+                       "JIRA_SERVICE_DESK_ID": "2", "JIRA_REQUEST_TYPE_ID": "10"})
+    from jira_outbox import JiraOutbox
+    from ticketing_utils import get_transition_cache_stats
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix="jira_outbox_"), "outbox.db")
+    outbox = JiraOutbox(db_path=db_path, base_backoff_seconds=0.05, max_backoff_seconds=0.5, max_attempts=10)
+
+    async def run():
+        await outbox.start(workers=args.workers)
+        refs = []
+        enqueue_start = time.perf_counter()
+        for i in range(args.tickets):
+            ref = outbox.create_ticket(summary=f"Outbox check {i}", description_text=f"Query {i}", idempotency_key=f"session-{i}:1:create")
+            if outbox.create_ticket(summary=f"Outbox check {i}", description_text=f"Query {i}", idempotency_key=f"session-{i}:1:create") != ref:
+                failures.append(f"ticket {i}: a create repeated with the same key returned a new reference")
+            outbox.add_comment(ref, f"comment-1 for {i}", is_public=False)
+            outbox.transition(ref, transition_names=["Start Work"])
+            outbox.add_comment(ref, f"comment-2 for {i}", is_public=False, idempotency_key=f"{ref}:comment-2")
+            outbox.add_comment(ref, f"comment-2 for {i}", is_public=False, idempotency_key=f"{ref}:comment-2") # Same key -> ignored
+            outbox.add_comment(ref, f"still broken {i}", is_public=False)
+            outbox.add_comment(ref, f"still broken {i}", is_public=False) # No key: a second, real comment
+            outbox.assign(ref, "acc-123")
+            outbox.set_priority(ref, "2")
+            outbox.transition(ref, transition_names=["Done"])
+            refs.append(ref)
+        enqueue_ms = (time.perf_counter() - enqueue_start) * 1000
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            stats = outbox.stats()
+            if not stats.get("pending") and not stats.get("in_progress"): break
+            await asyncio.sleep(0.1)
+        await outbox.stop()
+        return refs, enqueue_ms
+
+    failures = []
+    refs, enqueue_ms = asyncio.run(run())
+    stats = outbox.stats()
+    if stats.get("dead"): failures.append(f"{stats['dead']} operation(s) dead-lettered")
+    for ref in refs:
+        jira_key = outbox.resolve_ticket_key(ref)
+        issue = state.issues.get(jira_key) if jira_key else None
+        if not issue: failures.append(f"{ref}: ticket never created"); continue
+        i = refs.index(ref)
+        if issue["comments"] != [f"comment-1 for {i}", f"comment-2 for {i}", f"still broken {i}", f"still broken {i}"]:
+            failures.append(f"{ref} ({jira_key}): comments out of order or duplicated: {issue['comments']}")
+        if issue["status"] != "Done": failures.append(f"{ref} ({jira_key}): final status {issue['status']}")
+        if issue["assignee"] != "acc-123" or issue["priority"] != "2": failures.append(f"{ref} ({jira_key}): assignee/priority not applied")
+    if len(state.issues) != len(refs): failures.append(f"expected {len(refs)} issues, Jira has {len(state.issues)} (duplicate creates?)")
+
+    injected = sum(1 for _, _, status in state.requests if status in (429, 503))
+    lost_creates = sum(1 for method, path, status in state.requests if method == "POST" and path == "/rest/servicedeskapi/request" and status == 504)
+    lost_comments = sum(1 for method, path, status in state.requests if method == "POST" and path.endswith("/comment") and status == 504)
+    print(f"Lost create responses: {lost_creates}; Jira issues: {len(state.issues)} for {len(refs)} tickets.")
+    print(f"Lost comment responses: {lost_comments}.")
+    print(f"Enqueued {len(refs)} tickets x 9 operations in {enqueue_ms:.1f} ms (request-path cost).")
+    transition_lookups = sum(1 for method, path, _ in state.requests if method == "GET" and path.endswith("/transitions"))
+    print(f"Jira requests: {len(state.requests)} ({injected} injected 429/503). Outbox: {stats}")
+    print(f"Transition lookups: {transition_lookups} GETs for {2 * len(refs)} transitions. Cache: {get_transition_cache_stats()}")
+    server.shutdown()
+    if failures:
+        print("FAIL"); [print(f"  - {f}") for f in failures]; sys.exit(1)
+    print("PASS")
+
+if __name__ == "__main__":
+    main()
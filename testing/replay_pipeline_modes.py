@@ -0,0 +1,234 @@
+# replay_pipeline_modes.py
+# Replays a fixed set of chat turns through the app once per PIPELINE_MODE ("multi_call" vs "single_call") and
+# compares per-turn latency, Gemini calls and token counts. Each mode runs in its own interpreter so the
+# module-level PIPELINE_MODE is read fresh.
+#
+# Live (real Gemini + FAISS indexes; needs GOOGLE_API_KEY and the data/ folders):
+#   python testing/replay_pipeline_modes.py --app main2
+# Simulated (no network: canned Gemini with a latency model, keyword retriever, canned web search):
+#   python testing/replay_pipeline_modes.py --simulate
+# Extra app settings for both runs, e.g. speculative retrieval off, with a retrieval cost modelled:
+#   python testing/replay_pipeline_modes.py --simulate --sim-retrieval-ms 150 --env SPECULATIVE_RETRIEVAL=false
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+DEFAULT_REPLAY = [
+    {"mode": "IT", "query": "How do I connect to the VPN from home?"},
+    {"mode": "IT", "query": "I forgot my Windows password, how can I reset it?"},
+    {"mode": "IT", "query": "The office printer on floor 3 is not printing"},
+    {"mode": "IT", "query": "How do I set up Outlook on my phone?"},
+    {"mode": "IT", "query": "My second monitor shows no signal"},
+    {"mode": "IT", "query": "hi"},
+    {"mode": "IT", "query": "what is the dress code policy"},
+    {"mode": "HR", "query": "How many casual leaves do I get per year?"},
+    {"mode": "HR", "query": "Where can I download my payslip?"},
+    {"mode": "HR", "query": "What is the policy on relocation allowance?"},
+    {"mode": "HR", "query": "what's the weather in Pune today"},
+]
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+class CountingLLM:
+    """Wraps the app's Gemini model and records calls, latency and tokens (usage_metadata when the SDK provides it)."""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.reset()
+
+    def reset(self):
+        self.calls, self.prompt_tokens, self.output_tokens, self.llm_seconds = 0, 0, 0, 0.0
+
+    async def generate_content_async(self, prompt, **kwargs):
+        start = time.perf_counter()
+        response = await self.inner.generate_content_async(prompt, **kwargs)
+        self.llm_seconds += time.perf_counter() - start
+        self.calls += 1
+        usage = getattr(response, "usage_metadata", None)
+        self.prompt_tokens += getattr(usage, "prompt_token_count", 0) or estimate_tokens(prompt)
+        self.output_tokens += getattr(usage, "candidates_token_count", 0) or estimate_tokens(response.text)
+        return response
+
+# --- SIMULATION (used with --simulate) ---
+SIM_TOPICS = {
+    "IT": {"vpn": "VPN", "password": "Password Reset", "printer": "Printer", "printing": "Printer"},
+    "HR": {"leave": "Leave Policy", "leaves": "Leave Policy", "payslip": "Payroll", "dress": "Dress Code"},
+}
+SIM_DOCS = [
+    ("vpn_sop.pdf", "VPN: install the GlobalProtect client, sign in with your company email and connect to the nearest gateway."),
+    ("faq_data.xlsx", "Question: How do I reset my password?\nAnswer: Use the self-service password portal and verify with MFA."),
+    ("printer_sop.docx", "Printer: check the queue, power-cycle the printer, then re-add it from the print server."),
+    ("leave_policy.pdf", "Leave: employees get 12 casual leaves and 12 sick leaves per calendar year, applied through Keka."),
+    ("payroll_faq.pdf", "Payslip: payslips are published on Keka under Payroll > Payslips by the 1st of every month."),
+    ("dress_code.pdf", "Dress code: business casuals Monday to Thursday; smart casuals on Friday."),
+]
+
+class SimResponse:
+    def __init__(self, text): self.text = text
+
+class SimulatedGemini:
+    """Canned Gemini replies; latency = base + input tokens * prefill cost + output tokens * decode cost."""
+
+    def __init__(self, base_ms, input_ms_per_token, output_ms_per_token):
+        self.base_ms, self.input_ms_per_token, self.output_ms_per_token = base_ms, input_ms_per_token, output_ms_per_token
+
+    @staticmethod
+    def _classify(query, mode):
+        words = set(query.lower().replace("?", " ").replace(",", " ").split())
+        if words & {"hi", "hello", "hey"}: return "Greeting", "greeting"
+        other = "HR" if mode == "IT" else "IT"
+        if words & set(SIM_TOPICS[other]): return "TopicMismatch", f"{other} query: {query}"
+        if words & {"weather", "cricket", "capital"}: return "OutOfScope", query
+        if mode == "IT" and "outlook" in words: return "Web_Search_IT", "outlook mobile setup"
+        return "Internal_Docs", " ".join(sorted(words & set(SIM_TOPICS[mode])) or sorted(words)[:4])
+
+    @staticmethod
+    def _field(prompt, label):
+        start = prompt.index(label) + len(label)
+        return prompt[start:prompt.index('"', start)]
+
+    def _reply(self, prompt):
+        if "Do all three steps below" in prompt:
+            query, mode = self._field(prompt, 'User Query: "'), self._field(prompt, 'Current Assistant Mode: "')
+            source, simplified = self._classify(query, mode)
+            context = prompt.split("---", 2)[1].lower()
+            relevant = source == "Internal_Docs" and any(word in context for word in simplified.split() if len(word) > 2)
+            answer = self._answer(query) if relevant else ""
+            return json.dumps({"best_source": source, "simplified_query_for_search": simplified, "context_relevant": "YES" if relevant else "NO", "answer": answer})
+        if "Analyze the user query" in prompt:
+            query, mode = self._field(prompt, 'User Query: "'), self._field(prompt, 'Current Assistant Mode: "')
+            source, simplified = self._classify(query, mode)
+            return json.dumps({"best_source": source, "simplified_query_for_search": simplified})
+        if "Answer strictly with only" in prompt:
+            simplified = self._field(prompt, 'Simplified Search Query Used: "')
+            context = prompt.split("---", 2)[1].lower()
+            return "YES" if any(word in context for word in simplified.split() if len(word) > 2) else "NO"
+        if "assignment_level" in prompt:
+            return '{"assignment_level": "L1", "priority": "Medium", "reasoning": "Standard issue.", "suggested_category": "General"}'
+        return self._answer(self._field(prompt, 'Answer the user\'s query: "'))
+
+    @staticmethod
+    def _answer(query):
+        return (f"Here is how to sort out \"{query}\":\n\n1. **Check the basics** described in the guide.\n2. Follow the steps in order, "
+                "confirming each one before moving on.\n3. If the problem persists, restart and try again.\n\n"
+                "If none of this works, reply *Not Helpful* and the support team will take over.")
+
+    async def generate_content_async(self, prompt, **kwargs):
+        text = self._reply(prompt)
+        await asyncio.sleep((self.base_ms + estimate_tokens(prompt) * self.input_ms_per_token + estimate_tokens(text) * self.output_ms_per_token) / 1000)
+        return SimResponse(text)
+
+class SimulatedRetriever:
+    def __init__(self, k=3, latency_ms=0.0): self.k, self.latency_ms = k, latency_ms
+    def get_relevant_documents(self, query):
+        time.sleep(self.latency_ms / 1000) # Query embedding + FAISS search
+        from langchain_core.documents import Document
+        words = set(query.lower().replace("?", " ").split())
+        ranked = sorted(SIM_DOCS, key=lambda doc: -len(words & set(doc[1].lower().replace(":", " ").split())))
+        return [Document(page_content=text, metadata={"source": source}) for source, text in ranked[:self.k]]
+
+def install_simulation(args):
+    import app_resources, chatbot_utils
+    chatbot_utils.get_gemini_llm = lambda: SimulatedGemini(args.sim_base_ms, args.sim_input_ms, args.sim_output_ms)
+    def simulated_web_search(query_text, max_results=3):
+        time.sleep(args.sim_web_ms / 1000)
+        return ("Web Search Results:\n\nTitle: Set up Outlook for iOS and Android\nURL: https://support.microsoft.com/outlook-mobile\n"
+                "Snippet: Install the Outlook app, add your work account and approve the sign-in.")
+    chatbot_utils.perform_duckduckgo_search = simulated_web_search
+    app_resources.get_embedding_model = lambda: object()
+    app_resources.get_it_retriever = lambda embedding_model, force_recreate=False: SimulatedRetriever(5, args.sim_retrieval_ms)
+    app_resources.get_hr_retriever = lambda embedding_model, force_recreate=False: SimulatedRetriever(3, args.sim_retrieval_ms)
+
+# --- WORKER (one pipeline mode) ---
+def start_session(client, app_name, mode, employee_id):
+    session_id = None
+    if app_name == "main2":
+        session_id = client.post("/chat", json={"user_query": ""}).json()["session_id"]
+        client.post("/chat", json={"user_query": str(employee_id), "session_id": session_id})
+    intent = "select_mode_it" if mode == "IT" else "select_mode_hr"
+    return client.post("/chat", json={"user_query": f"{mode} Assistant", "session_id": session_id, "intent": intent}).json()["session_id"]
+
+def run_worker(args):
+    if args.simulate: install_simulation(args)
+    from fastapi.testclient import TestClient
+    from app_resources import RESOURCE_READINESS
+    app_module = importlib.import_module(args.app)
+    replay = json.load(open(args.queries)) if args.queries else DEFAULT_REPLAY
+    with TestClient(app_module.app) as client:
+        deadline = time.monotonic() + args.warmup_timeout
+        while any(RESOURCE_READINESS.is_warming_up(name) for name in ("llm", "it_retriever", "hr_retriever")) and time.monotonic() < deadline: time.sleep(0.2)
+        counter = CountingLLM(app_module.llm)
+        app_module.llm = counter
+        for item in replay:
+            session_id = start_session(client, args.app, item["mode"], args.employee_id)
+            counter.reset()
+            start = time.perf_counter()
+            payload = client.post("/chat", json={"user_query": item["query"], "session_id": session_id}).json()
+            print("REPLAY " + json.dumps({"query": item["query"], "latency_s": time.perf_counter() - start, "llm_calls": counter.calls,
+                                          "llm_s": counter.llm_seconds, "prompt_tokens": counter.prompt_tokens,
+                                          "output_tokens": counter.output_tokens, "response": payload.get("response", "")[:80]}), flush=True)
+    from rag_pipeline import get_pipeline_stats
+    print("STATS " + json.dumps(get_pipeline_stats()), flush=True)
+
+def run_mode(pipeline_mode, args, workdir):
+    env = {**os.environ, "PIPELINE_MODE": pipeline_mode, "WARMUP_IN_BACKGROUND": "True", "JIRA_LAZY_TICKET_CREATION": "true",
+           "JIRA_OUTBOX_DB_PATH": os.path.join(workdir, f"outbox_{pipeline_mode}.db"), "SESSION_STORE": "memory",
+           **dict(setting.split("=", 1) for setting in args.env)}
+    command = [sys.executable, os.path.abspath(__file__), "--worker", "--app", args.app, "--employee-id", str(args.employee_id),
+               "--warmup-timeout", str(args.warmup_timeout), "--sim-base-ms", str(args.sim_base_ms),
+               "--sim-input-ms", str(args.sim_input_ms), "--sim-output-ms", str(args.sim_output_ms),
+               "--sim-retrieval-ms", str(args.sim_retrieval_ms), "--sim-web-ms", str(args.sim_web_ms)]
+    if args.simulate: command.append("--simulate")
+    if args.queries: command += ["--queries", os.path.abspath(args.queries)]
+    result = subprocess.run(command, cwd=REPO_ROOT, env=env, capture_output=True, text=True)
+    turns = [json.loads(line[len("REPLAY "):]) for line in result.stdout.splitlines() if line.startswith("REPLAY ")]
+    stats = [json.loads(line[len("STATS "):]) for line in result.stdout.splitlines() if line.startswith("STATS ")]
+    if result.returncode != 0 or not turns: raise RuntimeError(f"{pipeline_mode} replay failed:\n{result.stderr[-3000:]}")
+    return turns, (stats[0] if stats else {})
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--app", default="main2", choices=["main", "main2"])
+    parser.add_argument("--queries", help='JSON list of {"mode": "IT"|"HR", "query": "..."}; defaults to a built-in set.')
+    parser.add_argument("--employee-id", type=int, default=101528, help="Valid employee ID for main2 sessions.")
+    parser.add_argument("--simulate", action="store_true")
+    parser.add_argument("--sim-base-ms", type=float, default=350, help="Simulated per-call overhead (network + queueing).")
+    parser.add_argument("--sim-input-ms", type=float, default=0.05, help="Simulated cost per prompt token.")
+    parser.add_argument("--sim-output-ms", type=float, default=6, help="Simulated cost per generated token.")
+    parser.add_argument("--sim-retrieval-ms", type=float, default=0, help="Simulated cost of one retrieval.")
+    parser.add_argument("--sim-web-ms", type=float, default=0, help="Simulated cost of one DuckDuckGo search.")
+    parser.add_argument("--env", action="append", default=[], help="KEY=VALUE app setting applied to both runs.")
+    parser.add_argument("--warmup-timeout", type=float, default=600)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker: return run_worker(args)
+
+    workdir = tempfile.mkdtemp(prefix="replay_pipeline_")
+    results = {mode: run_mode(mode, args, workdir) for mode in ("multi_call", "single_call")}
+    print(f"\n{'query':<52} {'multi s':>8} {'calls':>5} {'tok in/out':>11}   {'single s':>8} {'calls':>5} {'tok in/out':>11}")
+    for multi, single in zip(results["multi_call"][0], results["single_call"][0]):
+        print(f"{multi['query'][:52]:<52} {multi['latency_s']:>8.2f} {multi['llm_calls']:>5} {multi['prompt_tokens']:>5}/{multi['output_tokens']:<5}"
+              f"   {single['latency_s']:>8.2f} {single['llm_calls']:>5} {single['prompt_tokens']:>5}/{single['output_tokens']:<5}")
+    print(f"\n{'mode':<12} {'avg s':>7} {'p95 s':>7} {'calls/turn':>10} {'prompt tok':>10} {'output tok':>10}  pipeline stats")
+    for mode, (turns, stats) in results.items():
+        latencies = [t["latency_s"] for t in turns]
+        print(f"{mode:<12} {statistics.mean(latencies):>7.2f} {percentile(latencies, 0.95):>7.2f} {statistics.mean(t['llm_calls'] for t in turns):>10.2f}"
+              f" {statistics.mean(t['prompt_tokens'] for t in turns):>10.0f} {statistics.mean(t['output_tokens'] for t in turns):>10.0f}  {stats}")
+
+if __name__ == "__main__":
+    main()
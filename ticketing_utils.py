@@ -1,14 +1,17 @@
 # ticketing_utils.py
 import requests
-from requests.auth import HTTPBasicAuth
 import os
 import json
+import re
+import threading
+import time
+from collections import OrderedDict
 from dotenv import load_dotenv
 
 load_dotenv() 
 
 try:
-    from chatbot_utils import logger 
+    from chatbot_logging import logger 
 except ImportError: 
     import logging
     logger = logging.getLogger(__name__)
@@ -17,8 +20,11 @@ except ImportError:
         logger.setLevel(logging.INFO)
         logger.warning("ticketing_utils.py: Using fallback logger.")
 
+from jira_client import JiraClient, TokenBucket, EndpointLatencyStats
+
 # --- JIRA API CONFIG (Load from environment variables) ---
 JIRA_DOMAIN = os.getenv("JIRA_DOMAIN")
+JIRA_BASE_URL = (os.getenv("JIRA_BASE_URL") or (f"https://{JIRA_DOMAIN}" if JIRA_DOMAIN else "")).rstrip("/") # Override for local fake Jira servers
 JIRA_API_USER_EMAIL = os.getenv("JIRA_API_USER_EMAIL") 
 JIRA_API_TOKEN = os.getenv("JIRA_API_TOKEN")
 JIRA_SERVICE_DESK_ID = os.getenv("JIRA_SERVICE_DESK_ID")
@@ -26,6 +32,8 @@ JIRA_REQUEST_TYPE_ID_STR = os.getenv("JIRA_REQUEST_TYPE_ID")
 JIRA_TRANSITION_ID_IN_PROGRESS = os.getenv("JIRA_TRANSITION_ID_IN_PROGRESS")
 JIRA_TRANSITION_ID_CLOSE = os.getenv("JIRA_TRANSITION_ID_CLOSE")
 
+JIRA_TRANSITION_CACHE_TTL_SECONDS = float(os.getenv("JIRA_TRANSITION_CACHE_TTL_SECONDS", "3600"))
+
 # Assignee Account IDs
 JIRA_L1_ASSIGNEE_ACCOUNT_ID = os.getenv("JIRA_L1_ASSIGNEE_ACCOUNT_ID")
 JIRA_L2_ASSIGNEE_ACCOUNT_ID = os.getenv("JIRA_L2_ASSIGNEE_ACCOUNT_ID")
@@ -38,14 +46,96 @@ if JIRA_REQUEST_TYPE_ID_STR:
     except ValueError:
         logger.error(f"Error with JIRA_REQUEST_TYPE_ID: '{JIRA_REQUEST_TYPE_ID_STR}'.")
 
-def _get_jira_auth_and_headers():
-    # ... (same as before) ...
-    if not all([JIRA_DOMAIN, JIRA_API_USER_EMAIL, JIRA_API_TOKEN]):
+# --- SHARED JIRA CLIENTS (one keep-alive pool, rate limiter and stats per process) ---
+_JIRA_RATE_LIMITER = TokenBucket()
+_JIRA_LATENCY_STATS = EndpointLatencyStats()
+_jira_client = None
+_jira_client_lock = threading.Lock()
+
+def _jira_configured() -> bool:
+    if not all([JIRA_BASE_URL, JIRA_API_USER_EMAIL, JIRA_API_TOKEN]):
         logger.error("Jira API configuration (domain, user email, or token) is missing.")
-        return None, None
-    auth = HTTPBasicAuth(JIRA_API_USER_EMAIL, JIRA_API_TOKEN)
-    headers = {"Accept": "application/json", "Content-Type": "application/json"}
-    return auth, headers
+        return False
+    return True
+
+def get_jira_client() -> JiraClient | None:
+    """Process-wide blocking Jira client, or None if Jira is not configured."""
+    global _jira_client
+    if _jira_client is None:
+        if not _jira_configured(): return None
+        with _jira_client_lock:
+            if _jira_client is None:
+                _jira_client = JiraClient(JIRA_BASE_URL, JIRA_API_USER_EMAIL, JIRA_API_TOKEN, rate_limiter=_JIRA_RATE_LIMITER, stats=_JIRA_LATENCY_STATS)
+    return _jira_client
+
+def get_jira_latency_stats() -> dict:
+    return _JIRA_LATENCY_STATS.snapshot()
+
+def close_jira_clients():
+    global _jira_client
+    with _jira_client_lock: client, _jira_client = _jira_client, None
+    if client: client.close()
+
+# --- WORKFLOW TRANSITION CACHE ---
+# Available transitions depend only on the workflow and the issue's current status, so the list fetched
+# for one ticket is reused for every other ticket of the same project in the same status. Statuses are
+# tracked from the create response and from each successful transition's target status; issues whose
+# status is unknown (e.g. created before a restart) fall back to a live GET.
+_ISSUE_KEY_PATTERN = re.compile(r"^([A-Z][A-Z0-9_]*)-\d+$")
+_MAX_TRACKED_ISSUE_STATUSES = 10000
+_transitions_cache = {} # (project, status) -> (expires_at, transitions)
+_issue_statuses = OrderedDict() # issue key -> last known status name (bounded LRU)
+_transition_cache_lock = threading.Lock()
+_transition_cache_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+def _transition_cache_key(issue_key_or_id: str):
+    match = _ISSUE_KEY_PATTERN.match(issue_key_or_id or "")
+    if not match: return None
+    with _transition_cache_lock:
+        status = _issue_statuses.get(issue_key_or_id)
+    return (match.group(1), status.lower()) if status else None
+
+def _remember_issue_status(issue_key_or_id: str, status: str | None):
+    with _transition_cache_lock:
+        if not status:
+            _issue_statuses.pop(issue_key_or_id, None); return
+        _issue_statuses[issue_key_or_id] = status
+        _issue_statuses.move_to_end(issue_key_or_id)
+        while len(_issue_statuses) > _MAX_TRACKED_ISSUE_STATUSES: _issue_statuses.popitem(last=False)
+
+def _cached_transitions(issue_key_or_id: str, count_hit: bool = True) -> list | None:
+    cache_key = _transition_cache_key(issue_key_or_id)
+    if not cache_key: return None
+    with _transition_cache_lock:
+        entry = _transitions_cache.get(cache_key)
+        if entry and entry[0] > time.monotonic():
+            if count_hit: _transition_cache_stats["hits"] += 1
+            return entry[1]
+        _transitions_cache.pop(cache_key, None)
+    return None
+
+def _store_transitions(issue_key_or_id: str, transitions: list):
+    cache_key = _transition_cache_key(issue_key_or_id)
+    with _transition_cache_lock:
+        _transition_cache_stats["misses"] += 1
+        if cache_key and transitions and JIRA_TRANSITION_CACHE_TTL_SECONDS > 0:
+            _transitions_cache[cache_key] = (time.monotonic() + JIRA_TRANSITION_CACHE_TTL_SECONDS, transitions)
+
+def _record_transition_outcome(issue_key_or_id: str, transition_id: str, success: bool):
+    """Moves the tracked status to the transition's target on success; drops the cached entry when Jira rejects the transition."""
+    cache_key = _transition_cache_key(issue_key_or_id)
+    if success:
+        transitions = _cached_transitions(issue_key_or_id, count_hit=False) or []
+        target = next((t for t in transitions if str(t.get("id")) == str(transition_id)), None)
+        _remember_issue_status(issue_key_or_id, (target or {}).get("to", {}).get("name"))
+        return
+    with _transition_cache_lock:
+        if cache_key and _transitions_cache.pop(cache_key, None): _transition_cache_stats["invalidations"] += 1
+    _remember_issue_status(issue_key_or_id, None) # Status may have changed outside the bot; re-fetch next time
+
+def get_transition_cache_stats() -> dict:
+    with _transition_cache_lock:
+        return {**_transition_cache_stats, "entries": len(_transitions_cache), "tracked_issues": len(_issue_statuses)}
 
 def _convert_description_to_adf(description_text: str):
     # ... (same as before) ...
@@ -67,13 +157,13 @@ def _convert_description_to_adf(description_text: str):
 
 def create_jira_ticket(summary: str, description_text: str, reporter_email: str = None) -> dict:
     # ... (same as before, ensure it uses JIRA_SERVICE_DESK_ID and JIRA_REQUEST_TYPE_ID) ...
-    auth, headers = _get_jira_auth_and_headers()
-    if not auth: return {"success": False, "error": "Jira API configuration missing."}
+    client = get_jira_client()
+    if not client: return {"success": False, "error": "Jira API configuration missing."}
     if not JIRA_SERVICE_DESK_ID or not JIRA_REQUEST_TYPE_ID:
         logger.error("Jira Service Desk ID or Request Type ID is not configured or invalid.")
         return {"success": False, "error": "Jira Service Desk/Request Type configuration missing or invalid."}
 
-    url = f"https://{JIRA_DOMAIN}/rest/servicedeskapi/request"
+    path = "/rest/servicedeskapi/request"
     # Use plain text for description with this JSM endpoint
     # adf_description = _convert_description_to_adf(description_text) 
 
@@ -88,13 +178,14 @@ def create_jira_ticket(summary: str, description_text: str, reporter_email: str
     if reporter_email:
         payload["raiseOnBehalfOf"] = reporter_email
     
-    logger.info(f"Creating Jira ticket. URL: {url}\nPayload: {json.dumps(payload, indent=2)}")
+    logger.info(f"Creating Jira ticket. URL: {JIRA_BASE_URL}{path}\nPayload: {json.dumps(payload, indent=2)}")
     try:
-        response = requests.post(url, auth=auth, headers=headers, json=payload, timeout=20)
+        response = client.post(path, "create_request", json=payload, timeout=20)
         response.raise_for_status()
         ticket_data = response.json()
         ticket_key = ticket_data.get("issueKey")
         logger.info(f"Jira ticket created successfully: Key {ticket_key}")
+        _remember_issue_status(ticket_key, (ticket_data.get("currentStatus") or {}).get("status"))
         return {"success": True, "ticket_key": ticket_key, "issue_id": ticket_data.get("issueId"), "data": ticket_data}
     except requests.exceptions.HTTPError as http_err:
         error_text = response.text
@@ -107,14 +198,35 @@ def create_jira_ticket(summary: str, description_text: str, reporter_email: str
         return {"success": False, "error": f"Unexpected error: {str(e)}"}
 
 
+def find_jira_issue_by_text(text: str) -> dict:
+    """Looks for an issue whose summary, description or comments contain the exact phrase `text`.
+    Returns {"success": True, "ticket_key": key or None} or the usual error dict."""
+    client = get_jira_client()
+    if not client: return {"success": False, "error": "Jira API configuration missing."}
+    path = "/rest/api/3/search/jql"
+    params = {"jql": f'text ~ "\\"{text}\\""', "fields": "summary", "maxResults": 2}
+    logger.info(f"Searching Jira for issues containing '{text}'. URL: {JIRA_BASE_URL}{path}")
+    try:
+        response = client.get(path, "search", params=params, timeout=10)
+        response.raise_for_status()
+        issues = response.json().get("issues", [])
+        if len(issues) > 1: logger.warning(f"{len(issues)} Jira issues contain '{text}'; using {issues[0].get('key')}.")
+        return {"success": True, "ticket_key": issues[0].get("key") if issues else None}
+    except requests.exceptions.HTTPError as http_err:
+        logger.error(f"HTTP error searching Jira: {http_err} (Status: {response.status_code})\nResponse: {response.text}")
+        return {"success": False, "error": f"JIRA API HTTP Error: {response.status_code}"}
+    except Exception as e:
+        logger.error(f"Unexpected error searching Jira: {e}", exc_info=True)
+        return {"success": False, "error": f"Unexpected error: {str(e)}"}
+
 def get_available_transitions(issue_key_or_id: str) -> list:
     # ... (same as before) ...
-    auth, headers = _get_jira_auth_and_headers()
-    if not auth: return []
-    url = f"https://{JIRA_DOMAIN}/rest/api/3/issue/{issue_key_or_id}/transitions"
-    logger.debug(f"Getting transitions for Jira ticket {issue_key_or_id}. URL: {url}")
+    client = get_jira_client()
+    if not client: return []
+    path = f"/rest/api/3/issue/{issue_key_or_id}/transitions"
+    logger.debug(f"Getting transitions for Jira ticket {issue_key_or_id}. URL: {JIRA_BASE_URL}{path}")
     try:
-        response = requests.get(url, headers=headers, auth=auth, timeout=10)
+        response = client.get(path, "get_transitions", timeout=10)
         response.raise_for_status()
         return response.json().get("transitions", [])
     except Exception as e:
@@ -123,7 +235,10 @@ def get_available_transitions(issue_key_or_id: str) -> list:
 
 def find_transition_id_by_name(issue_key_or_id: str, target_transition_names: list[str]) -> str | None:
     # ... (same as before) ...
-    transitions = get_available_transitions(issue_key_or_id)
+    transitions = _cached_transitions(issue_key_or_id)
+    if transitions is None:
+        transitions = get_available_transitions(issue_key_or_id)
+        _store_transitions(issue_key_or_id, transitions)
     target_names_lower = [name.lower() for name in target_transition_names]
     for t in transitions:
         if t.get("name", "").lower() in target_names_lower:
@@ -135,28 +250,32 @@ def find_transition_id_by_name(issue_key_or_id: str, target_transition_names: li
 
 def transition_jira_ticket(issue_key_or_id: str, transition_id: str) -> dict:
     # ... (same as before, ensure transition_id is string) ...
-    auth, headers = _get_jira_auth_and_headers()
-    if not auth: return {"success": False, "error": "Jira API configuration missing."}
+    client = get_jira_client()
+    if not client: return {"success": False, "error": "Jira API configuration missing."}
     if not transition_id:
         logger.error(f"Jira transition ID not provided for ticket {issue_key_or_id}.")
         return {"success": False, "error": "Jira transition ID missing."}
 
-    url = f"https://{JIRA_DOMAIN}/rest/api/3/issue/{issue_key_or_id}/transitions"
+    path = f"/rest/api/3/issue/{issue_key_or_id}/transitions"
     payload = {"transition": {"id": str(transition_id)}}
 
     logger.info(f"Transitioning Jira ticket {issue_key_or_id} with transition ID {transition_id}.\nPayload: {json.dumps(payload)}")
     try:
-        response = requests.post(url, auth=auth, headers=headers, json=payload, timeout=10)
+        response = client.post(path, "transition", json=payload, timeout=10)
         if response.status_code == 204: 
             logger.info(f"Jira ticket {issue_key_or_id} transitioned successfully using ID {transition_id}.")
+            _record_transition_outcome(issue_key_or_id, transition_id, success=True)
             return {"success": True}
         else:
             response.raise_for_status() 
             logger.warning(f"Jira ticket {issue_key_or_id} transition returned status {response.status_code}, but no HTTPError. Response: {response.text}")
+            _record_transition_outcome(issue_key_or_id, transition_id, success=True)
             return {"success": True, "message": f"Transition status: {response.status_code}"}
     except requests.exceptions.HTTPError as http_err:
         error_text = response.text
         logger.error(f"HTTP error transitioning Jira ticket: {http_err} (Status: {response.status_code})\nResponse: {error_text}")
+        if response.status_code != 429 and response.status_code < 500: # Transient errors say nothing about the workflow
+            _record_transition_outcome(issue_key_or_id, transition_id, success=False)
         try: error_details = response.json()
         except json.JSONDecodeError: error_details = {"raw_response": error_text}
         return {"success": False, "error": f"JIRA API HTTP Error: {response.status_code}", "details": error_details}
@@ -166,15 +285,15 @@ def transition_jira_ticket(issue_key_or_id: str, transition_id: str) -> dict:
 
 def add_jira_comment(issue_key_or_id: str, comment_body: str, is_public: bool = True) -> dict:
     # ... (same as before) ...
-    auth, headers = _get_jira_auth_and_headers()
-    if not auth: return {"success": False, "error": "Jira API configuration missing."}
+    client = get_jira_client()
+    if not client: return {"success": False, "error": "Jira API configuration missing."}
 
-    url = f"https://{JIRA_DOMAIN}/rest/servicedeskapi/request/{issue_key_or_id}/comment"
+    path = f"/rest/servicedeskapi/request/{issue_key_or_id}/comment"
     payload = {"body": comment_body, "public": is_public} 
 
-    logger.info(f"Adding Jira comment to {issue_key_or_id}. URL: {url}\nPublic: {is_public}\nPayload: {json.dumps(payload, indent=2)}")
+    logger.info(f"Adding Jira comment to {issue_key_or_id}. URL: {JIRA_BASE_URL}{path}\nPublic: {is_public}\nPayload: {json.dumps(payload, indent=2)}")
     try:
-        response = requests.post(url, auth=auth, headers=headers, json=payload, timeout=10)
+        response = client.post(path, "add_comment", json=payload, timeout=10)
         response.raise_for_status()
         logger.info(f"Comment added to Jira ticket {issue_key_or_id}.")
         return {"success": True, "data": response.json()}
@@ -188,21 +307,44 @@ def add_jira_comment(issue_key_or_id: str, comment_body: str, is_public: bool =
         logger.error(f"Unexpected error adding Jira comment: {e}", exc_info=True)
         return {"success": False, "error": f"Unexpected error: {str(e)}"}
 
+def count_jira_comments(issue_key_or_id: str, comment_body: str) -> dict:
+    """Counts the request's comments (public and internal) whose body is `comment_body`.
+    Returns {"success": True, "count": n} or the usual error dict."""
+    client = get_jira_client()
+    if not client: return {"success": False, "error": "Jira API configuration missing."}
+    path = f"/rest/servicedeskapi/request/{issue_key_or_id}/comment"
+    count, start = 0, 0
+    try:
+        while True:
+            response = client.get(path, "get_comments", params={"start": start, "limit": 100}, timeout=10)
+            response.raise_for_status()
+            page = response.json()
+            values = page.get("values", [])
+            count += sum(1 for comment in values if (comment.get("body") or "").strip() == comment_body.strip())
+            if page.get("isLastPage", True) or not values: return {"success": True, "count": count}
+            start += len(values)
+    except requests.exceptions.HTTPError as http_err:
+        logger.error(f"HTTP error listing Jira comments: {http_err} (Status: {response.status_code})\nResponse: {response.text}")
+        return {"success": False, "error": f"JIRA API HTTP Error: {response.status_code}"}
+    except Exception as e:
+        logger.error(f"Unexpected error listing Jira comments: {e}", exc_info=True)
+        return {"success": False, "error": f"Unexpected error: {str(e)}"}
+
 # --- NEW FUNCTIONS FOR ASSIGNMENT AND PRIORITY ---
 def assign_jira_issue(issue_key_or_id: str, account_id: str) -> dict:
     """Assigns a Jira issue to a user using their accountId."""
-    auth, headers = _get_jira_auth_and_headers()
-    if not auth: return {"success": False, "error": "Jira API configuration missing."}
+    client = get_jira_client()
+    if not client: return {"success": False, "error": "Jira API configuration missing."}
     if not account_id:
         logger.warning(f"No account_id provided for assigning issue {issue_key_or_id}.")
         return {"success": False, "error": "No account_id provided."}
 
-    url = f"https://{JIRA_DOMAIN}/rest/api/3/issue/{issue_key_or_id}/assignee"
+    path = f"/rest/api/3/issue/{issue_key_or_id}/assignee"
     payload = {"accountId": account_id}
 
-    logger.info(f"Assigning Jira issue {issue_key_or_id} to accountId {account_id}. URL: {url}\nPayload: {json.dumps(payload)}")
+    logger.info(f"Assigning Jira issue {issue_key_or_id} to accountId {account_id}. URL: {JIRA_BASE_URL}{path}\nPayload: {json.dumps(payload)}")
     try:
-        response = requests.put(url, auth=auth, headers=headers, json=payload, timeout=10)
+        response = client.put(path, "assign", json=payload, timeout=10)
         if response.status_code == 204:
             logger.info(f"Issue {issue_key_or_id} assigned to accountId {account_id} successfully.")
             return {"success": True}
@@ -223,18 +365,18 @@ def assign_jira_issue(issue_key_or_id: str, account_id: str) -> dict:
 
 def set_jira_issue_priority(issue_key_or_id: str, priority_id: str) -> dict:
     """Sets the priority of a Jira issue using priority ID."""
-    auth, headers = _get_jira_auth_and_headers()
-    if not auth: return {"success": False, "error": "Jira API configuration missing."}
+    client = get_jira_client()
+    if not client: return {"success": False, "error": "Jira API configuration missing."}
     if not priority_id:
         logger.warning(f"No priority_id provided for setting priority of issue {issue_key_or_id}.")
         return {"success": False, "error": "No priority_id provided."}
         
-    url = f"https://{JIRA_DOMAIN}/rest/api/3/issue/{issue_key_or_id}"
+    path = f"/rest/api/3/issue/{issue_key_or_id}"
     payload = {"fields": {"priority": {"id": str(priority_id)}}} # Priority ID should be a string
 
-    logger.info(f"Setting priority for Jira issue {issue_key_or_id} to ID {priority_id}. URL: {url}\nPayload: {json.dumps(payload)}")
+    logger.info(f"Setting priority for Jira issue {issue_key_or_id} to ID {priority_id}. URL: {JIRA_BASE_URL}{path}\nPayload: {json.dumps(payload)}")
     try:
-        response = requests.put(url, auth=auth, headers=headers, json=payload, timeout=10)
+        response = client.put(path, "set_priority", json=payload, timeout=10)
         if response.status_code == 204:
             logger.info(f"Issue {issue_key_or_id} priority set to ID {priority_id} successfully.")
             return {"success": True}